@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+class ConnectionLimiter:
+    """
+    Caps open chat sockets per user and per worker process.
+
+    Counts are kept in process, so the per-user cap applies to the sockets a
+    user has on one worker; with N workers a user can hold up to N times the
+    cap, which still bounds what a single runaway client can open.
+    """
+
+    def __init__(self, max_per_user=10, max_per_process=10_000):
+        self.max_per_user = max_per_user
+        self.max_per_process = max_per_process
+        self._per_user = defaultdict(int)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, user_id):
+        """Reserve a slot; returns None on success or the name of the cap that was hit."""
+        with self._lock:
+            if self._total >= self.max_per_process:
+                return "process_cap"
+            if self._per_user[user_id] >= self.max_per_user:
+                return "user_cap"
+            self._per_user[user_id] += 1
+            self._total += 1
+            return None
+
+    def release(self, user_id):
+        with self._lock:
+            self._total -= 1
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+
+    def __len__(self):
+        return self._total
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class InboundRateLimiter:
+    """
+    One token bucket per inbound frame type for a single socket.
+
+    ``limits`` maps a frame type to ``(rate, burst)``; types without their own
+    entry share the ``"default"`` bucket.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._buckets = {}
+
+    def allow(self, message_type):
+        key = message_type if message_type in self.limits else "default"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = self.limits[key]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket.allow()
+
+connection_limiter = ConnectionLimiter(
+    max_per_user=getattr(settings, "CHAT_MAX_CONNECTIONS_PER_USER", 10),
+    max_per_process=getattr(settings, "CHAT_MAX_CONNECTIONS_PER_PROCESS", 10_000),
+)
@@ -1,5 +1,3 @@
-import contextlib
-
 from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
@@ -8,5 +6,6 @@ class ChatConfig(AppConfig):
     verbose_name = _("Chat")
 
     def ready(self):
-        with contextlib.suppress(ImportError):
-            import backend.users.signals  # noqa: F401
\ No newline at end of file
+        # Not optional: the receivers keep the group name cache and
+        # conversation membership correct.
+        import backend.chat.signals  # noqa: F401
@@ -0,0 +1,151 @@
+"""
+Wire formats for ``ChatConsumer`` frames.
+
+Clients pick a format when they open the socket, through the WebSocket
+subprotocol list (``Sec-WebSocket-Protocol``):
+
+* no subprotocol (or an unknown one): JSON text frames, exactly as before,
+  encoded with orjson when it is installed;
+* ``chat.msgpack.v1``: MessagePack binary frames whose keys are replaced by
+  the short tags in ``FIELD_TAGS`` (``isRead`` -> ``r`` and so on), both
+  ways. Values are unchanged.
+
+New fields must get a tag here before they are sent, otherwise they travel
+under their full name (which still decodes fine, it is just not compact).
+
+Chat frames, the bulk of the traffic, go through ``encode_chat``: the compact
+codec builds them with their tags directly instead of renaming a full-name
+frame key by key, so the smaller format does not cost more CPU than JSON.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - the compact protocol is then not offered
+    msgpack = None
+
+COMPACT_SUBPROTOCOL = "chat.msgpack.v1"
+
+# Never reuse or reassign a tag: old clients keep decoding with the table
+# they shipped with.
+FIELD_TAGS = {
+    "type": "t",
+    "message": "m",
+    "id": "i",
+    "content": "c",
+    "isRead": "r",
+    "isSent": "s",
+    "sentDate": "d",
+    "recipient_id": "to",
+    "callInfo": "ci",
+    "otherPersonId": "op",
+    "otherPersonName": "on",
+    "otherPersonAvatarUrl": "oa",
+    "meetingLink": "ml",
+    "userId": "u",
+    "isTyping": "ty",
+    "is_typing": "it",
+    "readerId": "rd",
+    "readCount": "rc",
+    "lastReadId": "lr",
+    "lastMessageId": "lm",
+    "seq": "q",
+    "messageType": "mt",
+    "conversationId": "cv",
+    "senderId": "sd",
+    "sessionId": "ss",
+}
+
+FIELD_NAMES = {tag: name for name, tag in FIELD_TAGS.items()}
+
+_TYPE, _SEQ, _MESSAGE, _ID, _CONTENT, _IS_READ, _IS_SENT, _SENT_DATE = (
+    FIELD_TAGS[name] for name in ("type", "seq", "message", "id", "content", "isRead", "isSent", "sentDate")
+)
+
+def chat_frame(message, seq, is_sent):
+    """The ``chat`` frame of a message payload as fanned out by ``ChatConsumer``."""
+    return {
+        "type": "chat",
+        "seq": seq,
+        "message": {
+            "id": message["id"],
+            "content": message["content"],
+            "isRead": message["isRead"],
+            "isSent": is_sent,
+            "sentDate": message["sentDate"],
+        },
+    }
+
+def _rename(value, table):
+    if isinstance(value, dict):
+        return {table.get(key, key): _rename(item, table) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rename(item, table) for item in value]
+    return value
+
+class JsonCodec:
+    subprotocol = None
+    binary = False
+
+    if orjson is not None:
+        @staticmethod
+        def encode(frame):
+            return orjson.dumps(frame).decode()
+
+        @staticmethod
+        def decode(data):
+            return orjson.loads(data)
+    else:
+        @staticmethod
+        def encode(frame):
+            return json.dumps(frame)
+
+        @staticmethod
+        def decode(data):
+            return json.loads(data)
+
+    @classmethod
+    def encode_chat(cls, message, seq, is_sent):
+        return cls.encode(chat_frame(message, seq, is_sent))
+
+class CompactCodec:
+    subprotocol = COMPACT_SUBPROTOCOL
+    binary = True
+
+    @staticmethod
+    def encode(frame):
+        return msgpack.packb(_rename(frame, FIELD_TAGS))
+
+    @staticmethod
+    def decode(data):
+        return _rename(msgpack.unpackb(data), FIELD_NAMES)
+
+    @staticmethod
+    def encode_chat(message, seq, is_sent):
+        # Same frame as chat_frame(), already tagged.
+        return _chat_packer.pack({
+            _TYPE: "chat",
+            _SEQ: seq,
+            _MESSAGE: {
+                _ID: message["id"],
+                _CONTENT: message["content"],
+                _IS_READ: message["isRead"],
+                _IS_SENT: is_sent,
+                _SENT_DATE: message["sentDate"],
+            },
+        })
+
+# Reused across chat frames; consumers encode on the event loop thread only.
+_chat_packer = msgpack.Packer() if msgpack is not None else None
+
+def negotiate(subprotocols):
+    """The codec for the subprotocols a client offered, in its order of preference."""
+    for subprotocol in subprotocols or ():
+        if subprotocol == COMPACT_SUBPROTOCOL and msgpack is not None:
+            return CompactCodec
+    return JsonCodec
@@ -1,108 +1,267 @@
-import json
-import re
-from channels.generic.websocket import AsyncWebsocketConsumer, WebsocketConsumer
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncWebsocketConsumer
 
 from channels.db import database_sync_to_async
-from django.utils.timezone import now
-from backend.chat.models import Message, Contact
-from backend.users.models import User
-from asgiref.sync import async_to_sync
-
-def sanitize_group_name(name: str) -> str:
-    # Replace all invalid characters with an underscore
-    return re.sub(r"[^a-zA-Z0-9_\-.]", "_", name)[:100]
-
-class ChatConsumer(WebsocketConsumer):
-    def connect(self):
-        user_id = self.scope['url_route']['kwargs']['userId']
-        user = User.objects.get(id=user_id)
-        self.user = user
-        self.user_id = user_id
-
-        self.group_name = sanitize_group_name(f"group_{user.uuid}")
-        async_to_sync (self.channel_layer.group_add)(
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from backend.chat.admission import InboundRateLimiter, connection_limiter
+from backend.chat.codecs import negotiate
+from backend.chat.conversations import (
+    amark_conversation_read,
+    conversation_group_name,
+    group_message_payload,
+    save_group_message,
+)
+from backend.chat.delivery_log import delivery_log
+from backend.chat.fanout import group_send_many
+from backend.chat.groups import aget_user_group_name, user_group_cache, user_group_name
+from backend.chat.models import Message, Contact, Conversation
+from backend.chat.presence import last_seen_recorder, presence
+from backend.chat.receipts import amark_read
+from backend.chat.typing_status import TypingDebouncer
+from backend.chat.writer import WriterBacklogged, message_writer
+from backend.tracing import tracer
+
+# Events a lagging socket can drop without losing state.
+SHEDDABLE_EVENTS = {"typing_status"}
+
+def _frame_id(data, key):
+    """The id under ``key`` of an inbound frame, or ``None`` if it is missing or malformed."""
+    try:
+        return int(data.get(key))
+    except (TypeError, ValueError):
+        return None
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Per-user chat and call signalling socket.
+
+    Runs on the event loop; every database touch goes through
+    ``database_sync_to_async`` and is grouped so a single inbound frame costs
+    at most one thread hop.
+
+    Sockets authenticate with a JWT access token (``?token=``, see
+    ``backend.chat.middleware``); the handshake needs no user lookup.
+
+    Admission and backpressure: sockets are capped per user and per process,
+    inbound frames go through a token bucket per frame type, and channel
+    layer events are stamped with ``sentAt`` so a socket that falls behind
+    first sheds transient events and then gets closed (its client reconnects
+    and replays what it missed from the delivery log).
+    """
+
+    async def connect(self):
+        # Authenticated by JWTAuthMiddleware; the path only has to agree with the token.
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated or str(user.id) != self.scope['url_route']['kwargs']['userId']:
+            await self.close()
+            return
+
+        rejected = connection_limiter.acquire(user.id)
+        if rejected is not None:
+            tracer.metrics.incr(f"chat.connections.rejected.{rejected}")
+            await self.close()
+            return
+        tracer.metrics.incr("chat.connections.opened")
+
+        self.user_id = int(user.id)
+        self.rate_limiter = InboundRateLimiter(settings.CHAT_RATE_LIMITS)
+        self.closing = False
+        self.typing = TypingDebouncer(
+            self.send_typing_status,
+            window=settings.CHAT_TYPING_WINDOW,
+            idle_timeout=settings.CHAT_TYPING_IDLE_TIMEOUT,
+        )
+
+        self.group_name = user_group_name(user.uuid)
+        # JWTAuthMiddleware only lets active users through, so the claims are safe to cache.
+        user_group_cache.set(self.user_id, self.group_name)
+        await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
 
-        self.accept()
-
-    # async def disconnect(self, close_code):
-        # if self.user.is_authenticated:
-        #     await self.channel_layer.group_discard(f"user_{self.user.id}", self.channel_name)
-        #     await self.set_user_status("offline")
-
-    def receive(self, text_data):
-        data = json.loads(text_data)
+        # Group conversations fan out through one channel layer group each.
+        self.conversation_groups = set(await self.get_conversation_groups())
+        for group_name in self.conversation_groups:
+            await self.channel_layer.group_add(group_name, self.channel_name)
+
+        # Clients opt into the compact protocol via the subprotocol list.
+        self.codec = negotiate(self.scope.get("subprotocols"))
+        await self.accept(subprotocol=self.codec.subprotocol)
+
+        await presence.connect(self.user_id)
+        self.heartbeat_task = asyncio.create_task(self.keep_presence_alive())
+
+        # Live events that raced with the replay below are already covered by it.
+        self.replayed_seq = 0
+        last_seq = parse_qs(self.scope.get("query_string", b"").decode()).get("lastSeq")
+        if last_seq and last_seq[0].isdigit():
+            await self.replay(int(last_seq[0]))
+
+    async def replay(self, last_seq):
+        """
+        Send what the user was sent after ``last_seq`` from the delivery log.
+
+        When the log no longer covers that position (trimmed or expired) the
+        client gets a ``resync`` frame instead and reloads the history over
+        REST.
+        """
+        with tracer.span("chat.replay"):
+            replay = await delivery_log.since(self.user_id, last_seq)
+            if not replay.complete:
+                await self.send_frame({"type": "resync", "seq": replay.current_seq})
+            else:
+                for seq, message in replay.entries:
+                    await self.send_chat(message, seq)
+            self.replayed_seq = replay.current_seq
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "rate_limiter"):
+            connection_limiter.release(self.user_id)
+            tracer.metrics.incr("chat.connections.closed")
+
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+        for group_name in getattr(self, "conversation_groups", ()):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+        if hasattr(self, "typing"):
+            await self.typing.close()
+
+        if hasattr(self, "heartbeat_task"):
+            self.heartbeat_task.cancel()
+            await presence.disconnect(self.user_id)
+            last_seen_recorder.record(self.user_id, timezone.now())
+
+    async def keep_presence_alive(self):
+        # Refresh well inside the TTL so one late beat does not flip the user offline.
+        interval = presence.ttl / 3
+        while True:
+            await asyncio.sleep(interval)
+            await presence.heartbeat(self.user_id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        data = self.codec.decode(text_data if text_data is not None else bytes_data)
         message_type = data.get("type")
-        if message_type == "send_message":
-            self.handle_send_message(data)
-        elif message_type == "initiate_call":
-            self.handle_initiate_call(data)
-        elif message_type == "accept_call":
-            self.handle_accept_call(data)
-        elif message_type == "decline_call":
-            self.handle_decline_call(data)
-        elif message_type == "cancel_call":
-            self.handle_cancel_call(data)
-        elif message_type == "busy":
-            self.handle_busy(data)
-        # elif message_type == "is_typing":
-        #     await self.handle_typing_status(content)
-
-    def handle_send_message(self, data):
+        if not self.rate_limiter.allow(message_type):
+            tracer.metrics.incr("chat.inbound.limited")
+            if message_type != "is_typing":
+                await self.send_frame({"type": "rate_limited", "messageType": message_type})
+            return
+
+        with tracer.span("chat.receive", type=message_type):
+            if message_type == "send_message":
+                await self.handle_send_message(data)
+            elif message_type == "initiate_call":
+                await self.handle_initiate_call(data)
+            elif message_type == "accept_call":
+                await self.handle_accept_call(data)
+            elif message_type == "decline_call":
+                await self.handle_decline_call(data)
+            elif message_type == "cancel_call":
+                await self.handle_cancel_call(data)
+            elif message_type == "busy":
+                await self.handle_busy(data)
+            elif message_type == "heartbeat":
+                await presence.heartbeat(self.user_id)
+            elif message_type == "is_typing":
+                await self.handle_typing_status(data)
+            elif message_type == "mark_read":
+                await self.handle_mark_read(data)
+            elif message_type == "send_group_message":
+                await self.handle_send_group_message(data)
+            elif message_type == "mark_conversation_read":
+                await self.handle_mark_conversation_read(data)
+
+    async def handle_send_message(self, data):
         recipient_id = data.get("recipient_id")
         message = data.get("message")
-        recipient = User.objects.get(id=recipient_id)
-        new_message = Message.objects.create(
-            sender=self.user, recipient=recipient, content=message
-        )
 
-        # Update contact last message and unread count
-        self.update_contact(new_message)
-
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
+        receiver_group_name = await aget_user_group_name(recipient_id)
+        if receiver_group_name is None or receiver_group_name == self.group_name:
+            # Unknown recipient, or the sender: a contact needs two users.
+            return
+
+        with tracer.span("chat.db", write_behind=settings.CHAT_WRITE_BEHIND):
+            if settings.CHAT_WRITE_BEHIND:
+                # Fan out right away; the writer persists the message in a batch.
+                try:
+                    new_message = await message_writer.submit(self.user_id, int(recipient_id), message)
+                except WriterBacklogged:
+                    # Storage is down and the buffer is full; the client retries as it does when limited.
+                    tracer.metrics.incr("chat.write_behind.rejected")
+                    await self.send_frame({"type": "rate_limited", "messageType": "send_message"})
+                    return
+            else:
+                new_message = await self.save_message(recipient_id, message)
+
+        # The message itself clears the sender's typing indicator on the other end.
+        self.typing.reset(int(recipient_id))
+
+        message = {
+            "id": new_message.id,
+            "senderId": self.user_id,
+            "content": new_message.content,
+            "isRead": new_message.is_read,
+            "sentDate": new_message.timestamp.isoformat(),
+        }
+        # Logged for both sides so any socket that is offline now can replay it.
+        seqs = await delivery_log.append({int(recipient_id): message, self.user_id: message})
+
+        # One event for both sides; each socket derives isSent itself.
+        await self.group_send_many(
+            [receiver_group_name, self.group_name],
             {
                 "type": "chat_message",
-                "message": {
-                    "id": new_message.id,
-                    "content": new_message.content,
-                    "isRead": new_message.is_read,
-                    "isSent": False,
-                    "sentDate": new_message.timestamp.isoformat(),
-                },
+                "message": message,
+                "recipientSeq": seqs.get(int(recipient_id)),
+                "senderSeq": seqs.get(self.user_id),
             },
         )
 
-        async_to_sync (self.channel_layer.group_send)(
-            self.group_name,
+    async def handle_send_group_message(self, data):
+        conversation_id = _frame_id(data, "conversationId")
+        content = data.get("message")
+        if conversation_id is None or not content:
+            return
+
+        with tracer.span("chat.db", op="send_group_message"):
+            new_message = await save_group_message(conversation_id, self.user_id, content)
+        if new_message is None:
+            return
+
+        # Stored once and sent once, however many members the conversation has.
+        await self.group_send(
+            conversation_group_name(conversation_id),
             {
-                "type": "chat_message",
-                "message": {
-                    "id": new_message.id,
-                    "content": new_message.content,
-                    "isRead": new_message.is_read,
-                    "isSent": True,
-                    "sentDate": new_message.timestamp.isoformat(),
-                },
+                "type": "group_message",
+                "conversationId": conversation_id,
+                "message": group_message_payload(new_message),
             },
         )
 
+    async def handle_mark_conversation_read(self, data):
+        conversation_id = _frame_id(data, "conversationId")
+        last_message_id = _frame_id(data, "lastMessageId")
+        if conversation_id is None or last_message_id is None:
+            return
+        with tracer.span("chat.db", op="mark_conversation_read"):
+            await amark_conversation_read(conversation_id, self.user_id, last_message_id)
 
-    def handle_initiate_call(self, data):
+    async def handle_initiate_call(self, data):
         recipient_id = data.get("otherPersonId")
         meeting_link = data.get("meetingLink")
         other_person_avatar_url = data.get("otherPersonAvatarUrl")
         other_person_name = data.get("otherPersonName")
 
-        recipient = User.objects.get(id=recipient_id)
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
+        await self.send_to_user(
+            recipient_id,
             {
                 "type": "initiate_call",
                 "callInfo": {
@@ -114,144 +273,202 @@ class ChatConsumer(WebsocketConsumer):
             }
         )
 
-    def handle_accept_call(self, data):
-        recipient_id = data.get("otherPersonId")
-        recipient = User.objects.get(id=recipient_id)
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
-            {
-                "type": "accept_call"
-            }
-        )
-    
-    def handle_decline_call(self, data):
-        recipient_id = data.get("otherPersonId")
-        recipient = User.objects.get(id=recipient_id)
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
+    async def handle_accept_call(self, data):
+        await self.send_to_user(data.get("otherPersonId"), {"type": "accept_call"})
+
+    async def handle_decline_call(self, data):
+        await self.send_to_user(data.get("otherPersonId"), {"type": "decline_call"})
+
+    async def handle_cancel_call(self, data):
+        await self.send_to_user(data.get("otherPersonId"), {"type": "cancel_call"})
+
+    async def handle_busy(self, data):
+        await self.send_to_user(data.get("otherPersonId"), {"type": "busy"})
+
+    async def handle_typing_status(self, data):
+        # Sent on every keystroke, so a malformed frame is dropped rather than failing the socket.
+        recipient_id = _frame_id(data, "recipient_id")
+        is_typing = data.get("is_typing", False)
+        if recipient_id is None or not isinstance(is_typing, bool):
+            return
+        await self.typing.update(recipient_id, is_typing)
+
+    async def handle_mark_read(self, data):
+        other_person_id = _frame_id(data, "otherPersonId")
+        if other_person_id is None:
+            return
+        last_message_id = _frame_id(data, "lastMessageId")
+        if last_message_id is None and data.get("lastMessageId") is not None:
+            return
+        await amark_read(self.user_id, other_person_id, last_message_id)
+
+    async def send_typing_status(self, recipient_id, is_typing):
+        await self.send_to_user(
+            recipient_id,
             {
-                "type": "decline_call"
-            }
-        )
-    
-    def handle_cancel_call(self, data):
-        recipient_id = data.get("otherPersonId")
-        recipient = User.objects.get(id=recipient_id)
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
-            {
-                "type": "cancel_call"
-            }
+                "type": "typing_status",
+                "userId": self.user_id,
+                "isTyping": is_typing,
+            },
         )
 
-    def handle_busy(self, data):
-        recipient_id = data.get("otherPersonId")
-        recipient = User.objects.get(id=recipient_id)
-        receiver_group_name = sanitize_group_name(f"group_{recipient.uuid}")
-
-        async_to_sync (self.channel_layer.group_send)(
-            receiver_group_name,
-            {
-                "type": "busy"
-            }
-        )
-    
-    def chat_message(self, event):
+    async def group_send(self, group_name, event):
+        event["sentAt"] = time.time()
+        with tracer.span("chat.group_send", event=event["type"]):
+            await self.channel_layer.group_send(group_name, event)
+
+    async def group_send_many(self, group_names, event):
+        event["sentAt"] = time.time()
+        with tracer.span("chat.group_send", event=event["type"], groups=len(group_names)):
+            await group_send_many(self.channel_layer, group_names, event)
+
+    async def dispatch(self, message):
+        sent_at = message.get("sentAt")
+        if sent_at is not None:
+            if getattr(self, "closing", False):
+                return
+            lag = time.time() - sent_at
+            if lag > settings.CHAT_OUTBOUND_CLOSE_LAG:
+                # Too far behind to catch up live; the client reconnects and replays.
+                tracer.metrics.incr("chat.outbound.closed_slow")
+                self.closing = True
+                await self.close(code=4008)
+                return
+            if lag > settings.CHAT_OUTBOUND_SHED_LAG and message["type"] in SHEDDABLE_EVENTS:
+                tracer.metrics.incr("chat.outbound.shed")
+                return
+        await super().dispatch(message)
+
+    async def send_frame(self, frame):
+        """Encode an outbound frame with the codec negotiated at connect."""
+        await self.send_encoded(self.codec.encode(frame))
+
+    async def send_chat(self, message, seq):
+        """Send a chat message payload as a ``chat`` frame, through the codec's fast path."""
+        await self.send_encoded(self.codec.encode_chat(message, seq, message["senderId"] == self.user_id))
+
+    async def send_encoded(self, data):
+        if self.codec.binary:
+            await self.send(bytes_data=data)
+        else:
+            await self.send(text_data=data)
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        with tracer.span("chat.send"):
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+    async def send_to_user(self, recipient_id, event):
+        """Send a channel layer event to every socket of the given user."""
+        receiver_group_name = await aget_user_group_name(recipient_id)
+        if receiver_group_name is None:
+            return
+        await self.group_send(receiver_group_name, event)
+
+    async def chat_message(self, event):
         message = event['message']
-        print(f"event ------> {event}")
+        is_sent = message['senderId'] == self.user_id
+        seq = event.get('senderSeq') if is_sent else event.get('recipientSeq')
+        if seq is not None and seq <= self.replayed_seq:
+            return
 
-        self.send(text_data=json.dumps({
-            'type': 'chat',
-            'message': message
-        }))
+        await self.send_chat(message, seq)
 
-    def initiate_call(self, event):
+    async def group_message(self, event):
+        message = event['message']
+        await self.send_frame({
+            'type': 'group_chat',
+            'conversationId': event['conversationId'],
+            'message': {
+                'id': message['id'],
+                'senderId': message['senderId'],
+                'content': message['content'],
+                'isSent': message['senderId'] == self.user_id,
+                'sentDate': message['sentDate'],
+            }
+        })
+
+    async def conversation_joined(self, event):
+        group_name = conversation_group_name(event['conversationId'])
+        if group_name not in self.conversation_groups:
+            self.conversation_groups.add(group_name)
+            await self.channel_layer.group_add(group_name, self.channel_name)
+        await self.send_frame({
+            'type': 'conversation_joined',
+            'conversationId': event['conversationId'],
+        })
+
+    async def conversation_left(self, event):
+        group_name = conversation_group_name(event['conversationId'])
+        if group_name in self.conversation_groups:
+            self.conversation_groups.discard(group_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+        await self.send_frame({
+            'type': 'conversation_left',
+            'conversationId': event['conversationId'],
+        })
+
+    async def waitlist_promoted(self, event):
+        await self.send_frame({
+            'type': 'waitlist_promoted',
+            'sessionId': event['sessionId'],
+        })
+
+    async def initiate_call(self, event):
         callInfo = event['callInfo']
-        print(f"call info ------> {callInfo}")
 
-        self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'incoming_call',
             'callInfo': callInfo
-        }))
-    
-    def accept_call(self, event):
-        self.send(text_data=json.dumps({
+        })
+
+    async def accept_call(self, event):
+        await self.send_frame({
             'type': 'call_accepted'
-        }))
-    
-    def decline_call(self, event):
-        self.send(text_data=json.dumps({
+        })
+
+    async def decline_call(self, event):
+        await self.send_frame({
             'type': 'call_declined'
-        }))
+        })
 
-    def cancel_call(self, event):
-        self.send(text_data=json.dumps({
+    async def cancel_call(self, event):
+        await self.send_frame({
             'type': 'call_cancelled'
-        }))
-    
-    def busy(self, event):
-        self.send(text_data=json.dumps({
-            'type': 'busy'
-        }))
-
-    def update_contact(self, message):
-        # Ensure user_one is the smaller ID and user_two is the larger ID
-        user_one, user_two = (
-            (message.sender, message.recipient)
-            if message.sender.id < message.recipient.id
-            else (message.recipient, message.sender)
-        )
-        
-        # Get or create the contact
-        contact, created = Contact.objects.get_or_create(
-            user_one=user_one,
-            user_two=user_two,
-            defaults={
-                "last_message": message,
-                "unread_count": 1 if message.recipient == user_two else 0,
-            }
-        )
+        })
 
-        # Update the contact's last message and unread count
-        if not created:
-            contact.last_message = message
-            if message.recipient == user_two:
-                contact.unread_count += 1
-            contact.save()
-
-    # def handle_typing_status(self, content):
-    #     recipient_id = content.get("recipient_id")
-    #     is_typing = content.get("is_typing", False)
-
-    #     # Notify the recipient of typing status
-    #     self.channel_layer.group_send(
-    #         f"user_{recipient_id}",
-    #         {
-    #             "type": "typing_status",
-    #             "user_id": self.user.id,
-    #             "is_typing": is_typing,
-    #         },
-    #     )
-
-    # def typing_status(self, event):
-    #     self.send_json({
-    #         "type": "typing_status",
-    #         "user_id": event["user_id"],
-    #         "is_typing": event["is_typing"],
-    #     })
-
-
-    # def set_user_status(self, status):
-    #     self.user.status = status
-    #     self.user.last_seen = now()
-    #     self.user.save()
-
-    # def chat_message(self, event):
-    #     print("sending back")
-    #     self.send(event["message"])
+    async def busy(self, event):
+        await self.send_frame({
+            'type': 'busy'
+        })
+
+    async def typing_status(self, event):
+        await self.send_frame({
+            'type': 'typing_status',
+            'userId': event['userId'],
+            'isTyping': event['isTyping'],
+        })
+
+    async def read_receipt(self, event):
+        await self.send_frame({
+            'type': 'read_receipt',
+            'readerId': event['readerId'],
+            'readCount': event['readCount'],
+            'lastReadId': event['lastReadId'],
+        })
+
+    @database_sync_to_async
+    def get_conversation_groups(self):
+        return [conversation_group_name(conversation_id) for conversation_id in Conversation.objects.ids_for(self.user_id)]
+
+    @database_sync_to_async
+    def save_message(self, recipient_id, content):
+        """Store the message and update the contact in one thread hop."""
+        with transaction.atomic():
+            new_message = Message.objects.create(
+                sender_id=self.user_id, recipient_id=int(recipient_id), content=content
+            )
+
+            # Update contact last message and unread count
+            Contact.objects.record_message(new_message)
+
+        return new_message
@@ -0,0 +1,88 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from backend.chat.fanout import group_send_many
+from backend.chat.groups import user_group_name
+from backend.chat.models import Conversation, ConversationMember, GroupMessage
+from backend.users.models import User
+
+def conversation_group_name(conversation_id):
+    """Channel layer group every socket of every member joins."""
+    return f"conversation_{conversation_id}"
+
+def membership_event(event_type, conversation_id):
+    return {"type": event_type, "conversationId": conversation_id, "sentAt": time.time()}
+
+def _notify_users(user_ids, event):
+    # One query for all the group names, then one pipelined fan-out.
+    group_names = [
+        user_group_name(user_uuid)
+        for user_uuid in User.objects.filter(id__in=user_ids).values_list("uuid", flat=True)
+    ]
+    if group_names:
+        async_to_sync(group_send_many)(get_channel_layer(), group_names, event)
+
+def add_members(conversation_id, user_ids):
+    """
+    Add users to a conversation and tell their open sockets to join its group.
+
+    The push waits for the surrounding transaction to commit, so a socket
+    never joins a conversation that was rolled back.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ConversationMember.objects.add_members(conversation_id, user_ids)
+    transaction.on_commit(
+        lambda: _notify_users(user_ids, membership_event("conversation_joined", conversation_id))
+    )
+
+def remove_members(conversation_id, user_ids):
+    """Remove users from a conversation and tell their open sockets to leave its group."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ConversationMember.objects.remove_members(conversation_id, user_ids)
+    transaction.on_commit(
+        lambda: _notify_users(user_ids, membership_event("conversation_left", conversation_id))
+    )
+
+def group_message_payload(message):
+    return {
+        "id": message.id,
+        "senderId": message.sender_id,
+        "content": message.content,
+        "sentDate": message.timestamp.isoformat(),
+    }
+
+@database_sync_to_async
+def save_group_message(conversation_id, sender_id, content):
+    """
+    Store a group message once for the whole conversation.
+
+    Returns ``None`` when the sender is not a member. Members' unread counts
+    are derived from their read cursors, so nothing is written per member.
+    """
+    with transaction.atomic():
+        if not ConversationMember.objects.filter(conversation_id=conversation_id, user_id=sender_id).exists():
+            return None
+        message = GroupMessage.objects.create(
+            conversation_id=conversation_id, sender_id=sender_id, content=content
+        )
+        # Concurrent senders may commit out of id order; keep the newest.
+        Conversation.objects.filter(id=conversation_id).update(
+            last_message_id=Greatest(Coalesce(F("last_message_id"), Value(0)), Value(message.id))
+        )
+    return message
+
+def mark_conversation_read(conversation_id, user_id, last_message_id):
+    """Move ``user_id``'s read cursor in a conversation forward to ``last_message_id``."""
+    return ConversationMember.objects.mark_read(conversation_id, user_id, last_message_id)
+
+amark_conversation_read = database_sync_to_async(mark_conversation_read)
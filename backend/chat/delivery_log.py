@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+
+from backend.chat.codecs import JsonCodec
+
+logger = logging.getLogger(__name__)
+
+class Replay:
+    """What a reconnecting socket missed since ``last_seq``."""
+
+    __slots__ = ("entries", "current_seq", "complete")
+
+    def __init__(self, entries, current_seq, complete):
+        # ``entries`` is a list of ``(seq, event)``, oldest first.
+        self.entries = entries
+        self.current_seq = current_seq
+        self.complete = complete
+
+def _is_complete(last_seq, current_seq, oldest_seq):
+    # The log can only vouch for a client whose position it still covers:
+    # the counter must not have been reset under it (expired key) and the
+    # first missed entry must not have been trimmed away.
+    if last_seq > current_seq:
+        return False
+    if last_seq == current_seq:
+        return True
+    return oldest_seq is not None and oldest_seq <= last_seq + 1
+
+class LocalDeliveryLog:
+    """In-process delivery log, for development, tests and single-process deployments."""
+
+    def __init__(self, maxlen=200):
+        self.maxlen = maxlen
+        self._seqs = {}
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    async def append(self, events_by_user):
+        seqs = {}
+        with self._lock:
+            for user_id, event in events_by_user.items():
+                seq = self._seqs.get(user_id, 0) + 1
+                self._seqs[user_id] = seq
+                self._logs.setdefault(user_id, deque(maxlen=self.maxlen)).append((seq, event))
+                seqs[user_id] = seq
+        return seqs
+
+    async def since(self, user_id, last_seq):
+        with self._lock:
+            log = list(self._logs.get(user_id, ()))
+            current_seq = self._seqs.get(user_id, 0)
+        oldest_seq = log[0][0] if log else None
+        entries = [(seq, event) for seq, event in log if seq > last_seq]
+        return Replay(entries, current_seq, _is_complete(last_seq, current_seq, oldest_seq))
+
+class RedisDeliveryLog:
+    """
+    Per-user delivery log shared by every worker process through Redis.
+
+    Each user has a counter (``chatlog:{id}:seq``) and a sorted set
+    (``chatlog:{id}``) scored by sequence number, trimmed to the newest
+    ``maxlen`` entries. Both expire ``ttl`` seconds after the last append, so
+    idle users cost nothing. Appends for all recipients of one message go
+    out in a single pipelined round trip.
+    """
+
+    APPEND_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[1])
+    redis.call('ZADD', KEYS[2], seq, seq .. ':' .. ARGV[1])
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[2]) + 1))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return seq
+    """
+
+    def __init__(self, url, maxlen=200, ttl=86400, prefix="chatlog"):
+        self.url = url
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = None
+        self._loop = None
+
+    @property
+    def client(self):
+        import redis.asyncio
+
+        # asyncio clients are bound to the loop they were created on.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = redis.asyncio.Redis.from_url(self.url)
+            self._loop = loop
+        return self._client
+
+    def seq_key(self, user_id):
+        return f"{self.prefix}:{user_id}:seq"
+
+    def log_key(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    async def append(self, events_by_user):
+        from redis.exceptions import RedisError
+
+        user_ids = list(events_by_user)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.eval(
+                        self.APPEND_SCRIPT,
+                        2,
+                        self.seq_key(user_id),
+                        self.log_key(user_id),
+                        JsonCodec.encode(events_by_user[user_id]),
+                        self.maxlen,
+                        self.ttl,
+                    )
+                seqs = await pipe.execute()
+        except RedisError:
+            # Live delivery still happens; reconnecting clients fall back to a resync.
+            logger.exception("Failed to append to the delivery log of users %s", user_ids)
+            return {}
+        return dict(zip(user_ids, seqs))
+
+    async def since(self, user_id, last_seq):
+        from redis.exceptions import RedisError
+
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.get(self.seq_key(user_id))
+                pipe.zrange(self.log_key(user_id), 0, 0, withscores=True)
+                pipe.zrangebyscore(self.log_key(user_id), f"({last_seq}", "+inf")
+                current_seq, oldest, members = await pipe.execute()
+        except RedisError:
+            logger.exception("Failed to read the delivery log of user %s", user_id)
+            return Replay([], 0, False)
+
+        entries = []
+        for member in members:
+            seq, _, payload = member.partition(b":")
+            entries.append((int(seq), JsonCodec.decode(payload)))
+        oldest_seq = int(oldest[0][1]) if oldest else None
+        current_seq = int(current_seq or 0)
+        return Replay(entries, current_seq, _is_complete(last_seq, current_seq, oldest_seq))
+
+def build_delivery_log():
+    maxlen = getattr(settings, "CHAT_DELIVERY_LOG_SIZE", 200)
+    if getattr(settings, "CHAT_DELIVERY_LOG_BACKEND", "local") == "redis":
+        return RedisDeliveryLog(
+            settings.CHAT_DELIVERY_LOG_REDIS_URL,
+            maxlen=maxlen,
+            ttl=getattr(settings, "CHAT_DELIVERY_LOG_TTL", 86400),
+        )
+    return LocalDeliveryLog(maxlen=maxlen)
+
+delivery_log = build_delivery_log()
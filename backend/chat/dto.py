@@ -1,6 +1,45 @@
 from rest_framework import serializers
 
+from backend.chat.pagination import decode_search_cursor
+
 class GetUsersListDTO(serializers.Serializer):
   limit = serializers.IntegerField(min_value=1, required=True)
   offset = serializers.IntegerField(min_value=0, required=True)
-  query = serializers.CharField(max_length=255, required=False, allow_null=True)
\ No newline at end of file
+  query = serializers.CharField(max_length=255, required=False, allow_null=True)
+
+class GetMessagesRequestDTO(serializers.Serializer):
+  limit = serializers.IntegerField(min_value=1, default=20)
+  offset = serializers.IntegerField(min_value=0, default=0)
+  before_id = serializers.IntegerField(min_value=1, required=False)
+  after_id = serializers.IntegerField(min_value=1, required=False)
+  # Defaults to true for offset paging and false for cursor paging.
+  count = serializers.BooleanField(required=False)
+
+  def validate(self, data):
+    if "before_id" in data and "after_id" in data:
+      raise serializers.ValidationError("Use either before_id or after_id, not both.")
+    return data
+
+class SearchMessagesRequestDTO(serializers.Serializer):
+  q = serializers.CharField(min_length=1, max_length=255, required=True)
+  limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+  cursor = serializers.CharField(max_length=64, required=False)
+  # Restricts the search to the conversation with this user.
+  other_person_id = serializers.IntegerField(min_value=1, required=False)
+
+  def validate_cursor(self, value):
+    cursor = decode_search_cursor(value)
+    if cursor is None:
+      raise serializers.ValidationError("Invalid cursor.")
+    return cursor
+
+class MarkMessagesReadRequestDTO(serializers.Serializer):
+  # Last message the reader has seen; everything when omitted.
+  lastMessageId = serializers.IntegerField(min_value=1, required=False)
+
+class GetConversationMessagesRequestDTO(serializers.Serializer):
+  limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+  before_id = serializers.IntegerField(min_value=1, required=False)
+
+class MarkConversationReadRequestDTO(serializers.Serializer):
+  lastMessageId = serializers.IntegerField(min_value=1, required=True)
@@ -0,0 +1,104 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from backend.users.models import User
+
+def sanitize_group_name(name: str) -> str:
+    # Replace all invalid characters with an underscore
+    return re.sub(r"[^a-zA-Z0-9_\-.]", "_", name)[:100]
+
+def user_group_name(user_uuid) -> str:
+    """Channel layer group that every socket of a user joins."""
+    return sanitize_group_name(f"group_{user_uuid}")
+
+class UserGroupCache:
+    """
+    Bounded LRU of ``user id -> group name`` with a per-entry TTL.
+
+    A user's uuid never changes, so the only way an entry goes stale is the
+    user being deleted; ``backend.chat.signals`` invalidates on delete and the
+    TTL bounds anything that slips past it (e.g. deletes from another process).
+    Shared by every consumer in the process, so it is guarded by a lock.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            group_name, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return group_name
+
+    def set(self, user_id, group_name):
+        with self._lock:
+            self._entries[user_id] = (group_name, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+user_group_cache = UserGroupCache(
+    maxsize=getattr(settings, "CHAT_GROUP_CACHE_SIZE", 10_000),
+    ttl=getattr(settings, "CHAT_GROUP_CACHE_TTL", 300),
+)
+
+def _normalize_user_id(user_id):
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+def get_user_group_name(user_id):
+    """Resolve a user id to its group name, or ``None`` if there is no such user."""
+    user_id = _normalize_user_id(user_id)
+    if user_id is None:
+        return None
+
+    group_name = user_group_cache.get(user_id)
+    if group_name is not None:
+        return group_name
+
+    user_uuid = User.objects.filter(id=user_id).values_list("uuid", flat=True).first()
+    if user_uuid is None:
+        return None
+
+    group_name = user_group_name(user_uuid)
+    user_group_cache.set(user_id, group_name)
+    return group_name
+
+async def aget_user_group_name(user_id):
+    """Async variant of ``get_user_group_name`` that only leaves the loop on a miss."""
+    user_id = _normalize_user_id(user_id)
+    if user_id is None:
+        return None
+
+    group_name = user_group_cache.get(user_id)
+    if group_name is not None:
+        return group_name
+
+    return await database_sync_to_async(get_user_group_name)(user_id)
@@ -0,0 +1,54 @@
+"""
+Move old, read chat messages from ``chat_message`` to ``chat_archivedmessage``.
+
+Meant to run daily from cron; each run rolls the hot/cold boundary forward
+to ``--older-than-days`` ago. Works in send-order batches, each moved in one
+short transaction, so it can run next to live traffic and be stopped at any
+point.
+
+    python manage.py archive_chat_messages --older-than-days 180
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.chat.models import ArchivedMessage
+
+
+class Command(BaseCommand):
+  help = "Archive read chat messages older than the retention window."
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--older-than-days",
+      type=int,
+      default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+      help="Archive messages sent more than this many days ago.",
+    )
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Messages scanned per batch.")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches.")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would move without moving it.")
+
+  def handle(self, *args, **options):
+    before = timezone.now() - datetime.timedelta(days=options["older_than_days"])
+    last_scanned = None
+    moved = 0
+    done = False
+
+    while not done:
+      ids, last_scanned, done = ArchivedMessage.objects.archivable(
+        before, after=last_scanned, limit=options["batch_size"]
+      )
+      moved += len(ids) if options["dry_run"] else ArchivedMessage.objects.archive(ids)
+      progress = f" (up to {last_scanned[0]:%Y-%m-%d %H:%M})" if last_scanned else ""
+      self.stdout.write(f"{'would archive' if options['dry_run'] else 'archived'} {moved}{progress}", ending="\r")
+      if options["pause"] and not done:
+        time.sleep(options["pause"])
+
+    self.stdout.write("")
+    self.stdout.write(self.style.SUCCESS(
+      f"{'Would archive' if options['dry_run'] else 'Archived'} {moved} messages sent before {before:%Y-%m-%d}."
+    ))
@@ -0,0 +1,230 @@
+"""
+Load benchmark for ``ChatConsumer`` against the in-memory channel layer.
+
+Creates throwaway users, connects one socket per user, pairs them up and has
+every user send ``--messages`` chat messages to its partner. Reports delivered
+messages per second and the fan-out latency (send -> recipient frame).
+
+The typing scenario instead has every user report a keystroke every
+``--keystroke-interval`` seconds and counts how many typing events the
+debouncer actually fans out through the channel layer.
+
+    python manage.py chat_bench --users 200 --messages 20
+    python manage.py chat_bench --persistence both
+    python manage.py chat_bench --scenario typing --keystrokes 100
+"""
+import asyncio
+import json
+import statistics
+import time
+
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from backend.chat.middleware import JWTAuthMiddleware
+from backend.chat.models import Message
+from backend.chat.routing import websocket_urlpatterns
+from backend.chat.writer import message_writer
+from backend.tracing import metrics
+from backend.users.models import User
+from backend.users.tokens import access_token_for
+
+BENCH_EMAIL_DOMAIN = "chat-bench.local"
+
+
+def percentile(values, pct):
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+  return ordered[index]
+
+
+class Command(BaseCommand):
+  help = "Benchmark ChatConsumer message fan-out on the in-memory channel layer."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--users", type=int, default=100, help="Number of connected users (rounded down to even).")
+    parser.add_argument("--messages", type=int, default=10, help="Messages sent by each user.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-frame receive timeout in seconds.")
+    parser.add_argument(
+      "--persistence",
+      choices=["inline", "write-behind", "both"],
+      default="inline",
+      help="Store messages before fan-out (inline), after it (write-behind), or compare both.",
+    )
+    parser.add_argument("--scenario", choices=["messages", "typing"], default="messages")
+    parser.add_argument("--keystrokes", type=int, default=50, help="Typing updates sent by each user (typing scenario).")
+    parser.add_argument("--keystroke-interval", type=float, default=0.05, help="Seconds between typing updates.")
+
+  def handle(self, *args, **options):
+    user_count = max(2, options["users"] - options["users"] % 2)
+    users = self.create_users(user_count)
+    modes = ["inline", "write-behind"] if options["persistence"] == "both" else [options["persistence"]]
+
+    previous_layer = channel_layers.set(DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer(capacity=100_000))
+    # The bench measures throughput, so rate limits and slow-socket closing are lifted.
+    unlimited = override_settings(
+      CHAT_RATE_LIMITS={"default": (float("inf"), float("inf"))},
+      CHAT_OUTBOUND_CLOSE_LAG=float("inf"),
+    )
+    unlimited.enable()
+    try:
+      if options["scenario"] == "typing":
+        results = asyncio.run(self.run_typing(
+          users, options["keystrokes"], options["keystroke_interval"], options["timeout"],
+        ))
+        self.report_typing(results)
+        return
+
+      for mode in modes:
+        metrics.reset()
+        with override_settings(CHAT_WRITE_BEHIND=mode == "write-behind"):
+          results = asyncio.run(self.run(users, options["messages"], options["timeout"]))
+        results["persistence"] = mode
+        results["persisted"] = Message.objects.filter(sender__in=users).count()
+        Message.objects.filter(sender__in=users).delete()
+        self.report(results)
+    finally:
+      unlimited.disable()
+      channel_layers.set(DEFAULT_CHANNEL_LAYER, previous_layer)
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def create_users(self, count):
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    User.objects.bulk_create(
+      User(email=f"user{i}@{BENCH_EMAIL_DOMAIN}", full_name=f"Bench User {i}")
+      for i in range(count)
+    )
+    return list(User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").order_by("id"))
+
+  async def connect_all(self, users, timeout):
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    communicators = []
+    for user in users:
+      communicator = WebsocketCommunicator(application, f"chat/{user.id}/?token={access_token_for(user)}")
+      connected, _ = await communicator.connect(timeout=timeout)
+      if not connected:
+        raise RuntimeError(f"User {user.id} failed to connect")
+      communicators.append(communicator)
+    return communicators
+
+  async def run(self, users, messages_per_user, timeout):
+    connect_started = time.perf_counter()
+    communicators = await self.connect_all(users, timeout)
+    connect_elapsed = time.perf_counter() - connect_started
+
+    latencies = []
+
+    async def sender(index):
+      partner = users[index ^ 1]
+      for _ in range(messages_per_user):
+        await communicators[index].send_to(text_data=json.dumps({
+          "type": "send_message",
+          "recipient_id": partner.id,
+          "message": repr(time.perf_counter()),
+        }))
+
+    async def receiver(index):
+      # Every user receives its partner's messages plus the echo of its own.
+      for _ in range(messages_per_user * 2):
+        frame = json.loads(await communicators[index].receive_from(timeout=timeout))
+        message = frame["message"]
+        if not message["isSent"]:
+          latencies.append(time.perf_counter() - float(message["content"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(
+      *(sender(i) for i in range(len(users))),
+      *(receiver(i) for i in range(len(users))),
+    )
+    elapsed = time.perf_counter() - started
+
+    for communicator in communicators:
+      await communicator.disconnect()
+    await message_writer.flush()
+
+    return {
+      "users": len(users),
+      "messages": len(latencies),
+      "elapsed": elapsed,
+      "connect_elapsed": connect_elapsed,
+      "latencies": latencies,
+    }
+
+  async def run_typing(self, users, keystrokes, interval, timeout):
+    communicators = await self.connect_all(users, timeout)
+
+    layer = channel_layers[DEFAULT_CHANNEL_LAYER]
+    group_sends = 0
+    original_group_send = layer.group_send
+
+    async def counting_group_send(group, message):
+      nonlocal group_sends
+      group_sends += 1
+      await original_group_send(group, message)
+
+    layer.group_send = counting_group_send
+
+    async def typist(index):
+      partner = users[index ^ 1]
+      for _ in range(keystrokes):
+        await communicators[index].send_to(text_data=json.dumps({
+          "type": "is_typing", "recipient_id": partner.id, "is_typing": True,
+        }))
+        await asyncio.sleep(interval)
+      await communicators[index].send_to(text_data=json.dumps({
+        "type": "is_typing", "recipient_id": partner.id, "is_typing": False,
+      }))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(typist(i) for i in range(len(users))))
+    # Let trailing (held back) stop events go out before counting.
+    await asyncio.sleep(settings.CHAT_TYPING_WINDOW + 0.1)
+    elapsed = time.perf_counter() - started
+
+    frames = 0
+    for communicator in communicators:
+      while not await communicator.receive_nothing(timeout=0.01):
+        await communicator.receive_from(timeout=timeout)
+        frames += 1
+
+    layer.group_send = original_group_send
+    for communicator in communicators:
+      await communicator.disconnect()
+
+    return {
+      "users": len(users),
+      "updates": len(users) * (keystrokes + 1),
+      "group_sends": group_sends,
+      "frames": frames,
+      "elapsed": elapsed,
+    }
+
+  def report_typing(self, results):
+    self.stdout.write(f"users:            {results['users']}")
+    self.stdout.write(f"typing updates:   {results['updates']}")
+    self.stdout.write(f"group_send calls: {results['group_sends']}")
+    self.stdout.write(f"frames delivered: {results['frames']}")
+    self.stdout.write(f"fan-out ratio:    {results['group_sends'] / results['updates']:.3f}")
+    self.stdout.write(f"elapsed:          {results['elapsed']:.3f}s")
+    self.stdout.write("")
+
+  def report(self, results):
+    latencies_ms = [latency * 1000 for latency in results["latencies"]]
+    self.stdout.write(f"persistence:      {results['persistence']}")
+    self.stdout.write(f"users:            {results['users']}")
+    self.stdout.write(f"messages:         {results['messages']}")
+    self.stdout.write(f"persisted:        {results['persisted']}")
+    self.stdout.write(f"connect time:     {results['connect_elapsed']:.3f}s")
+    self.stdout.write(f"elapsed:          {results['elapsed']:.3f}s")
+    self.stdout.write(f"messages/sec:     {results['messages'] / results['elapsed']:.1f}")
+    self.stdout.write(f"fan-out p50:      {statistics.median(latencies_ms):.2f}ms")
+    self.stdout.write(f"fan-out p99:      {percentile(latencies_ms, 99):.2f}ms")
+    for name, timing in sorted(metrics.snapshot()["timings"].items()):
+      self.stdout.write(f"  {name:<16} n={timing['count']:<6} avg={timing['avgMs']:.3f}ms max={timing['maxMs']:.3f}ms")
+    self.stdout.write("")
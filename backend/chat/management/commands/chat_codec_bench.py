@@ -0,0 +1,76 @@
+"""
+Compare the chat wire formats on representative outbound chat frames.
+
+Reports bytes on the wire and encode/decode CPU time per 10k messages for
+plain ``json``, the default JSON codec and the compact MessagePack codec.
+Frames are encoded with ``encode_chat``, the path ``ChatConsumer`` sends chat
+messages through.
+
+    python manage.py chat_codec_bench --messages 100000
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.chat import codecs
+
+
+class StdlibJsonCodec:
+  binary = False
+  encode = staticmethod(json.dumps)
+  decode = staticmethod(json.loads)
+
+  @staticmethod
+  def encode_chat(message, seq, is_sent):
+    return json.dumps(codecs.chat_frame(message, seq, is_sent))
+
+
+class Command(BaseCommand):
+  help = "Benchmark bytes and CPU per 10k chat frames for each wire format."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--messages", type=int, default=100_000, help="Frames encoded and decoded per codec.")
+    parser.add_argument("--content-length", type=int, default=40, help="Characters of message content.")
+
+  def handle(self, *args, **options):
+    messages = self.build_messages(options["messages"], options["content_length"])
+
+    candidates = [("json (stdlib)", StdlibJsonCodec)]
+    if codecs.orjson is not None:
+      candidates.append(("json (default codec)", codecs.JsonCodec))
+    if codecs.msgpack is not None:
+      candidates.append((codecs.COMPACT_SUBPROTOCOL, codecs.CompactCodec))
+
+    per = 10_000 / len(messages)
+    self.stdout.write(f"{'codec':<22} {'bytes/10k':>12} {'encode/10k':>12} {'decode/10k':>12}")
+    for name, codec in candidates:
+      started = time.process_time()
+      encoded = [codec.encode_chat(message, seq, bool(seq % 2)) for seq, message in enumerate(messages)]
+      encode_cpu = time.process_time() - started
+
+      started = time.process_time()
+      for data in encoded:
+        codec.decode(data)
+      decode_cpu = time.process_time() - started
+
+      size = sum(len(data.encode() if isinstance(data, str) else data) for data in encoded)
+      self.stdout.write(
+        f"{name:<22} {size * per:>12,.0f} {encode_cpu * per * 1000:>10.1f}ms {decode_cpu * per * 1000:>10.1f}ms"
+      )
+
+  def build_messages(self, count, content_length):
+    # Payloads as ChatConsumer fans them out; encode_chat turns each into a frame.
+    sent_date = timezone.now().isoformat()
+    content = ("lorem ipsum dolor sit amet " * (content_length // 27 + 1))[:content_length]
+    return [
+      {
+        "id": 1_000_000 + i,
+        "senderId": 7,
+        "content": content,
+        "isRead": False,
+        "sentDate": sent_date,
+      }
+      for i in range(count)
+    ]
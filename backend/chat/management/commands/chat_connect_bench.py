@@ -0,0 +1,71 @@
+"""
+Benchmark chat socket handshakes through ``JWTAuthMiddleware``.
+
+Opens and closes ``--connects`` sockets (spread over ``--users`` users) on
+the in-memory channel layer and reports connects per second and database
+queries per connect, for access tokens carrying the uuid/user_type claims
+(``UserRefreshToken``) and for plain simplejwt tokens, which still need a
+user lookup.
+
+    python manage.py chat_connect_bench --connects 2000
+"""
+import asyncio
+import time
+
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.chat.management.commands.chat_loadtest import QueryCounter
+from backend.chat.middleware import JWTAuthMiddleware
+from backend.chat.routing import websocket_urlpatterns
+from backend.users.models import User
+from backend.users.tokens import access_token_for
+
+BENCH_EMAIL_DOMAIN = "chat-connect-bench.local"
+
+
+class Command(BaseCommand):
+  help = "Measure chat socket connects/sec and queries per connect with JWT handshakes."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--connects", type=int, default=1_000, help="Sockets opened (and closed) per mode.")
+    parser.add_argument("--users", type=int, default=100, help="Distinct users the sockets belong to.")
+
+  def handle(self, *args, **options):
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    User.objects.bulk_create(User(email=f"user{i}@{BENCH_EMAIL_DOMAIN}") for i in range(options["users"]))
+    users = list(User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}"))
+
+    counter = QueryCounter()
+    counter.install()
+    previous_layer = channel_layers.set(DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer())
+    try:
+      modes = (
+        ("token with claims", {user.id: access_token_for(user) for user in users}),
+        ("plain token", {user.id: str(RefreshToken.for_user(user).access_token) for user in users}),
+      )
+      for name, tokens in modes:
+        before = counter.count
+        elapsed = asyncio.run(self.run(users, tokens, options["connects"]))
+        queries = counter.count - before
+        self.stdout.write(f"{name}:")
+        self.stdout.write(f"  connects/sec:     {options['connects'] / elapsed:.1f}")
+        self.stdout.write(f"  queries/connect:  {queries / options['connects']:.2f}")
+    finally:
+      channel_layers.set(DEFAULT_CHANNEL_LAYER, previous_layer)
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  async def run(self, users, tokens, connects):
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    started = time.perf_counter()
+    for i in range(connects):
+      user = users[i % len(users)]
+      communicator = WebsocketCommunicator(application, f"chat/{user.id}/?token={tokens[user.id]}")
+      connected, _ = await communicator.connect()
+      if not connected:
+        raise RuntimeError(f"User {user.id} failed to connect")
+      await communicator.disconnect()
+    return time.perf_counter() - started
@@ -0,0 +1,111 @@
+"""
+Count Redis work per chat message fan-out on the configured Redis channel layer.
+
+Puts ``--sockets`` channels in a recipient group and in a sender group (as
+if each user had that many tabs open, each served by a different worker
+process) and delivers ``--messages`` chat events to both groups, first with
+two ``group_send`` calls (the old path) and then with ``group_send_many``.
+Reports client round trips and Redis commands per message for each.
+
+Runs under its own key prefix, which is flushed afterwards, so it does not
+touch live channels.
+
+    python manage.py chat_fanout_bench --messages 1000 --sockets 2
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from redis.asyncio.connection import AbstractConnection
+
+from backend.chat.fanout import RedisChannelLayer, group_send_many
+
+BENCH_PREFIX = "asgi-fanout-bench"
+
+
+class RedisOpCounter:
+  """Counts what redis-py puts on the wire: packed writes and commands."""
+
+  def __init__(self):
+    self.round_trips = 0
+    self.commands = 0
+
+  def __enter__(self):
+    self.original_send = AbstractConnection.send_packed_command
+    self.original_pack = AbstractConnection.pack_command
+    counter = self
+
+    async def send_packed_command(connection, command, check_health=True):
+      counter.round_trips += 1
+      return await counter.original_send(connection, command, check_health)
+
+    def pack_command(connection, *args):
+      counter.commands += 1
+      return counter.original_pack(connection, *args)
+
+    AbstractConnection.send_packed_command = send_packed_command
+    AbstractConnection.pack_command = pack_command
+    return self
+
+  def __exit__(self, *exc):
+    AbstractConnection.send_packed_command = self.original_send
+    AbstractConnection.pack_command = self.original_pack
+
+
+class Command(BaseCommand):
+  help = "Compare Redis round trips per chat message for group_send vs group_send_many."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--sockets", type=int, default=1, help="Sockets per user.")
+
+  def handle(self, *args, **options):
+    config = settings.CHANNEL_LAYERS["default"]
+    if RedisChannelLayer is None or "RedisChannelLayer" not in config["BACKEND"]:
+      raise CommandError("chat_fanout_bench needs the Redis channel layer.")
+
+    layer_config = {**config.get("CONFIG", {}), "prefix": BENCH_PREFIX, "capacity": options["messages"] * 2 + 10}
+    asyncio.run(self.run(layer_config, options["messages"], options["sockets"]))
+
+  async def run(self, layer_config, message_count, sockets):
+    layer = RedisChannelLayer(**layer_config)
+    groups = ["group_fanout_bench_recipient", "group_fanout_bench_sender"]
+
+    async def join_groups():
+      for group in groups:
+        for _ in range(sockets):
+          # A layer instance per socket stands in for a separate worker process.
+          await layer.group_add(group, await RedisChannelLayer(**layer_config).new_channel())
+
+    try:
+      async def sequential(event):
+        for group in groups:
+          await layer.group_send(group, event)
+
+      async def pipelined(event):
+        await group_send_many(layer, groups, event)
+
+      for name, send in (("group_send x2", sequential), ("group_send_many", pipelined)):
+        await layer.flush()
+        await join_groups()
+        # Warm up the connection pool so connection setup is not counted.
+        await send(self.event(0))
+        with RedisOpCounter() as counter:
+          started = time.perf_counter()
+          for i in range(message_count):
+            await send(self.event(i))
+          elapsed = time.perf_counter() - started
+        self.stdout.write(f"{name}:")
+        self.stdout.write(f"  round trips/msg: {counter.round_trips / message_count:.2f}")
+        self.stdout.write(f"  commands/msg:    {counter.commands / message_count:.2f}")
+        self.stdout.write(f"  messages/sec:    {message_count / elapsed:.1f}")
+    finally:
+      await layer.flush()
+
+  @staticmethod
+  def event(i):
+    return {
+      "type": "chat_message",
+      "message": {"id": i, "senderId": 1, "content": "hello", "isRead": False, "sentDate": "2026-01-01T00:00:00"},
+    }
@@ -0,0 +1,83 @@
+"""
+Benchmark MessageListView paging over one long conversation.
+
+Seeds ``--messages`` messages between two throwaway users and times a page at
+several depths with offset paging and with keyset (``before_id``) paging.
+
+    python manage.py chat_history_bench --messages 1000000
+"""
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.chat.models import Message
+from backend.chat.pagination import keyset_page, offset_page
+from backend.users.models import User
+
+BENCH_EMAIL_DOMAIN = "chat-history-bench.local"
+
+
+class Command(BaseCommand):
+  help = "Compare offset and keyset paging of a seeded chat conversation."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--messages", type=int, default=1_000_000, help="Messages to seed in the conversation.")
+    parser.add_argument("--limit", type=int, default=20, help="Page size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per depth.")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded conversation for the next run.")
+
+  def handle(self, *args, **options):
+    user, other = self.get_users()
+    seeded = Message.objects.between(user.id, other.id).count()
+    if seeded != options["messages"]:
+      Message.objects.between(user.id, other.id).delete()
+      self.seed(user, other, options["messages"])
+
+    ids = list(Message.objects.between(user.id, other.id).values_list("id", flat=True))
+    limit = options["limit"]
+
+    self.stdout.write(f"{'depth':>10} {'offset ms':>12} {'keyset ms':>12}")
+    for fraction in (0, 0.1, 0.5, 0.9, 0.999):
+      depth = int(len(ids) * fraction)
+      # What MessageListView pages: the hot and the archived table.
+      queryset = Message.objects.history(user.id, other.id)
+
+      offset_ms = self.time(lambda: offset_page(queryset, depth, limit), options["repeat"])
+      before_id = ids[depth - 1] if depth else None
+      keyset_ms = self.time(lambda: keyset_page(queryset, limit, before_id=before_id), options["repeat"])
+
+      self.stdout.write(f"{depth:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+
+    if not options["keep"]:
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def get_users(self):
+    user, _ = User.objects.get_or_create(email=f"user@{BENCH_EMAIL_DOMAIN}")
+    other, _ = User.objects.get_or_create(email=f"other@{BENCH_EMAIL_DOMAIN}")
+    return user, other
+
+  def seed(self, user, other, count, batch_size=10_000):
+    started_at = timezone.now() - datetime.timedelta(seconds=count)
+    for start in range(0, count, batch_size):
+      Message.objects.bulk_create(
+        Message(
+          sender=user if i % 2 else other,
+          recipient=other if i % 2 else user,
+          content=f"message {i}",
+          timestamp=started_at + datetime.timedelta(seconds=i),
+        )
+        for i in range(start, min(start + batch_size, count))
+      )
+      self.stdout.write(f"seeded {min(start + batch_size, count)}/{count}", ending="\r")
+    self.stdout.write("")
+
+  def time(self, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+      started = time.perf_counter()
+      fn()
+      timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
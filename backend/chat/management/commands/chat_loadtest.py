@@ -0,0 +1,323 @@
+"""
+Multi-process load test for ``ChatConsumer`` over a shared Redis channel layer.
+
+Starts ``--processes`` worker processes, each standing in for one Daphne
+process: it runs its own ASGI application, event loop, channel layer client
+and database connections, and connects its share of ``--users`` through
+``WebsocketCommunicator``. Users are paired so that partners always live in
+different workers whenever there is more than one, so every delivery crosses
+processes through Redis.
+
+Phases, each started on all workers at once:
+
+1. connect: every user opens a socket; connect latency per socket.
+2. messages: every user sends ``--messages`` chat messages to its partner;
+   delivery latency (send -> partner frame) and DB queries per message.
+3. calls: every other user rings its partner ``--calls`` times and the
+   partner accepts; one-way signalling latency and initiate -> accepted
+   round trip.
+
+``--fake-redis`` runs an in-process fakeredis server (``fakeredis[lua]``, a
+dev requirement) so no Redis install is needed; otherwise ``--redis-url`` is
+used. The run uses its own channel layer prefix.
+
+    python manage.py chat_loadtest --users 200 --processes 4 --messages 20 --fake-redis
+"""
+import asyncio
+import json
+import multiprocessing
+import statistics
+import threading
+import time
+import uuid
+
+from channels.layers import DEFAULT_CHANNEL_LAYER, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from backend.chat.fanout import RedisChannelLayer
+from backend.chat.management.commands.chat_bench import percentile
+from backend.chat.middleware import JWTAuthMiddleware
+from backend.chat.models import Contact, Message
+from backend.chat.routing import websocket_urlpatterns
+from backend.chat.writer import message_writer
+from backend.users.models import User
+from backend.users.tokens import access_token_for
+
+BENCH_EMAIL_DOMAIN = "chat-loadtest.local"
+
+
+class QueryCounter:
+  """Counts SQL statements on every database connection this process opens."""
+
+  def __init__(self):
+    self.count = 0
+    self._lock = threading.Lock()
+
+  def __call__(self, execute, sql, params, many, context):
+    with self._lock:
+      self.count += 1
+    return execute(sql, params, many, context)
+
+  def install(self):
+    def on_connection_created(sender, connection, **kwargs):
+      # Fires again whenever a wrapper reconnects (database_sync_to_async
+      # closes stale connections), so only wrap once.
+      if self not in connection.execute_wrappers:
+        connection.execute_wrappers.append(self)
+
+    connection_created.connect(on_connection_created, weak=False)
+
+
+class Command(BaseCommand):
+  help = "Load test ChatConsumer across several worker processes sharing a Redis channel layer."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--users", type=int, default=100, help="Connected users (rounded down to even).")
+    parser.add_argument("--processes", type=int, default=2, help="Worker processes standing in for Daphne processes.")
+    parser.add_argument("--messages", type=int, default=10, help="Chat messages sent by each user.")
+    parser.add_argument("--calls", type=int, default=3, help="Calls each caller places to its partner.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-frame receive timeout in seconds.")
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:6379", help="Redis for the channel layer.")
+    parser.add_argument("--fake-redis", action="store_true", help="Run an in-process fakeredis server instead.")
+
+  def handle(self, *args, **options):
+    user_count = max(2, options["users"] - options["users"] % 2)
+    processes = max(1, options["processes"])
+
+    redis_url = options["redis_url"]
+    server = None
+    if options["fake_redis"]:
+      server = self.start_fake_redis()
+      redis_url = "redis://{}:{}".format(*server.server_address)
+
+    layer_config = {"hosts": [redis_url], "prefix": f"asgi-loadtest-{uuid.uuid4().hex[:8]}", "capacity": 10_000}
+    users = self.create_users(user_count)
+    user_ids = [user.id for user in users]
+    tokens = {user.id: access_token_for(user) for user in users}
+
+    # Workers are forked; they must not share the parent's sockets.
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+      context.Process(
+        target=run_worker,
+        args=(index, processes, user_ids, tokens, layer_config, options, barrier, results),
+      )
+      for index in range(processes)
+    ]
+    try:
+      for worker in workers:
+        worker.start()
+      reports = [results.get(timeout=options["timeout"] * 10) for _ in workers]
+      for worker in workers:
+        worker.join()
+    finally:
+      for worker in workers:
+        if worker.is_alive():
+          worker.terminate()
+      if server is not None:
+        server.shutdown()
+      Contact.objects.filter(user_one__in=user_ids).delete()
+      Message.objects.filter(sender__in=user_ids).delete()
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+    errors = [report["error"] for report in reports if "error" in report]
+    if errors:
+      raise CommandError("Worker failed: " + "; ".join(errors))
+    self.report(reports, user_count, processes)
+
+  def start_fake_redis(self):
+    try:
+      from fakeredis import TcpFakeServer
+    except ImportError:
+      raise CommandError("--fake-redis needs fakeredis[lua] (requirements/local.txt).")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+  def create_users(self, count):
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    User.objects.bulk_create(
+      User(email=f"user{i}@{BENCH_EMAIL_DOMAIN}", full_name=f"Load User {i}")
+      for i in range(count)
+    )
+    return list(User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").order_by("id"))
+
+  def report(self, reports, user_count, processes):
+    def merged(key):
+      return [value * 1000 for report in reports for value in report[key]]
+
+    def line(name, values):
+      if not values:
+        self.stdout.write(f"{name:<22} n=0")
+        return
+      self.stdout.write(
+        f"{name:<22} n={len(values):<7} p50={statistics.median(values):8.2f}ms "
+        f"p95={percentile(values, 95):8.2f}ms p99={percentile(values, 99):8.2f}ms max={max(values):8.2f}ms"
+      )
+
+    messages = sum(len(report["delivery"]) for report in reports)
+    queries = sum(report["message_queries"] for report in reports)
+    elapsed = max(report["message_elapsed"] for report in reports)
+
+    self.stdout.write(f"processes:             {processes}")
+    self.stdout.write(f"users:                 {user_count}")
+    line("connect", merged("connect"))
+    line("message delivery", merged("delivery"))
+    line("call signalling", merged("signalling"))
+    line("call round trip", merged("call_rtt"))
+    self.stdout.write(f"messages/sec:          {messages / elapsed:.1f}" if elapsed else "messages/sec: n/a")
+    self.stdout.write(f"DB queries/message:    {queries / messages:.2f}" if messages else "DB queries/message: n/a")
+
+
+def run_worker(index, processes, user_ids, tokens, layer_config, options, barrier, results):
+  """Entry point of one worker process; puts its measurements on ``results``."""
+  try:
+    connections.close_all()
+    counter = QueryCounter()
+    counter.install()
+    channel_layers.set(DEFAULT_CHANNEL_LAYER, RedisChannelLayer(**layer_config))
+    # Measures the system, not the per-socket guards.
+    with override_settings(
+      CHAT_RATE_LIMITS={"default": (float("inf"), float("inf"))},
+      CHAT_OUTBOUND_CLOSE_LAG=float("inf"),
+      CHAT_MAX_CONNECTIONS_PER_USER=len(user_ids),
+    ):
+      report = asyncio.run(Worker(index, processes, user_ids, tokens, options, barrier, counter).run())
+    results.put(report)
+  except Exception as e:
+    barrier.abort()
+    results.put({"error": f"worker {index}: {e!r}"})
+
+
+class Worker:
+  def __init__(self, index, processes, user_ids, tokens, options, barrier, counter):
+    # User i talks to user i ^ 1; with more than one process the pair is split.
+    self.user_ids = [user_id for i, user_id in enumerate(user_ids) if i % processes == index]
+    self.partner_of = {user_ids[i]: user_ids[i ^ 1] for i in range(len(user_ids))}
+    self.callers = {user_ids[i] for i in range(0, len(user_ids), 2)}
+    self.tokens = tokens
+    self.options = options
+    self.timeout = options["timeout"]
+    self.barrier = barrier
+    self.counter = counter
+
+  async def sync(self):
+    await asyncio.get_running_loop().run_in_executor(None, self.barrier.wait)
+
+  async def run(self):
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    self.sockets = {}
+    connect_latencies = []
+
+    await self.sync()
+    for user_id in self.user_ids:
+      communicator = WebsocketCommunicator(application, f"chat/{user_id}/?token={self.tokens[user_id]}")
+      started = time.perf_counter()
+      connected, _ = await communicator.connect(timeout=self.timeout)
+      if not connected:
+        raise RuntimeError(f"user {user_id} failed to connect")
+      connect_latencies.append(time.perf_counter() - started)
+      self.sockets[user_id] = communicator
+
+    await self.sync()
+    queries_before = self.counter.count
+    started = time.perf_counter()
+    delivery = await self.exchange_messages()
+    if settings.CHAT_WRITE_BEHIND:
+      await message_writer.flush()
+    message_elapsed = time.perf_counter() - started
+    message_queries = self.counter.count - queries_before
+
+    await self.sync()
+    signalling, call_rtt = await self.place_calls()
+
+    await self.sync()
+    for communicator in self.sockets.values():
+      await communicator.disconnect()
+
+    return {
+      "connect": connect_latencies,
+      "delivery": delivery,
+      "message_elapsed": message_elapsed,
+      "message_queries": message_queries,
+      "signalling": signalling,
+      "call_rtt": call_rtt,
+    }
+
+  async def receive(self, user_id):
+    return json.loads(await self.sockets[user_id].receive_from(timeout=self.timeout))
+
+  async def exchange_messages(self):
+    count = self.options["messages"]
+    latencies = []
+
+    async def sender(user_id):
+      for _ in range(count):
+        await self.sockets[user_id].send_to(text_data=json.dumps({
+          "type": "send_message",
+          "recipient_id": self.partner_of[user_id],
+          # Wall clock, so the receiving process can time it.
+          "message": repr(time.time()),
+        }))
+
+    async def receiver(user_id):
+      # The partner's messages plus the echo of this user's own.
+      received = 0
+      while received < count * 2:
+        frame = await self.receive(user_id)
+        if frame.get("type") != "chat":
+          continue
+        received += 1
+        if not frame["message"]["isSent"]:
+          latencies.append(time.time() - float(frame["message"]["content"]))
+
+    await asyncio.gather(
+      *(sender(user_id) for user_id in self.user_ids),
+      *(receiver(user_id) for user_id in self.user_ids),
+    )
+    return latencies
+
+  async def place_calls(self):
+    count = self.options["calls"]
+    signalling = []
+    round_trips = []
+
+    async def caller(user_id):
+      for _ in range(count):
+        started = time.time()
+        await self.sockets[user_id].send_to(text_data=json.dumps({
+          "type": "initiate_call",
+          "otherPersonId": self.partner_of[user_id],
+          "meetingLink": repr(started),
+          "otherPersonName": "Load User",
+          "otherPersonAvatarUrl": None,
+        }))
+        while (await self.receive(user_id)).get("type") != "call_accepted":
+          pass
+        round_trips.append(time.time() - started)
+
+    async def callee(user_id):
+      for _ in range(count):
+        frame = await self.receive(user_id)
+        while frame.get("type") != "incoming_call":
+          frame = await self.receive(user_id)
+        signalling.append(time.time() - float(frame["callInfo"]["meetingLink"]))
+        await self.sockets[user_id].send_to(text_data=json.dumps({
+          "type": "accept_call",
+          "otherPersonId": frame["callInfo"]["otherPersonId"],
+        }))
+
+    await asyncio.gather(*(
+      caller(user_id) if user_id in self.callers else callee(user_id)
+      for user_id in self.user_ids
+    ))
+    return signalling, round_trips
@@ -0,0 +1,106 @@
+"""
+Benchmark chat message search on a seeded message table.
+
+Seeds ``--messages`` messages spread over ``--users`` throwaway users, all
+talking to one benchmark user, then times a ranked, paged search
+(``MessageManager.search`` + ``search_page``) against the ``icontains`` scan
+it replaces, for a common, a rare and a missing term. On Postgres the plan of
+the indexed query is printed too, to confirm the GIN index is used.
+
+    python manage.py chat_search_bench --messages 2000000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from backend.chat.models import Message
+from backend.chat.pagination import decode_search_cursor, search_page
+from backend.users.models import User
+
+BENCH_EMAIL_DOMAIN = "chat-search-bench.local"
+
+WORDS = (
+  "workout session coach class booking today tomorrow schedule warmup stretch cardio squat "
+  "plank deadlift protein recovery rest mobility running cycling yoga pilates progress goal"
+).split()
+RARE_WORD = "kettlebell"
+
+
+class Command(BaseCommand):
+  help = "Compare indexed full-text message search with an icontains scan."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--messages", type=int, default=2_000_000, help="Messages to seed.")
+    parser.add_argument("--users", type=int, default=1_000, help="Users the benchmark user talks to.")
+    parser.add_argument("--limit", type=int, default=20, help="Page size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded messages for the next run.")
+
+  def handle(self, *args, **options):
+    user, others = self.get_users(options["users"])
+    seeded = Message.objects.filter(sender__email__endswith=f"@{BENCH_EMAIL_DOMAIN}").count()
+    if seeded != options["messages"]:
+      Message.objects.filter(sender__email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+      self.seed(user, others, options["messages"])
+    if connection.vendor == "postgresql":
+      with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Message._meta.db_table}")
+
+    limit = options["limit"]
+    repeat = options["repeat"]
+    mine = Message.objects.filter(sender_id=user.id) | Message.objects.filter(recipient_id=user.id)
+
+    self.stdout.write(f"{'term':<14} {'scan ms':>10} {'search ms':>10} {'page 2 ms':>10}")
+    for term in (WORDS[0], RARE_WORD, "zzzznotthere"):
+      scan_ms = self.time(lambda: list(mine.filter(content__icontains=term).order_by("-id")[:limit]), repeat)
+      search_ms = self.time(lambda: search_page(Message.objects.search(user.id, term), limit), repeat)
+      _, cursor = search_page(Message.objects.search(user.id, term), limit)
+      next_ms = self.time(
+        lambda: search_page(Message.objects.search(user.id, term), limit, decode_search_cursor(cursor)), repeat
+      ) if cursor else 0.0
+      self.stdout.write(f"{term:<14} {scan_ms:>10.2f} {search_ms:>10.2f} {next_ms:>10.2f}")
+
+    if connection.vendor == "postgresql":
+      hot, _ = Message.objects.search(user.id, RARE_WORD)
+      queryset = hot.order_by("-rank", "-id")[:limit]
+      self.stdout.write(queryset.explain(analyze=True))
+
+    if not options["keep"]:
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def get_users(self, count):
+    user, _ = User.objects.get_or_create(email=f"user@{BENCH_EMAIL_DOMAIN}")
+    emails = [f"other{i}@{BENCH_EMAIL_DOMAIN}" for i in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+    User.objects.bulk_create(User(email=email) for email in emails if email not in existing)
+    return user, list(User.objects.filter(email__in=emails))
+
+  def seed(self, user, others, count, batch_size=10_000):
+    rng = random.Random(0)
+    for start in range(0, count, batch_size):
+      batch = []
+      for i in range(start, min(start + batch_size, count)):
+        other = others[i % len(others)]
+        words = rng.choices(WORDS, k=8)
+        if i % 1000 == 0:
+          words[rng.randrange(8)] = RARE_WORD
+        sender, recipient = (user, other) if i % 2 else (other, user)
+        batch.append(Message(
+          sender=sender,
+          recipient=recipient,
+          content=" ".join(words),
+        ))
+      Message.objects.bulk_create(batch)
+      self.stdout.write(f"seeded {min(start + batch_size, count)}/{count}", ending="\r")
+    self.stdout.write("")
+
+  def time(self, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+      started = time.perf_counter()
+      fn()
+      timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,412 @@
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+def ordered_pair(user_a_id, user_b_id):
+    """Contacts always store the smaller user id as ``user_one``."""
+    return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+def up_to_cursor(timestamp, message_id):
+    """Messages at or before the ``(timestamp, id)`` cursor."""
+    return Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=message_id)
+
+def _matching(messages, query):
+    # The search filter of MessageManager.search, for either message table.
+    if connection.vendor != "postgresql":
+        return messages.filter(content__icontains=query).annotate(rank=Value(0.0, output_field=models.FloatField()))
+
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    from backend.chat.models import MESSAGE_SEARCH_CONFIG
+
+    vector = SearchVector("content", config=MESSAGE_SEARCH_CONFIG)
+    search_query = SearchQuery(query, config=MESSAGE_SEARCH_CONFIG, search_type="websearch")
+    return messages.alias(document=vector).filter(document=search_query).annotate(
+        rank=SearchRank(vector, search_query)
+    )
+
+class MessageManager(models.Manager):
+    def between(self, user_id, other_user_id):
+        """Every message of the 1:1 conversation between two users, newest first."""
+        conversation_key = self.model.conversation_key_for(user_id, other_user_id)
+        return self.filter(conversation_key=conversation_key).order_by("-timestamp", "-id")
+
+    def history(self, user_id, other_user_id):
+        """
+        The 1:1 conversation between two users as ``[hot, archived]``
+        querysets, for ``backend.chat.pagination`` to read across both.
+        """
+        from backend.chat.models import ArchivedMessage
+
+        return [self.between(user_id, other_user_id), ArchivedMessage.objects.between(user_id, other_user_id)]
+
+    def search(self, user_id, query, other_user_id=None):
+        """
+        Messages of ``user_id``'s conversations (or only the one with
+        ``other_user_id``) matching ``query``, annotated with ``rank``, as
+        ``[hot, archived]`` querysets for ``backend.chat.pagination.search_page``.
+        Archived messages are searched too, so old messages do not drop out
+        of the results when ``archive_chat_messages`` moves them.
+
+        On Postgres ``query`` is parsed like a web search box and matched
+        through the GIN index on ``to_tsvector(content)`` of each table; the
+        tsvector is only recomputed for matching rows, to rank them. Other
+        backends fall back to a case-insensitive substring scan with a
+        constant rank.
+        """
+        from backend.chat.models import ArchivedMessage
+
+        if other_user_id is not None:
+            mine = Q(conversation_key=self.model.conversation_key_for(user_id, other_user_id))
+        else:
+            mine = Q(sender_id=user_id) | Q(recipient_id=user_id)
+        return [_matching(self.filter(mine), query), _matching(ArchivedMessage.objects.filter(mine), query)]
+
+    def mark_read(self, reader_id, other_user_id, up_to_id=None):
+        """
+        Mark what ``other_user_id`` sent to ``reader_id`` as read, up to and
+        including message ``up_to_id`` (everything when it is None), and take
+        the same number off the reader's unread counter.
+
+        Ids are allocated in blocks per process and do not follow send order,
+        so "up to" is the ``(timestamp, id)`` of ``up_to_id``, the same cursor
+        history pages use. A cursor that is not stored yet (still buffered by
+        the write-behind writer) bounds at the current time.
+
+        Returns ``(read_count, last_read_id)``, the latter being the newest
+        message marked.
+        """
+        from backend.chat.models import Contact
+        from backend.chat.pagination import cursor_timestamp
+
+        conversation_key = self.model.conversation_key_for(reader_id, other_user_id)
+        up_to = None
+        if up_to_id is not None:
+            up_to = (cursor_timestamp(up_to_id) or timezone.now(), up_to_id)
+
+        if connection.vendor == "postgresql":
+            return self._mark_read_returning(conversation_key, reader_id, other_user_id, up_to)
+
+        with transaction.atomic():
+            unread = self.filter(conversation_key=conversation_key, recipient_id=reader_id, is_read=False)
+            if up_to is not None:
+                unread = unread.filter(up_to_cursor(*up_to))
+            last_read = unread.order_by("-timestamp", "-id").values_list("timestamp", "id").first()
+            if last_read is None:
+                return 0, None
+            # Bound by the newest row seen so messages arriving meanwhile stay unread and uncounted.
+            read_count = unread.filter(up_to_cursor(*last_read)).update(is_read=True)
+            Contact.objects.mark_read(reader_id, other_user_id, read_count)
+        return read_count, last_read[1]
+
+    def _mark_read_returning(self, conversation_key, reader_id, other_user_id, up_to):
+        # One statement: the message UPDATE feeds its row count straight into
+        # the contact counter UPDATE through a data-modifying CTE.
+        from backend.chat.models import Contact
+
+        user_one_id, user_two_id = ordered_pair(reader_id, other_user_id)
+        field = Contact.objects.unread_field(user_one_id, reader_id)
+        bound, bound_params = ("AND (timestamp, id) <= (%s, %s)", list(up_to)) if up_to is not None else ("", [])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH marked AS (
+                    UPDATE {self.model._meta.db_table} SET is_read = TRUE
+                    WHERE conversation_key = %s AND recipient_id = %s AND is_read = FALSE {bound}
+                    RETURNING id, timestamp
+                ), counter AS (
+                    UPDATE {Contact._meta.db_table}
+                    SET {field} = GREATEST({field} - (SELECT COUNT(*) FROM marked), 0)
+                    WHERE user_one_id = %s AND user_two_id = %s
+                )
+                SELECT (SELECT COUNT(*) FROM marked),
+                       (SELECT id FROM marked ORDER BY timestamp DESC, id DESC LIMIT 1)
+                """,
+                [conversation_key, reader_id, *bound_params, user_one_id, user_two_id],
+            )
+            return cursor.fetchone()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips Model.save(), so fill the denormalized key here.
+        objs = list(objs)
+        for message in objs:
+            if not message.conversation_key:
+                message.conversation_key = self.model.conversation_key_for(message.sender_id, message.recipient_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
+class ArchivedMessageManager(models.Manager):
+    def between(self, user_id, other_user_id):
+        """Archived part of the 1:1 conversation between two users, newest first."""
+        from backend.chat.models import Message
+
+        conversation_key = Message.conversation_key_for(user_id, other_user_id)
+        return self.filter(conversation_key=conversation_key).order_by("-timestamp", "-id")
+
+    def archivable(self, before, after=None, limit=10_000):
+        """
+        Ids of up to ``limit`` messages past the ``after`` cursor that can move
+        to the archive: sent before ``before``, read, and not a contact's last
+        message. Walks ``(timestamp, id)``, the send order; ids are allocated
+        in blocks per process and do not follow it.
+
+        Returns ``(ids, last_scanned, done)``, ``last_scanned`` being the
+        ``(timestamp, id)`` cursor to pass back as ``after``.
+        """
+        from backend.chat.models import Contact, Message
+
+        messages = Message.objects.filter(timestamp__lt=before)
+        if after is not None:
+            messages = messages.exclude(up_to_cursor(*after))
+        rows = list(
+            messages.order_by("timestamp", "id")
+            .annotate(is_last=models.Exists(Contact.objects.filter(last_message_id=models.OuterRef("id"))))
+            .values_list("id", "timestamp", "is_read", "is_last")[:limit]
+        )
+        ids = [message_id for message_id, _, is_read, is_last in rows if is_read and not is_last]
+        last_scanned = (rows[-1][1], rows[-1][0]) if rows else after
+        return ids, last_scanned, len(rows) < limit
+
+    def archive(self, message_ids):
+        """Move messages to the archive; returns how many moved."""
+        from backend.chat.models import Contact, Message
+
+        if not message_ids:
+            return 0
+        columns = ", ".join(
+            connection.ops.quote_name(column)
+            for column in ("id", "sender_id", "recipient_id", "content", "timestamp", "conversation_key")
+        )
+        # Re-checked at move time: a message may have become a last message
+        # since it was picked.
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {Message._meta.db_table} m
+                        WHERE m.id = ANY(%s) AND m.is_read
+                        AND NOT EXISTS (SELECT 1 FROM {Contact._meta.db_table} c WHERE c.last_message_id = m.id)
+                        RETURNING {columns}
+                    )
+                    INSERT INTO {self.model._meta.db_table} ({columns})
+                    SELECT {columns} FROM moved
+                    """,
+                    [list(message_ids)],
+                )
+                return cursor.rowcount
+
+        with transaction.atomic():
+            messages = (
+                Message.objects.select_for_update()
+                .filter(id__in=message_ids, is_read=True)
+                .exclude(id__in=Contact.objects.filter(last_message_id__in=message_ids).values("last_message_id"))
+            )
+            archived = [
+                self.model(
+                    id=message.id,
+                    sender_id=message.sender_id,
+                    recipient_id=message.recipient_id,
+                    content=message.content,
+                    timestamp=message.timestamp,
+                    conversation_key=message.conversation_key,
+                )
+                for message in messages
+            ]
+            self.bulk_create(archived)
+            Message.objects.filter(id__in=[message.id for message in archived])._raw_delete(self.db)
+        return len(archived)
+
+class ContactManager(models.Manager):
+    """
+    Single-statement maintenance of ``Contact`` rows.
+
+    Counters are only ever changed with ``F()`` expressions (or the Postgres
+    upsert below), never read-modify-written in Python, so concurrent senders
+    on the same pair cannot lose increments.
+    """
+
+    def feed_for(self, user_id):
+        """
+        The contact list of a user, in a single query.
+
+        Each contact carries the other party's columns (``other_*``), the
+        caller's unread counter (``unread_count``) and its last message,
+        joined in.
+        """
+        def other(field):
+            return Case(
+                When(user_one_id=user_id, then=F(f"user_two__{field}")),
+                default=F(f"user_one__{field}"),
+            )
+
+        return self.filter(Q(user_one_id=user_id) | Q(user_two_id=user_id)).select_related("last_message").annotate(
+            other_id=other("id"),
+            other_full_name=other("full_name"),
+            other_avatar_image=other("avatar_image"),
+            other_user_type=other("user_type"),
+            other_last_seen=other("last_seen"),
+            unread_count=Case(
+                When(user_one_id=user_id, then=F("user_one_unread_count")),
+                default=F("user_two_unread_count"),
+            ),
+        )
+
+    def unread_field(self, contact_user_one_id, reader_id):
+        """Name of the counter holding ``reader_id``'s unread messages."""
+        return "user_one_unread_count" if reader_id == contact_user_one_id else "user_two_unread_count"
+
+    def record_message(self, message):
+        user_one_id, user_two_id = ordered_pair(message.sender_id, message.recipient_id)
+        unread = {self.unread_field(user_one_id, message.recipient_id): 1}
+        self.record_messages(user_one_id, user_two_id, message, **unread)
+
+    def record_messages(self, user_one_id, user_two_id, last_message, user_one_unread_count=0, user_two_unread_count=0):
+        """
+        Create or update the contact for a pair in one statement.
+
+        ``last_message`` only moves forward in ``(timestamp, id)`` order, so
+        batches flushed out of order never point the contact at an older
+        message. Ids alone would not do: they are allocated in blocks per
+        process and do not follow send order. A user messaging themselves has
+        no contact: such a row could never match the ``user_one < user_two``
+        unique index, so every message would add one.
+        """
+        from backend.chat.models import Message
+
+        if user_one_id == user_two_id:
+            return
+        if connection.vendor == "postgresql":
+            self._upsert(user_one_id, user_two_id, last_message, user_one_unread_count, user_two_unread_count)
+            return
+
+        current_is_newer = models.Exists(
+            Message.objects.filter(id=OuterRef("last_message_id")).exclude(
+                up_to_cursor(last_message.timestamp, last_message.id)
+            )
+        )
+        updates = {
+            "last_message_id": Case(When(current_is_newer, then=F("last_message_id")), default=Value(last_message.id)),
+            "user_one_unread_count": F("user_one_unread_count") + user_one_unread_count,
+            "user_two_unread_count": F("user_two_unread_count") + user_two_unread_count,
+        }
+        pair = self.filter(user_one_id=user_one_id, user_two_id=user_two_id)
+        if pair.update(**updates):
+            return
+
+        try:
+            with transaction.atomic():
+                self.create(
+                    user_one_id=user_one_id,
+                    user_two_id=user_two_id,
+                    last_message_id=last_message.id,
+                    user_one_unread_count=user_one_unread_count,
+                    user_two_unread_count=user_two_unread_count,
+                )
+        except IntegrityError:
+            # Another sender created the row first; apply our delta on top of it.
+            pair.update(**updates)
+
+    def _upsert(self, user_one_id, user_two_id, last_message, user_one_unread_count, user_two_unread_count):
+        from backend.chat.models import Message
+
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_one_id, user_two_id, last_message_id, user_one_unread_count, user_two_unread_count)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (user_one_id, user_two_id) WHERE user_one_id < user_two_id
+                DO UPDATE SET
+                    last_message_id = CASE WHEN EXISTS (
+                        SELECT 1 FROM {Message._meta.db_table} m
+                        WHERE m.id = {table}.last_message_id AND (m.timestamp, m.id) > (%s, EXCLUDED.last_message_id)
+                    ) THEN {table}.last_message_id ELSE EXCLUDED.last_message_id END,
+                    user_one_unread_count = {table}.user_one_unread_count + EXCLUDED.user_one_unread_count,
+                    user_two_unread_count = {table}.user_two_unread_count + EXCLUDED.user_two_unread_count
+                """,
+                [
+                    user_one_id,
+                    user_two_id,
+                    last_message.id,
+                    user_one_unread_count,
+                    user_two_unread_count,
+                    last_message.timestamp,
+                ],
+            )
+
+    def mark_read(self, reader_id, other_user_id, count):
+        """Take ``count`` messages off the reader's unread counter, never going below zero."""
+        user_one_id, user_two_id = ordered_pair(reader_id, other_user_id)
+        field = self.unread_field(user_one_id, reader_id)
+        return self.filter(user_one_id=user_one_id, user_two_id=user_two_id).update(
+            **{field: Greatest(F(field) - count, Value(0))}
+        )
+
+    def reset_unread(self, reader_id, other_user_id):
+        """Clear the reader's unread counter for a conversation."""
+        user_one_id, user_two_id = ordered_pair(reader_id, other_user_id)
+        field = self.unread_field(user_one_id, reader_id)
+        return self.filter(user_one_id=user_one_id, user_two_id=user_two_id).update(**{field: 0})
+
+class ConversationManager(models.Manager):
+    def create_for(self, owner):
+        """Create the conversation of a class or a session."""
+        field = "class_ref" if owner._meta.model_name == "class" else "session"
+        return self.create(**{field: owner}, title=owner.title)
+
+    def ids_for(self, user_id):
+        """Ids of every conversation ``user_id`` belongs to."""
+        return list(self.filter(members__user_id=user_id).values_list("id", flat=True))
+
+class ConversationMemberManager(models.Manager):
+    def feed_for(self, user_id):
+        """
+        The conversations ``user_id`` belongs to with their last message and
+        how many messages from others arrived after the read cursor, newest
+        activity first. Unread counts are an index range per conversation.
+        """
+        from backend.chat.models import GroupMessage
+
+        unread = (
+            GroupMessage.objects.filter(
+                conversation_id=OuterRef("conversation_id"),
+                id__gt=OuterRef("last_read_message_id"),
+            )
+            .exclude(sender_id=user_id)
+            .order_by()
+            .values("conversation_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return (
+            self.filter(user_id=user_id)
+            .select_related("conversation__last_message")
+            .annotate(unread_count=Coalesce(Subquery(unread), 0))
+            .order_by(F("conversation__last_message_id").desc(nulls_last=True), "-conversation_id")
+        )
+
+    def add_members(self, conversation_id, user_ids):
+        return self.bulk_create(
+            [self.model(conversation_id=conversation_id, user_id=user_id) for user_id in set(user_ids)],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+
+    def remove_members(self, conversation_id, user_ids):
+        return self.filter(conversation_id=conversation_id, user_id__in=user_ids).delete()
+
+    def mark_read(self, conversation_id, user_id, last_message_id):
+        """
+        Move a member's read cursor forward to ``last_message_id``, capped at
+        the conversation's newest message; it never moves back.
+        """
+        from backend.chat.models import Conversation
+
+        newest_id = Conversation.objects.filter(id=OuterRef("conversation_id")).values("last_message_id")
+        return self.filter(conversation_id=conversation_id, user_id=user_id).update(
+            last_read_message_id=Greatest(
+                F("last_read_message_id"),
+                Least(Value(last_message_id), Coalesce(Subquery(newest_id), Value(0))),
+            )
+        )
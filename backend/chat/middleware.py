@@ -0,0 +1,60 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.users.models import User
+
+def get_raw_token(scope):
+    """The access token of a handshake: ``?token=`` (browsers) or an Authorization header."""
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    if token:
+        return token[0]
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, credentials = value.decode().partition(" ")
+            if scheme in api_settings.AUTH_HEADER_TYPES and credentials:
+                return credentials
+    return None
+
+@database_sync_to_async
+def get_token_user(token):
+    """The user of a verified token, or ``AnonymousUser`` once the account is deactivated or deleted."""
+    active_users = User.objects.filter(id=token[api_settings.USER_ID_CLAIM], is_active=True)
+    if "uuid" in token:
+        # The claims identify the user; only whether the account is still
+        # active needs asking, since access tokens live for weeks.
+        return TokenUser(token) if active_users.exists() else AnonymousUser()
+    return active_users.first() or AnonymousUser()
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Sets ``scope["user"]`` from the JWT access token of a websocket handshake.
+
+    The token is verified locally (signature, expiry, type). Tokens issued
+    by ``UserRefreshToken`` carry the claims the chat needs (id, uuid,
+    user_type), so the scope user is a ``TokenUser`` built from them and the
+    handshake only checks, by primary key, that the account is still active;
+    older tokens without the claims load the user instead. Missing or
+    invalid tokens, and tokens of deactivated or deleted users, give an
+    ``AnonymousUser``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope, user=await self.authenticate(scope))
+        return await super().__call__(scope, receive, send)
+
+    async def authenticate(self, scope):
+        raw_token = get_raw_token(scope)
+        if raw_token is None:
+            return AnonymousUser()
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return AnonymousUser()
+        return await get_token_user(token)
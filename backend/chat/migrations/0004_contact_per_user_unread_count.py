@@ -0,0 +1,29 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_message_timestamp'),
+    ]
+
+    operations = [
+        # The old counter was only ever incremented for messages addressed to user_two.
+        migrations.RenameField(
+            model_name='contact',
+            old_name='unread_count',
+            new_name='user_two_unread_count',
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='user_two_unread_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Unread Messages Count of User Two'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='user_one_unread_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Unread Messages Count of User One'),
+        ),
+    ]
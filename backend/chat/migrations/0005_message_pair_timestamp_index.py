@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_contact_per_user_unread_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'timestamp'], name='chat_message_pair_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_message_pair_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='chat_message_pair_ts_idx',
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation_key',
+            field=models.CharField(default='', editable=False, max_length=41, verbose_name='Conversation Key'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:37
+
+from django.db import migrations
+from django.db.models import CharField, Max, Value
+from django.db.models.functions import Cast, Concat, Greatest, Least
+
+
+BACKFILL_BATCH_SIZE = 50_000
+
+
+def backfill_conversation_key(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    conversation_key = Concat(
+        Cast(Least("sender_id", "recipient_id"), CharField()),
+        Value(":"),
+        Cast(Greatest("sender_id", "recipient_id"), CharField()),
+    )
+    max_id = Message.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+    # Walk the primary key in ranges; the migration is not atomic, so each
+    # UPDATE commits on its own and holds its row locks only while it runs.
+    # Rerunning after a failure is harmless.
+    for start in range(0, max_id + 1, BACKFILL_BATCH_SIZE):
+        Message.objects.filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE).update(
+            conversation_key=conversation_key,
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0006_message_conversation_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversation_key, migrations.RunPython.noop),
+    ]
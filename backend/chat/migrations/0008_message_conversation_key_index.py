@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_conversation_key_backfill'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation_key', 'timestamp', 'id'], name='chat_message_conv_ts_idx'),
+        ),
+    ]
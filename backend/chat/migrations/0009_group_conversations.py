@@ -0,0 +1,104 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_conversations(apps, schema_editor):
+    Class = apps.get_model("classes", "Class")
+    Session = apps.get_model("session", "Session")
+    Conversation = apps.get_model("chat", "Conversation")
+    ConversationMember = apps.get_model("chat", "ConversationMember")
+
+    for owner_model, field in ((Class, "class_ref"), (Session, "session")):
+        booked = owner_model.booked_users.through
+        owner_column = f"{owner_model._meta.model_name}_id"
+        for owner in owner_model.objects.only("id", "title", "coach_id").iterator():
+            conversation = Conversation.objects.create(**{field: owner}, title=owner.title)
+            member_ids = {owner.coach_id}
+            member_ids.update(
+                booked.objects.filter(**{owner_column: owner.id}).values_list("user_id", flat=True)
+            )
+            ConversationMember.objects.bulk_create(
+                [ConversationMember(conversation=conversation, user_id=user_id) for user_id in member_ids],
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('session', '0001_initial'),
+        ('classes', '0003_alter_class_calorie_per_session_and_more'),
+        ('chat', '0008_message_conversation_key_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Title')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+                ('class_ref', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversation', to='classes.class')),
+            ],
+            options={
+                'verbose_name': 'Conversation',
+                'verbose_name_plural': 'Conversations',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(verbose_name='Message Content')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Timestamp')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.conversation')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sent_group_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Group Message',
+                'verbose_name_plural': 'Group Messages',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConversationMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0, verbose_name='Last Read Message Id')),
+                ('joined_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Joined At')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='chat.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Conversation Member',
+                'verbose_name_plural': 'Conversation Members',
+            },
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.groupmessage'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='session',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversation', to='session.session'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['conversation', 'id'], name='chat_groupmsg_conv_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationmember',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='unique_conversation_member'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('class_ref__isnull', False), ('session__isnull', True)), models.Q(('class_ref__isnull', True), ('session__isnull', False)), _connector='OR'), name='conversation_single_owner'),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def search_index():
+    return django.contrib.postgres.indexes.GinIndex(
+        django.contrib.postgres.search.SearchVector('content', config='english'),
+        name='chat_message_search_idx',
+    )
+
+
+def add_search_index(apps, schema_editor):
+    # GIN and to_tsvector only exist on Postgres; other backends search with
+    # a plain scan (see MessageManager.search). Built concurrently so writes
+    # to a large message table are not blocked while it builds.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.add_index(apps.get_model("chat", "Message"), search_index(), concurrently=True)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.remove_index(apps.get_model("chat", "Message"), search_index(), concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0009_group_conversations'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='message',
+                    index=search_index(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+        ),
+    ]
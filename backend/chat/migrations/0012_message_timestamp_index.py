@@ -0,0 +1,42 @@
+# Generated by Django 4.2.10 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+def timestamp_index():
+    return models.Index(fields=['timestamp', 'id'], name='chat_message_ts_idx')
+
+
+def add_timestamp_index(apps, schema_editor):
+    # Built concurrently on Postgres so writes to a large message table are
+    # not blocked while it builds.
+    options = {"concurrently": True} if schema_editor.connection.vendor == "postgresql" else {}
+    schema_editor.add_index(apps.get_model("chat", "Message"), timestamp_index(), **options)
+
+
+def remove_timestamp_index(apps, schema_editor):
+    options = {"concurrently": True} if schema_editor.connection.vendor == "postgresql" else {}
+    schema_editor.remove_index(apps.get_model("chat", "Message"), timestamp_index(), **options)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0011_archived_message'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='message',
+                    index=timestamp_index(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_timestamp_index, remove_timestamp_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.10 on 2026-10-18 22:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def search_index():
+    return django.contrib.postgres.indexes.GinIndex(
+        django.contrib.postgres.search.SearchVector('content', config='english'),
+        name='chat_archive_search_idx',
+    )
+
+
+def add_search_index(apps, schema_editor):
+    # Postgres only, like the hot table's index (migration 0010).
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.add_index(apps.get_model("chat", "ArchivedMessage"), search_index(), concurrently=True)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.remove_index(apps.get_model("chat", "ArchivedMessage"), search_index(), concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0012_message_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='archivedmessage',
+                    index=search_index(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+        ),
+    ]
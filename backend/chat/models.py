@@ -1,28 +1,105 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from django.db.models import Q, UniqueConstraint, F
+from django.utils import timezone
+from backend.chat.managers import (
+  ArchivedMessageManager,
+  ContactManager,
+  ConversationManager,
+  ConversationMemberManager,
+  MessageManager,
+  ordered_pair,
+)
+from backend.classes.models import Class
+from backend.session.models import Session
 from backend.users.models import User
 from django.utils.translation import gettext_lazy as _
 
+# Text search configuration of the message search index. Queries must use
+# the same one or Postgres cannot match them to the index.
+MESSAGE_SEARCH_CONFIG = "english"
+
 class Message(models.Model):
   sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages")
   recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="received_messages")
   content = models.TextField(_("Message Content"))
   is_read = models.BooleanField(_("Is Read"), default=False)
-  timestamp = models.DateTimeField(_("Timestamp"), auto_now_add=True)
+  timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now, editable=False)
+  # "<smaller user id>:<larger user id>", the same for both directions of a thread
+  conversation_key = models.CharField(_("Conversation Key"), max_length=41, editable=False, default="")
+
+  objects = MessageManager()
 
   def __str__(self):
     return f"From {self.sender} to {self.recipient}: {self.content[:20]}"
 
+  @staticmethod
+  def conversation_key_for(user_a_id, user_b_id):
+    return "{}:{}".format(*ordered_pair(int(user_a_id), int(user_b_id)))
+
+  def save(self, *args, **kwargs):
+    if not self.conversation_key:
+      self.conversation_key = self.conversation_key_for(self.sender_id, self.recipient_id)
+    super().save(*args, **kwargs)
+
   class Meta:
     app_label = "chat"
+    indexes = [
+      # A whole thread, in keyset order, is one range scan of this index.
+      models.Index(fields=["conversation_key", "timestamp", "id"], name="chat_message_conv_ts_idx"),
+      # Send order across all threads, walked by archive_chat_messages (see migration 0012).
+      models.Index(fields=["timestamp", "id"], name="chat_message_ts_idx"),
+      # Expression index for full-text search; Postgres only (see migration 0010).
+      GinIndex(SearchVector("content", config=MESSAGE_SEARCH_CONFIG), name="chat_message_search_idx"),
+    ]
     verbose_name = _("Message")
     verbose_name_plural = _("Messages")
 
+class ArchivedMessage(models.Model):
+  """
+  Cold copy of a read message older than ``CHAT_ARCHIVE_AFTER_DAYS``.
+
+  Rows keep their ``Message`` id and timestamp, so ids stay unique across
+  both tables and ``(timestamp, id)`` history cursors work unchanged. Only
+  read messages that are no contact's last message are moved, so unread
+  counters and contact updates only ever touch the hot table; history and
+  search read both. Filled by ``archive_chat_messages``.
+  """
+  id = models.BigIntegerField(primary_key=True)
+  sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+  recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+  content = models.TextField(_("Message Content"))
+  timestamp = models.DateTimeField(_("Timestamp"))
+  conversation_key = models.CharField(_("Conversation Key"), max_length=41)
+
+  objects = ArchivedMessageManager()
+
+  # Archived messages are read by definition; lets history serializers
+  # treat both tables alike.
+  is_read = True
+
+  def __str__(self):
+    return f"From {self.sender} to {self.recipient}: {self.content[:20]}"
+
+  class Meta:
+    app_label = "chat"
+    indexes = [
+      models.Index(fields=["conversation_key", "timestamp", "id"], name="chat_archive_conv_ts_idx"),
+      # Same search index as Message; Postgres only (see migration 0013).
+      GinIndex(SearchVector("content", config=MESSAGE_SEARCH_CONFIG), name="chat_archive_search_idx"),
+    ]
+    verbose_name = _("Archived Message")
+    verbose_name_plural = _("Archived Messages")
+
 class Contact(models.Model):
   user_one = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_one_contacts")
   user_two = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_two_contacts")
   last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name="contact_last_message")
-  unread_count = models.PositiveIntegerField(_("Unread Messages Count"), default=0)
+  user_one_unread_count = models.PositiveIntegerField(_("Unread Messages Count of User One"), default=0)
+  user_two_unread_count = models.PositiveIntegerField(_("Unread Messages Count of User Two"), default=0)
+
+  objects = ContactManager()
 
   class Meta:
     constraints = [
@@ -37,4 +114,78 @@ class Contact(models.Model):
     verbose_name_plural = _("Contacts")
 
   def __str__(self):
-    return f"{self.user_one} ↔ {self.user_two}"
\ No newline at end of file
+    return f"{self.user_one} ↔ {self.user_two}"
+
+  def unread_count_for(self, user_id):
+    return self.user_one_unread_count if user_id == self.user_one_id else self.user_two_unread_count
+
+class Conversation(models.Model):
+  """
+  Group chat of a class cohort or a session's participants.
+
+  Messages are stored once per conversation; what each member has read is a
+  cursor on ``ConversationMember``, so neither sending nor reading costs
+  anything per member.
+  """
+  class_ref = models.OneToOneField(
+    Class, on_delete=models.CASCADE, null=True, blank=True, related_name="conversation"
+  )
+  session = models.OneToOneField(
+    Session, on_delete=models.CASCADE, null=True, blank=True, related_name="conversation"
+  )
+  title = models.CharField(_("Title"), max_length=255)
+  last_message = models.ForeignKey(
+    "GroupMessage", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+  )
+  created_at = models.DateTimeField(_("Created At"), default=timezone.now, editable=False)
+
+  objects = ConversationManager()
+
+  def __str__(self):
+    return self.title
+
+  class Meta:
+    app_label = "chat"
+    constraints = [
+      models.CheckConstraint(
+        check=Q(class_ref__isnull=False, session__isnull=True) | Q(class_ref__isnull=True, session__isnull=False),
+        name="conversation_single_owner",
+      ),
+    ]
+    verbose_name = _("Conversation")
+    verbose_name_plural = _("Conversations")
+
+class ConversationMember(models.Model):
+  conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="members")
+  user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="conversation_memberships")
+  # Id of the newest group message this member has read.
+  last_read_message_id = models.BigIntegerField(_("Last Read Message Id"), default=0)
+  joined_at = models.DateTimeField(_("Joined At"), default=timezone.now, editable=False)
+
+  objects = ConversationMemberManager()
+
+  class Meta:
+    app_label = "chat"
+    constraints = [
+      UniqueConstraint(fields=["conversation", "user"], name="unique_conversation_member"),
+    ]
+    verbose_name = _("Conversation Member")
+    verbose_name_plural = _("Conversation Members")
+
+class GroupMessage(models.Model):
+  conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
+  sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_group_messages")
+  content = models.TextField(_("Message Content"))
+  timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now, editable=False)
+
+  def __str__(self):
+    return f"From {self.sender} in {self.conversation}: {self.content[:20]}"
+
+  class Meta:
+    app_label = "chat"
+    indexes = [
+      # History pages and unread counts are both id ranges within a conversation.
+      models.Index(fields=["conversation", "id"], name="chat_groupmsg_conv_id_idx"),
+    ]
+    verbose_name = _("Group Message")
+    verbose_name_plural = _("Group Messages")
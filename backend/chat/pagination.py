@@ -0,0 +1,126 @@
+import heapq
+from itertools import islice
+
+from django.db.models import F, Q, Value
+
+from backend.chat.models import ArchivedMessage, Message
+
+def _querysets(queryset):
+  # History reads span the hot and the archive table; accept one queryset or several.
+  return list(queryset) if isinstance(queryset, (list, tuple)) else [queryset]
+
+def _merge(pages, count, newest_first=True):
+  # Each page is already ordered; message ids are unique across tables.
+  merged = heapq.merge(*pages, key=lambda message: (message.timestamp, message.id), reverse=newest_first)
+  return list(islice(merged, count))
+
+# Columns both tables provide for a history page; archived rows are read by definition.
+HISTORY_COLUMNS = ("id", "sender_id", "recipient_id", "content", "timestamp", "read")
+
+def _history_rows(queryset):
+  read = F("is_read") if queryset.model is Message else Value(True)
+  return queryset.order_by().annotate(read=read).values(*HISTORY_COLUMNS)
+
+def cursor_timestamp(message_id):
+  """Timestamp of a cursor message, wherever it lives now."""
+  for model in (Message, ArchivedMessage):
+    timestamp = model.objects.filter(id=message_id).values_list("timestamp", flat=True).first()
+    if timestamp is not None:
+      return timestamp
+  return None
+
+def keyset_page(queryset, limit, before_id=None, after_id=None):
+  """
+  Return one page of a conversation, newest first, anchored on a message id.
+
+  ``before_id`` walks back into history and ``after_id`` fetches what arrived
+  since. The cursor is the ``(timestamp, id)`` of the anchor message, so each
+  page is an index range scan of ``limit + 1`` rows no matter how deep it is.
+  ``queryset`` may be a list of querysets (hot and archived messages); each is
+  scanned the same way and the results merged.
+  Returns ``(messages, has_more)``.
+  """
+  cursor_id = before_id if before_id is not None else after_id
+  if cursor_id is not None:
+    cursor_ts = cursor_timestamp(cursor_id)
+    if cursor_ts is None:
+      return [], False
+
+  pages = []
+  for queryset in _querysets(queryset):
+    # The plain timestamp bound is what lets the planner start the index range
+    # at the cursor; the OR only breaks ties between equal timestamps.
+    if before_id is not None:
+      queryset = queryset.filter(timestamp__lte=cursor_ts).filter(
+        Q(timestamp__lt=cursor_ts) | Q(id__lt=before_id)
+      ).order_by("-timestamp", "-id")
+    elif after_id is not None:
+      queryset = queryset.filter(timestamp__gte=cursor_ts).filter(
+        Q(timestamp__gt=cursor_ts) | Q(id__gt=after_id)
+      ).order_by("timestamp", "id")
+    else:
+      queryset = queryset.order_by("-timestamp", "-id")
+    pages.append(list(queryset[:limit + 1]))
+
+  messages = _merge(pages, limit + 1, newest_first=after_id is None)
+  has_more = len(messages) > limit
+  messages = messages[:limit]
+
+  if after_id is not None:
+    messages.reverse()
+
+  return messages, has_more
+
+def offset_page(queryset, offset, limit):
+  """
+  Offset paging over one queryset or several, newest first; returns ``(messages, has_more)``.
+
+  Several querysets are combined with ``UNION ALL`` so the database applies
+  the ``OFFSET`` and only ``limit + 1`` rows are fetched, however deep the
+  page. The messages are unsaved ``Message`` instances carrying the columns
+  the history serializer reads.
+  """
+  first, *rest = [_history_rows(queryset) for queryset in _querysets(queryset)]
+  combined = first.union(*rest, all=True) if rest else first
+  rows = list(combined.order_by("-timestamp", "-id")[offset:offset + limit + 1])
+  messages = [Message(is_read=row.pop("read"), **row) for row in rows]
+  return messages[:limit], len(messages) > limit
+
+def total_count(queryset):
+  return sum(queryset.count() for queryset in _querysets(queryset))
+
+def encode_search_cursor(rank, message_id):
+  return f"{rank!r}:{message_id}"
+
+def decode_search_cursor(cursor):
+  """Inverse of ``encode_search_cursor``; ``None`` for a malformed cursor."""
+  rank, _, message_id = cursor.partition(":")
+  try:
+    return float(rank), int(message_id)
+  except ValueError:
+    return None
+
+def search_page(queryset, limit, cursor=None):
+  """
+  Return one page of ranked search results, best match first.
+
+  ``cursor`` is the opaque ``nextCursor`` of the previous page: the
+  ``(rank, id)`` of its last result, so pages neither skip nor repeat rows
+  with equal ranks. ``queryset`` may be a list of querysets (hot and
+  archived messages); each is paged the same way and the results merged.
+  Returns ``(messages, next_cursor)``.
+  """
+  pages = []
+  for queryset in _querysets(queryset):
+    queryset = queryset.order_by("-rank", "-id")
+    if cursor is not None:
+      rank, message_id = cursor
+      queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=message_id))
+    pages.append(list(queryset[:limit + 1]))
+
+  merged = heapq.merge(*pages, key=lambda message: (message.rank, message.id), reverse=True)
+  messages = list(islice(merged, limit + 1))
+  if len(messages) <= limit:
+    return messages, None
+  messages = messages[:limit]
+  return messages, encode_search_cursor(messages[-1].rank, messages[-1].id)
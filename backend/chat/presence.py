@@ -0,0 +1,220 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from backend.users.models import User
+
+logger = logging.getLogger(__name__)
+
+class LocalPresence:
+    """
+    In-process presence, for development, tests and single-process deployments.
+
+    Keeps a connection refcount per user with an expiry that ``heartbeat``
+    pushes forward, mirroring what ``RedisPresence`` stores in Redis.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._connections = defaultdict(int)
+        self._expires_at = {}
+        self._lock = threading.Lock()
+
+    async def connect(self, user_id):
+        with self._lock:
+            self._connections[user_id] += 1
+            self._expires_at[user_id] = time.monotonic() + self.ttl
+
+    async def disconnect(self, user_id):
+        with self._lock:
+            self._connections[user_id] -= 1
+            if self._connections[user_id] <= 0:
+                del self._connections[user_id]
+                self._expires_at.pop(user_id, None)
+
+    async def heartbeat(self, user_id):
+        with self._lock:
+            if user_id not in self._connections:
+                self._connections[user_id] = 1
+            self._expires_at[user_id] = time.monotonic() + self.ttl
+
+    def online_users(self, user_ids):
+        now = time.monotonic()
+        with self._lock:
+            return {user_id for user_id in user_ids if self._expires_at.get(user_id, 0) > now}
+
+class RedisPresence:
+    """
+    Presence shared by every worker process through Redis.
+
+    Each online user has one ``presence:{id}`` key holding the number of open
+    sockets, with a TTL that connected sockets refresh on every heartbeat. If
+    a worker dies without running ``disconnect`` its sockets stop
+    heartbeating and the key expires, so a user is never stuck online for
+    longer than ``ttl``. ``online_users`` is a single ``MGET`` however many
+    users are asked about.
+
+    Redis being unavailable degrades presence (everyone shows offline) but
+    never fails the socket or the request that asked.
+    """
+
+    DISCONNECT_SCRIPT = """
+    local count = redis.call('DECR', KEYS[1])
+    if count <= 0 then
+        redis.call('DEL', KEYS[1])
+    end
+    return count
+    """
+
+    HEARTBEAT_SCRIPT = """
+    if redis.call('EXPIRE', KEYS[1], ARGV[1]) == 0 then
+        redis.call('SET', KEYS[1], 1, 'EX', ARGV[1])
+    end
+    return 1
+    """
+
+    def __init__(self, url, ttl=60, prefix="presence"):
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+
+    def key(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    @property
+    def async_client(self):
+        # asyncio clients are bound to the loop they were created on.
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            import redis.asyncio
+
+            self._async_client = redis.asyncio.Redis.from_url(self.url)
+            self._async_loop = loop
+        return self._async_client
+
+    async def connect(self, user_id):
+        from redis.exceptions import RedisError
+
+        try:
+            async with self.async_client.pipeline(transaction=True) as pipe:
+                pipe.incr(self.key(user_id))
+                pipe.expire(self.key(user_id), self.ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.exception("Failed to record presence for user %s", user_id)
+
+    async def disconnect(self, user_id):
+        from redis.exceptions import RedisError
+
+        try:
+            await self.async_client.eval(self.DISCONNECT_SCRIPT, 1, self.key(user_id))
+        except RedisError:
+            logger.exception("Failed to clear presence for user %s", user_id)
+
+    async def heartbeat(self, user_id):
+        from redis.exceptions import RedisError
+
+        try:
+            await self.async_client.eval(self.HEARTBEAT_SCRIPT, 1, self.key(user_id), self.ttl)
+        except RedisError:
+            logger.exception("Failed to refresh presence for user %s", user_id)
+
+    def online_users(self, user_ids):
+        from redis.exceptions import RedisError
+
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        try:
+            counts = self.client.mget([self.key(user_id) for user_id in user_ids])
+        except RedisError:
+            logger.exception("Failed to read presence of %d users", len(user_ids))
+            return set()
+        return {user_id for user_id, count in zip(user_ids, counts) if count is not None and int(count) > 0}
+
+class LastSeenRecorder:
+    """
+    Buffers ``User.last_seen`` updates and writes them in batches.
+
+    Sockets closing in a burst (a deploy, a network blip) would otherwise
+    turn into one ``UPDATE`` each. Updates are coalesced per user and written
+    with a single ``bulk_update`` every ``flush_interval`` seconds, so
+    ``last_seen`` may lag by up to that interval.
+    """
+
+    def __init__(self, flush_interval=5.0, batch_size=500):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = {}
+        self._task = None
+        self._loop = None
+
+    def record(self, user_id, seen_at):
+        self._pending[user_id] = seen_at
+        self._ensure_running()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            await database_sync_to_async(self.write)(pending)
+        except Exception:
+            logger.exception("Failed to persist last_seen of %d users", len(pending))
+            # Keep anything newer that was recorded while we were writing.
+            self._pending = {**pending, **self._pending}
+
+    def flush_sync(self):
+        pending, self._pending = self._pending, {}
+        if pending:
+            self.write(pending)
+
+    def write(self, pending):
+        users = [User(id=user_id, last_seen=seen_at) for user_id, seen_at in pending.items()]
+        User.objects.bulk_update(users, ["last_seen"], batch_size=self.batch_size)
+
+def build_presence():
+    ttl = getattr(settings, "CHAT_PRESENCE_TTL", 60)
+    if getattr(settings, "CHAT_PRESENCE_BACKEND", "local") == "redis":
+        return RedisPresence(settings.CHAT_PRESENCE_REDIS_URL, ttl=ttl)
+    return LocalPresence(ttl=ttl)
+
+presence = build_presence()
+
+last_seen_recorder = LastSeenRecorder(
+    flush_interval=getattr(settings, "CHAT_LAST_SEEN_FLUSH_INTERVAL", 5.0),
+)
+
+atexit.register(last_seen_recorder.flush_sync)
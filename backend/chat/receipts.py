@@ -0,0 +1,56 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from backend.chat.groups import aget_user_group_name, get_user_group_name
+from backend.chat.models import Message
+from backend.tracing import tracer
+
+def read_receipt_event(reader_id, read_count, last_read_id):
+    """One channel layer event standing for every message a read covered."""
+    return {
+        "type": "read_receipt",
+        "readerId": reader_id,
+        "readCount": read_count,
+        "lastReadId": last_read_id,
+        "sentAt": time.time(),
+    }
+
+def mark_read(reader_id, sender_id, up_to_id=None):
+    """
+    Mark ``sender_id``'s messages to ``reader_id`` as read up to ``up_to_id``
+    and tell every socket of the sender with a single receipt.
+
+    Returns ``(read_count, last_read_id)``; nothing is pushed when no message
+    changed. The receipt goes out once the surrounding transaction (the
+    request's, under ``ATOMIC_REQUESTS``) commits, never for a rolled back read.
+    """
+    read_count, last_read_id = Message.objects.mark_read(reader_id, sender_id, up_to_id)
+    if read_count:
+        def send():
+            group_name = get_user_group_name(sender_id)
+            if group_name is not None:
+                async_to_sync(get_channel_layer().group_send)(
+                    group_name, read_receipt_event(reader_id, read_count, last_read_id)
+                )
+
+        transaction.on_commit(send)
+    return read_count, last_read_id
+
+async def amark_read(reader_id, sender_id, up_to_id=None):
+    """``mark_read`` for async callers (the chat consumer)."""
+    with tracer.span("chat.db", op="mark_read"):
+        read_count, last_read_id = await database_sync_to_async(Message.objects.mark_read)(
+            reader_id, sender_id, up_to_id
+        )
+    if read_count:
+        group_name = await aget_user_group_name(sender_id)
+        if group_name is not None:
+            with tracer.span("chat.group_send", event="read_receipt"):
+                await get_channel_layer().group_send(
+                    group_name, read_receipt_event(reader_id, read_count, last_read_id)
+                )
+    return read_count, last_read_id
@@ -1,6 +1,6 @@
 from django.conf import settings
 from rest_framework import serializers
-from backend.chat.models import Contact, Message
+from backend.chat.models import GroupMessage, Message
 from backend.users.models import User
 
 class GetUserSerializer(serializers.ModelSerializer):
@@ -29,44 +29,68 @@ class MessageSerializer(serializers.ModelSerializer):
     def get_isSent(self, obj):
         """Determine if the message was sent by the request user."""
         request_user = self.context.get("request_user")
-        is_sent =  obj.sender.id == request_user.id
-        return is_sent
+        return obj.sender_id == request_user.id
 
-class ContactUserSerializer(serializers.ModelSerializer):
-    id = serializers.SerializerMethodField()
-    avatarUrl = serializers.SerializerMethodField()
-    fullName = serializers.SerializerMethodField()
-    userType = serializers.SerializerMethodField()
-    lastMessage = serializers.SerializerMethodField()
-    unreadCount = serializers.IntegerField(source="unread_count")
+class MessageSearchResultSerializer(MessageSerializer):
+    otherPersonId = serializers.SerializerMethodField()
+    rank = serializers.FloatField()
 
-    class Meta:
-        model = Contact
-        fields = ["id", "fullName", "avatarUrl", "userType", "unreadCount", "lastMessage"]
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ["otherPersonId", "rank"]
 
-    def get_id(self, obj):
+    def get_otherPersonId(self, obj):
         request_user = self.context.get("request_user")
-        return obj.user_two.id if obj.user_one == request_user else obj.user_one.id
+        return obj.recipient_id if obj.sender_id == request_user.id else obj.sender_id
 
-    def get_other_person(self, obj):
-        request_user = self.context.get("request_user")
-        return obj.user_two if obj.user_one == request_user else obj.user_one
+class ContactFeedSerializer(serializers.Serializer):
+    """
+    Serializes the contacts of ``Contact.objects.feed_for(user)``.
 
-    def get_avatarUrl(self, obj):
-        other_person = self.get_other_person(obj)
-        if other_person.avatar_image:
-            return f"{settings.MEDIA_URL}{other_person.avatar_image}"
-        return None
+    Everything is read from the annotated contact and its joined last
+    message, so the contact list costs the feed query and nothing per contact.
+    """
+    id = serializers.IntegerField(source="other_id")
+    fullName = serializers.CharField(source="other_full_name")
+    avatarUrl = serializers.SerializerMethodField()
+    userType = serializers.CharField(source="other_user_type")
+    unreadCount = serializers.IntegerField(source="unread_count")
+    isOnline = serializers.SerializerMethodField()
+    lastSeen = serializers.DateTimeField(source="other_last_seen", allow_null=True)
+    lastMessage = MessageSerializer(source="last_message", allow_null=True, read_only=True)
 
-    def get_fullName(self, obj):
-        other_person = self.get_other_person(obj)
-        return other_person.full_name
+    def get_isOnline(self, contact):
+        return contact.other_id in self.context.get("online_user_ids", ())
 
-    def get_userType(self, obj):
-        other_person = self.get_other_person(obj)
-        return other_person.user_type
-    
-    def get_lastMessage(self, obj):
-        if obj.last_message:
-            return MessageSerializer(obj.last_message, context=self.context).data
+    def get_avatarUrl(self, contact):
+        if contact.other_avatar_image:
+            return f"{settings.MEDIA_URL}{contact.other_avatar_image}"
         return None
+
+class GroupMessageSerializer(serializers.ModelSerializer):
+    senderId = serializers.IntegerField(source="sender_id")
+    sentDate = serializers.DateTimeField(source="timestamp")
+    isSent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GroupMessage
+        fields = ["id", "senderId", "content", "isSent", "sentDate"]
+
+    def get_isSent(self, obj):
+        request_user = self.context.get("request_user")
+        return obj.sender_id == request_user.id
+
+class ConversationFeedSerializer(serializers.Serializer):
+    """Serializes the rows of ``ConversationMember.objects.feed_for(user)``."""
+    id = serializers.IntegerField(source="conversation_id")
+    title = serializers.CharField(source="conversation.title")
+    classId = serializers.IntegerField(source="conversation.class_ref_id", allow_null=True)
+    sessionId = serializers.IntegerField(source="conversation.session_id", allow_null=True)
+    unreadCount = serializers.IntegerField(source="unread_count")
+    lastReadMessageId = serializers.IntegerField(source="last_read_message_id")
+    lastMessage = serializers.SerializerMethodField()
+
+    def get_lastMessage(self, member):
+        last_message = member.conversation.last_message
+        if last_message is None:
+            return None
+        return GroupMessageSerializer(last_message, context=self.context).data
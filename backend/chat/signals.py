@@ -0,0 +1,73 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from backend.chat import conversations
+from backend.chat.groups import user_group_cache
+from backend.chat.models import Conversation
+from backend.classes.models import Class
+from backend.session.models import Session
+from backend.users.models import User
+
+@receiver(post_delete, sender=User)
+def invalidate_user_group(sender, instance, **kwargs):
+    user_group_cache.invalidate(instance.id)
+
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Session)
+def create_conversation(sender, instance, created, **kwargs):
+    if created:
+        conversation = Conversation.objects.create_for(instance)
+        conversations.add_members(conversation.id, [instance.coach_id])
+
+def _conversation_ids(owner_model, owner_ids):
+    field = "class_ref_id" if owner_model is Class else "session_id"
+    return dict(
+        Conversation.objects.filter(**{f"{field}__in": owner_ids}).values_list(field, "id")
+    )
+
+@receiver(m2m_changed, sender=Class.booked_users.through)
+@receiver(m2m_changed, sender=Session.booked_users.through)
+def sync_conversation_members(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Keep a class or session conversation's members in step with its bookings."""
+    owner_model = Class if sender is Class.booked_users.through else Session
+
+    if action == "pre_clear":
+        # pk_set is not given for clears; remember who is about to go.
+        if reverse:
+            instance._cleared_owner_ids = list(
+                owner_model.objects.filter(booked_users=instance).values_list("id", flat=True)
+            )
+        else:
+            instance._cleared_user_ids = list(instance.booked_users.values_list("id", flat=True))
+        return
+
+    if action == "post_clear":
+        if reverse:
+            pairs = [(owner_id, instance.id) for owner_id in instance.__dict__.pop("_cleared_owner_ids", [])]
+        else:
+            pairs = [(instance.id, user_id) for user_id in instance.__dict__.pop("_cleared_user_ids", [])]
+    elif action in ("post_add", "post_remove") and pk_set:
+        if reverse:
+            pairs = [(owner_id, instance.id) for owner_id in pk_set]
+        else:
+            pairs = [(instance.id, user_id) for user_id in pk_set]
+    else:
+        return
+
+    user_ids_by_owner = {}
+    for owner_id, user_id in pairs:
+        user_ids_by_owner.setdefault(owner_id, []).append(user_id)
+    conversation_ids = _conversation_ids(owner_model, list(user_ids_by_owner))
+    coach_ids = dict(owner_model.objects.filter(id__in=user_ids_by_owner).values_list("id", "coach_id"))
+
+    for owner_id, user_ids in user_ids_by_owner.items():
+        conversation_id = conversation_ids.get(owner_id)
+        if conversation_id is None:
+            continue
+        if action == "post_add":
+            conversations.add_members(conversation_id, user_ids)
+        else:
+            # The coach stays in the conversation whatever happens to bookings.
+            conversations.remove_members(
+                conversation_id, [user_id for user_id in user_ids if user_id != coach_ids.get(owner_id)]
+            )
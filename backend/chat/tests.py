@@ -1,3 +1,527 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.chat import codecs
+from backend.chat.conversations import mark_conversation_read, save_group_message
+from backend.chat.delivery_log import LocalDeliveryLog
+from backend.chat.groups import user_group_cache, user_group_name
+from backend.chat.middleware import JWTAuthMiddleware
+from backend.chat.models import ArchivedMessage, Contact, Conversation, ConversationMember, GroupMessage, Message
+from backend.chat.pagination import keyset_page, offset_page
+from backend.chat.presence import last_seen_recorder
+from backend.chat.receipts import mark_read
+from backend.chat.routing import websocket_urlpatterns
+from backend.chat.typing_status import TypingDebouncer
+from backend.chat.views import ContactListView, MessageSearchView, UsersListView
+from backend.chat.writer import MessageWriter, WriterBacklogged
+from backend.classes.models import Class
+from backend.testing import create_users, run_concurrently
+from backend.users.models import User
+from backend.users.tokens import access_token_for
+
+class ContactCounterTests(TransactionTestCase):
+  def test_concurrent_messages_lose_no_updates(self):
+    user_a, user_b = create_users(2)
+    # Both directions race on the same contact row, which does not exist yet.
+    messages = []
+    for i in range(40):
+      sender, recipient = (user_a, user_b) if i % 4 else (user_b, user_a)
+      messages.append(Message.objects.create(sender=sender, recipient=recipient, content=str(i)))
+
+    run_concurrently(Contact.objects.record_message, messages)
+
+    contact = Contact.objects.get()
+    self.assertEqual(contact.unread_count_for(user_a.id), 10)
+    self.assertEqual(contact.unread_count_for(user_b.id), 30)
+    self.assertEqual(contact.last_message_id, messages[-1].id)
+
+  def test_last_message_follows_send_order_not_ids(self):
+    user_a, user_b = create_users(2)
+    now = timezone.now()
+    # Two processes drawing from id blocks 1-100 and 101-200.
+    older = Message.objects.create(id=101, sender=user_a, recipient=user_b, content="older", timestamp=now)
+    newer = Message.objects.create(id=2, sender=user_b, recipient=user_a, content="newer", timestamp=now + timedelta(seconds=1))
+
+    Contact.objects.record_message(older)
+    Contact.objects.record_message(newer)
+    self.assertEqual(Contact.objects.get().last_message_id, newer.id)
+
+    # A late flush of the older message does not move it back.
+    Contact.objects.record_message(older)
+    self.assertEqual(Contact.objects.get().last_message_id, newer.id)
+
+    writer = MessageWriter()
+    latest = Message(id=3, sender=user_a, recipient=user_b, content="latest", timestamp=now + timedelta(seconds=2))
+    stale = Message(id=150, sender=user_b, recipient=user_a, content="stale", timestamp=now + timedelta(seconds=1, milliseconds=500))
+    writer.write_batch([latest, stale])
+    self.assertEqual(Contact.objects.get().last_message_id, latest.id)
+
+  def test_self_message_creates_no_contact(self):
+    user, = create_users(1)
+    for i in range(3):
+      Contact.objects.record_message(Message.objects.create(sender=user, recipient=user, content=str(i)))
+
+    self.assertFalse(Contact.objects.exists())
+
+class ContactListTests(TestCase):
+  def test_contact_list_is_one_query(self):
+    user, *others = create_users(6)
+    for i, other in enumerate(others):
+      Contact.objects.record_message(Message.objects.create(sender=other, recipient=user, content=f"hi {i}"))
+      if i % 2:
+        Contact.objects.record_message(Message.objects.create(sender=user, recipient=other, content=f"re {i}"))
+
+    request = APIRequestFactory().get("/api/chat/contact/get/")
+    force_authenticate(request, user=user)
+    with self.assertNumQueries(1):
+      response = ContactListView.as_view()(request)
+      response.render()
+
+    contacts = {contact["id"]: contact for contact in response.data["contacts"]}
+    self.assertEqual(set(contacts), {other.id for other in others})
+    for i, other in enumerate(others):
+      contact = contacts[other.id]
+      self.assertEqual(contact["unreadCount"], 1)
+      self.assertEqual(contact["lastMessage"]["content"], f"re {i}" if i % 2 else f"hi {i}")
+      self.assertEqual(contact["lastMessage"]["isSent"], bool(i % 2))
+
+def seed_history(user, other, count, archived=0):
+  """``count`` messages in pairs sharing a timestamp, the oldest ``archived`` of them archived, newest first."""
+  now = timezone.now()
+  messages = [
+    Message.objects.create(sender=user, recipient=other, content=str(i), is_read=True, timestamp=now + timedelta(seconds=i // 2))
+    for i in range(count)
+  ]
+  ArchivedMessage.objects.archive([message.id for message in messages[:archived]])
+  return sorted(messages, key=lambda message: (message.timestamp, message.id), reverse=True)
+
+class KeysetPageTests(TestCase):
+  def test_pages_cover_the_history_without_overlap(self):
+    user, other = create_users(2)
+    expected = [message.id for message in seed_history(user, other, 23, archived=7)]
+    history = Message.objects.history(user.id, other.id)
+    self.assertEqual(ArchivedMessage.objects.count(), 7)
+
+    seen, before_id, has_more = [], None, True
+    while has_more:
+      messages, has_more = keyset_page(history, 4, before_id=before_id)
+      seen += [message.id for message in messages]
+      before_id = messages[-1].id
+    self.assertEqual(seen, expected)
+
+    # Forward from the oldest message, each page is still newest first.
+    seen, after_id, has_more = [], expected[-1], True
+    while has_more:
+      messages, has_more = keyset_page(history, 4, after_id=after_id)
+      seen = [message.id for message in messages] + seen
+      after_id = messages[0].id
+    self.assertEqual(seen, expected[:-1])
+
+class OffsetPageTests(TestCase):
+  def test_pages_across_both_tables_in_sql(self):
+    user, other = create_users(2)
+    expected = seed_history(user, other, 23, archived=7)
+    Message.objects.update(is_read=False)
+    history = Message.objects.history(user.id, other.id)
+
+    with self.assertNumQueries(1) as queries:
+      messages, has_more = offset_page(history, 14, 5)
+
+    self.assertEqual([message.id for message in messages], [message.id for message in expected[14:19]])
+    self.assertTrue(has_more)
+    self.assertIn("UNION ALL", queries.captured_queries[0]["sql"])
+    self.assertIn("LIMIT 6 OFFSET 14", queries.captured_queries[0]["sql"])
+    # The page straddles the tables: two hot (unread) rows, then archived ones.
+    self.assertEqual([message.is_read for message in messages], [False, False, True, True, True])
+
+    messages, has_more = offset_page(history, 20, 5)
+    self.assertEqual([message.id for message in messages], [message.id for message in expected[20:]])
+    self.assertFalse(has_more)
+
+class MessageSearchTests(TestCase):
+  def test_archived_messages_are_found(self):
+    user, other = create_users(2)
+    old = timezone.now() - timedelta(days=400)
+    matches = [
+      Message.objects.create(sender=user, recipient=other, content=f"gym plan {i}", is_read=True, timestamp=old + timedelta(days=i))
+      for i in range(9)
+    ]
+    Message.objects.create(sender=user, recipient=other, content="unrelated")
+    ArchivedMessage.objects.archive([message.id for message in matches[:4]])
+
+    found, cursor = [], None
+    while True:
+      params = {"q": "plan", "limit": 4, **({"cursor": cursor} if cursor else {})}
+      request = APIRequestFactory().get("/api/chat/messages/search/", params)
+      force_authenticate(request, user=user)
+      data = MessageSearchView.as_view()(request).data["data"]
+      found += [message["id"] for message in data["messages"]]
+      cursor = data["nextCursor"]
+      if cursor is None:
+        break
+
+    self.assertEqual(ArchivedMessage.objects.count(), 4)
+    self.assertEqual(sorted(found), sorted(message.id for message in matches))
+
+class UsersListTests(TestCase):
+  def test_page_and_total_in_one_query(self):
+    users = create_users(5)
+
+    request = APIRequestFactory().get("/api/chat/users/search/", {"limit": 2, "offset": 2})
+    force_authenticate(request, user=users[0])
+    with self.assertNumQueries(1):
+      response = UsersListView.as_view()(request)
+
+    self.assertEqual(response.data["totalUsersCount"], 5)
+    self.assertEqual([user["id"] for user in response.data["users"]], [user.id for user in users[2:4]])
+
+  def test_search_matches_part_of_the_name(self):
+    users = create_users(12)
+
+    request = APIRequestFactory().get("/api/chat/users/search/", {"limit": 10, "offset": 0, "query": " user 1"})
+    force_authenticate(request, user=users[0])
+    response = UsersListView.as_view()(request)
+
+    self.assertEqual(response.data["totalUsersCount"], 3)
+    self.assertEqual({user["id"] for user in response.data["users"]}, {user.id for user in users[1:2] + users[10:]})
+
+class MarkReadTests(TestCase):
+  def test_marks_up_to_the_cursor_in_send_order(self):
+    reader, sender = create_users(2)
+    now = timezone.now()
+    # Ids come in blocks per process, so a later message can have a smaller id.
+    messages = [
+      Message.objects.create(id=id_, sender=sender, recipient=reader, content=str(id_), timestamp=now + timedelta(seconds=i))
+      for i, id_ in enumerate([300, 100, 400, 200])
+    ]
+    for message in messages:
+      Contact.objects.record_message(message)
+
+    read_count, last_read_id = Message.objects.mark_read(reader.id, sender.id, up_to_id=400)
+
+    self.assertEqual((read_count, last_read_id), (3, 400))
+    self.assertEqual(set(Message.objects.filter(is_read=False).values_list("id", flat=True)), {200})
+    self.assertEqual(Contact.objects.get().unread_count_for(reader.id), 1)
+
+class ArchiveTests(TestCase):
+  def test_archivable_walks_send_order_in_batches(self):
+    reader, sender = create_users(2)
+    old = timezone.now() - timedelta(days=400)
+    ids = [300, 100, 500, 200, 400]
+    for i, id_ in enumerate(ids):
+      Message.objects.create(id=id_, sender=sender, recipient=reader, content=str(id_), is_read=True, timestamp=old + timedelta(seconds=i))
+    # A recent message with a small id must not end the walk early.
+    Message.objects.create(id=50, sender=sender, recipient=reader, content="recent", is_read=True)
+
+    found, after, done = [], None, False
+    while not done:
+      batch, after, done = ArchivedMessage.objects.archivable(timezone.now() - timedelta(days=1), after=after, limit=2)
+      found += batch
+
+    self.assertEqual(found, ids)
+
+def create_class_conversation(coach, booked_users, title="Cohort"):
+  """A class booked by ``booked_users``; its conversation gets the members through the booking signals."""
+  cls = Class.objects.create(coach=coach, title=title, category="Yoga", intensity="Low", level="Beginner", price=10)
+  cls.booked_users.add(*booked_users)
+  return Conversation.objects.get(class_ref=cls)
+
+class ConversationTests(TestCase):
+  def test_only_members_can_post(self):
+    member, outsider = create_users(2)
+    conversation = create_class_conversation(member, [])
+
+    self.assertIsNone(async_to_sync(save_group_message)(conversation.id, outsider.id, "let me in"))
+    message = async_to_sync(save_group_message)(conversation.id, member.id, "hello")
+
+    self.assertEqual(list(GroupMessage.objects.values_list("content", flat=True)), ["hello"])
+    conversation.refresh_from_db()
+    self.assertEqual(conversation.last_message_id, message.id)
+
+  def test_feed_counts_unread_messages_from_others(self):
+    first, second, third = create_users(3)
+    conversation = create_class_conversation(first, [second, third])
+    quiet = create_class_conversation(first, [], title="Quiet")
+    sent = [
+      async_to_sync(save_group_message)(conversation.id, sender.id, f"message {i}")
+      for i, sender in enumerate([first, first, second, third])
+    ]
+    mark_conversation_read(conversation.id, first.id, sent[0].id)
+    # The cursor stops at the newest message, whatever the client claims.
+    mark_conversation_read(conversation.id, third.id, sent[-1].id + 100)
+
+    def unread(user):
+      return [(member.conversation_id, member.unread_count) for member in ConversationMember.objects.feed_for(user.id)]
+
+    # Own messages never count; conversations without messages come last.
+    self.assertEqual(unread(first), [(conversation.id, 2), (quiet.id, 0)])
+    self.assertEqual(unread(second), [(conversation.id, 3)])
+    self.assertEqual(unread(third), [(conversation.id, 0)])
+    self.assertEqual(
+      ConversationMember.objects.get(conversation=conversation, user=third).last_read_message_id, sent[-1].id
+    )
+
+class ReadReceiptTests(TestCase):
+  def receive(self, channel, timeout=0.1):
+    async def receive():
+      return await asyncio.wait_for(get_channel_layer().receive(channel), timeout)
+    return async_to_sync(receive)()
+
+  def test_receipt_waits_for_the_commit(self):
+    reader, sender = create_users(2)
+    Message.objects.create(sender=sender, recipient=reader, content="hi")
+    layer = get_channel_layer()
+    channel = async_to_sync(layer.new_channel)()
+    async_to_sync(layer.group_add)(user_group_name(sender.uuid), channel)
+
+    with self.captureOnCommitCallbacks(execute=True):
+      self.assertEqual(mark_read(reader.id, sender.id)[0], 1)
+      with self.assertRaises(asyncio.TimeoutError):
+        self.receive(channel)
+
+    event = self.receive(channel)
+    self.assertEqual((event["type"], event["readerId"], event["readCount"]), ("read_receipt", reader.id, 1))
+
+class MessageWriterTests(TransactionTestCase):
+  def test_overlapping_flushes_store_each_message_once(self):
+    sender, recipient = create_users(2)
+    # batch_size wakes the background flush while the explicit ones run.
+    writer = MessageWriter(batch_size=5, flush_interval=60)
+
+    async def send_and_flush():
+      for i in range(20):
+        await writer.submit(sender.id, recipient.id, f"message {i}")
+      await asyncio.gather(writer.flush(), writer.flush(), writer.flush())
+
+    asyncio.run(send_and_flush())
+
+    self.assertEqual(len(writer), 0)
+    self.assertEqual(Message.objects.filter(sender=sender).count(), 20)
+    contact = Contact.objects.get()
+    self.assertEqual(contact.unread_count_for(recipient.id), 20)
+    self.assertEqual(contact.last_message_id, Message.objects.latest("id").id)
+
+  def test_full_buffer_rejects_while_the_database_is_down(self):
+    sender, recipient = create_users(2)
+    writer = MessageWriter(batch_size=100, flush_interval=60, max_pending=10, retry_interval=60)
+
+    async def send_all():
+      accepted = rejected = 0
+      for i in range(50):
+        try:
+          await writer.submit(sender.id, recipient.id, f"message {i}")
+          accepted += 1
+        except WriterBacklogged:
+          rejected += 1
+      return accepted, rejected
+
+    with mock.patch.object(writer, "write_batch", side_effect=DatabaseError("down")) as write_batch:
+      self.assertEqual(asyncio.run(send_all()), (10, 40))
+    # One failed flush, then back-off until retry_interval passes.
+    self.assertEqual(write_batch.call_count, 1)
+    self.assertEqual(len(writer), 10)
+
+    asyncio.run(writer.flush())
+    self.assertEqual(Message.objects.count(), 10)
+
+class CodecTests(SimpleTestCase):
+  def test_chat_fast_path_matches_the_generic_frame(self):
+    message = {"id": 12, "senderId": 3, "content": "hi", "isRead": False, "sentDate": "2026-10-18T10:00:00+00:00"}
+    expected = codecs.chat_frame(message, 5, True)
+    # msgpack is optional; without it only JSON is offered.
+    for codec in (codecs.JsonCodec, codecs.CompactCodec) if codecs.msgpack is not None else (codecs.JsonCodec,):
+      with self.subTest(codec=codec.__name__):
+        self.assertEqual(codec.decode(codec.encode_chat(message, 5, True)), expected)
+        self.assertEqual(codec.encode_chat(message, 5, True), codec.encode(expected))
+
+class TypingDebouncerTests(SimpleTestCase):
+  def test_held_back_stop_is_sent_and_forgotten(self):
+    sent = []
+
+    async def send(recipient_id, is_typing):
+      sent.append((recipient_id, is_typing))
+
+    debouncer = TypingDebouncer(send, window=0.01, idle_timeout=60)
+
+    async def type_then_stop():
+      await debouncer.update(7, True)
+      # Inside the window: the stop is held back and sent by the flush.
+      await debouncer.update(7, False)
+      await asyncio.sleep(0.05)
+
+    asyncio.run(type_then_stop())
+
+    self.assertEqual(sent, [(7, True), (7, False)])
+    self.assertEqual(debouncer._states, {})
+
+class ChatSocketTests(TransactionTestCase):
+  def test_message_reaches_the_recipient(self):
+    sender, recipient = create_users(2)
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def socket(user):
+      return WebsocketCommunicator(application, f"chat/{user.id}/?token={access_token_for(user)}")
+
+    async def exchange():
+      sender_socket, recipient_socket = socket(sender), socket(recipient)
+      for communicator in (sender_socket, recipient_socket):
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+      try:
+        # Malformed frames are dropped without closing the socket.
+        await sender_socket.send_json_to({"type": "is_typing", "recipient_id": "nobody", "is_typing": True})
+        await sender_socket.send_json_to({"type": "send_message", "recipient_id": recipient.id, "message": "hello"})
+        return await recipient_socket.receive_json_from(timeout=5), await sender_socket.receive_json_from(timeout=5)
+      finally:
+        await sender_socket.disconnect()
+        await recipient_socket.disconnect()
+        await last_seen_recorder.flush()
+
+    received, echoed = asyncio.run(exchange())
+
+    self.assertEqual(received["type"], "chat")
+    self.assertEqual(received["message"]["content"], "hello")
+    self.assertFalse(received["message"]["isSent"])
+    self.assertTrue(echoed["message"]["isSent"])
+    self.assertEqual(Message.objects.get().recipient_id, recipient.id)
+    self.assertFalse(User.objects.filter(id__in=[sender.id, recipient.id], last_seen=None).exists())
+
+  def test_deactivated_user_cannot_connect(self):
+    user, = create_users(1)
+    token = access_token_for(user)
+    user.is_active = False
+    user.save()
+    user_group_cache.invalidate(user.id)
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def connect():
+      communicator = WebsocketCommunicator(application, f"chat/{user.id}/?token={token}")
+      connected, _ = await communicator.connect()
+      await communicator.disconnect()
+      return connected
+
+    self.assertFalse(asyncio.run(connect()))
+    self.assertIsNone(user_group_cache.get(user.id))
+
+  def test_reconnect_replays_what_the_socket_missed(self):
+    sender, recipient = create_users(2)
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def socket(user, last_seq=None):
+      path = f"chat/{user.id}/?token={access_token_for(user)}"
+      return WebsocketCommunicator(application, path if last_seq is None else f"{path}&lastSeq={last_seq}")
+
+    async def exchange():
+      sender_socket = socket(sender)
+      await sender_socket.connect()
+      try:
+        for content in ("one", "two"):
+          await sender_socket.send_json_to({"type": "send_message", "recipient_id": recipient.id, "message": content})
+          await sender_socket.receive_json_from(timeout=5)
+
+        # The recipient was offline and last saw nothing.
+        recipient_socket = socket(recipient, last_seq=0)
+        connected, _ = await recipient_socket.connect()
+        self.assertTrue(connected)
+        try:
+          replayed = [await recipient_socket.receive_json_from(timeout=5) for _ in range(2)]
+          # A live event that raced with the replay carries a seq the socket already sent.
+          await get_channel_layer().group_send(user_group_name(recipient.uuid), {
+            "type": "chat_message",
+            "message": replayed[-1]["message"] | {"senderId": sender.id},
+            "recipientSeq": replayed[-1]["seq"],
+            "senderSeq": None,
+          })
+          await sender_socket.send_json_to({"type": "send_message", "recipient_id": recipient.id, "message": "three"})
+          live = await recipient_socket.receive_json_from(timeout=5)
+          self.assertTrue(await recipient_socket.receive_nothing())
+          return replayed, live
+        finally:
+          await recipient_socket.disconnect()
+      finally:
+        await sender_socket.disconnect()
+        await last_seen_recorder.flush()
+
+    with mock.patch("backend.chat.consumers.delivery_log", LocalDeliveryLog()):
+      replayed, live = asyncio.run(exchange())
+
+    self.assertEqual([(frame["seq"], frame["message"]["content"]) for frame in replayed], [(1, "one"), (2, "two")])
+    self.assertEqual((live["seq"], live["message"]["content"]), (3, "three"))
+
+  def test_reconnect_past_the_trimmed_log_asks_for_a_resync(self):
+    sender, recipient = create_users(2)
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def exchange():
+      sender_socket = WebsocketCommunicator(application, f"chat/{sender.id}/?token={access_token_for(sender)}")
+      await sender_socket.connect()
+      try:
+        for content in ("one", "two", "three"):
+          await sender_socket.send_json_to({"type": "send_message", "recipient_id": recipient.id, "message": content})
+          await sender_socket.receive_json_from(timeout=5)
+      finally:
+        await sender_socket.disconnect()
+
+      recipient_socket = WebsocketCommunicator(
+        application, f"chat/{recipient.id}/?token={access_token_for(recipient)}&lastSeq=0"
+      )
+      await recipient_socket.connect()
+      try:
+        return await recipient_socket.receive_json_from(timeout=5), await recipient_socket.receive_nothing()
+      finally:
+        await recipient_socket.disconnect()
+        await last_seen_recorder.flush()
+
+    # Only the last two messages are left, so the first one can no longer be replayed.
+    with mock.patch("backend.chat.consumers.delivery_log", LocalDeliveryLog(maxlen=2)):
+      frame, nothing_else = asyncio.run(exchange())
+
+    self.assertEqual(frame, {"type": "resync", "seq": 3})
+    self.assertTrue(nothing_else)
+
+  def test_group_message_reaches_every_member(self):
+    *members, outsider = create_users(4)
+    conversation = create_class_conversation(members[0], members[1:])
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def exchange():
+      sockets = [
+        WebsocketCommunicator(application, f"chat/{user.id}/?token={access_token_for(user)}")
+        for user in (*members, outsider)
+      ]
+      for communicator in sockets:
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+      *member_sockets, outsider_socket = sockets
+      try:
+        # Not a member: dropped before anything is stored or sent.
+        await outsider_socket.send_json_to({"type": "send_group_message", "conversationId": conversation.id, "message": "hi"})
+        await member_sockets[0].send_json_to(
+          {"type": "send_group_message", "conversationId": conversation.id, "message": "hello"}
+        )
+        received = [await communicator.receive_json_from(timeout=5) for communicator in member_sockets]
+        self.assertTrue(await outsider_socket.receive_nothing())
+        for communicator in member_sockets:
+          self.assertTrue(await communicator.receive_nothing())
+        return received
+      finally:
+        for communicator in sockets:
+          await communicator.disconnect()
+        await last_seen_recorder.flush()
+
+    received = asyncio.run(exchange())
+
+    self.assertEqual({frame["type"] for frame in received}, {"group_chat"})
+    self.assertEqual({frame["message"]["content"] for frame in received}, {"hello"})
+    self.assertEqual([frame["message"]["isSent"] for frame in received], [True, False, False])
+    self.assertEqual(GroupMessage.objects.get().sender_id, members[0].id)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+class _TypingState:
+    __slots__ = ("wanted", "sent", "last_emit", "flush_task", "idle_task")
+
+    def __init__(self):
+        self.wanted = False
+        self.sent = False
+        self.last_emit = float("-inf")
+        self.flush_task = None
+        self.idle_task = None
+
+class TypingDebouncer:
+    """
+    Coalesces one socket's typing updates into start/stop events per recipient.
+
+    Clients report typing on every keystroke; forwarding each one would be a
+    channel layer ``group_send`` per key. Instead only changes of state are
+    emitted, and at most one event per recipient goes out every ``window``
+    seconds: a change that lands inside the window is held back and the
+    latest state is sent when the window ends (so a quick stop/start flap
+    collapses into nothing). A sender that goes quiet for ``idle_timeout``
+    seconds is stopped on its behalf, and ``close`` stops everything when the
+    socket goes away, so recipients never keep a stale indicator.
+
+    ``send(recipient_id, is_typing)`` is the coroutine that does the fan-out.
+    """
+
+    def __init__(self, send, window=2.0, idle_timeout=6.0):
+        self.send = send
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self._states = {}
+
+    async def update(self, recipient_id, is_typing):
+        state = self._states.get(recipient_id)
+        if state is None:
+            if not is_typing:
+                return
+            state = self._states[recipient_id] = _TypingState()
+
+        state.wanted = is_typing
+        self._cancel(state, "idle_task")
+        if is_typing:
+            state.idle_task = asyncio.create_task(self._expire(recipient_id, state))
+
+        await self._emit(recipient_id, state)
+
+    def reset(self, recipient_id):
+        """
+        Forget the typing state towards a recipient without notifying it.
+
+        Used when a message is sent: the recipient clears the indicator when
+        the message arrives, so a separate stop event would be redundant.
+        """
+        state = self._states.pop(recipient_id, None)
+        if state is not None:
+            self._cancel(state, "idle_task")
+            self._cancel(state, "flush_task")
+
+    async def close(self):
+        for recipient_id, state in list(self._states.items()):
+            self._cancel(state, "idle_task")
+            self._cancel(state, "flush_task")
+            if state.sent:
+                await self.send(recipient_id, False)
+        self._states.clear()
+
+    async def _emit(self, recipient_id, state):
+        if state.wanted == state.sent:
+            if not state.sent:
+                self._forget(recipient_id, state)
+            return
+
+        wait = state.last_emit + self.window - time.monotonic()
+        if wait > 0:
+            if state.flush_task is None:
+                state.flush_task = asyncio.create_task(self._flush_later(recipient_id, state, wait))
+            return
+
+        state.sent = state.wanted
+        state.last_emit = time.monotonic()
+        await self.send(recipient_id, state.sent)
+        if not state.sent:
+            # Stopped, including by a held-back stop flushed from ``_flush_later``.
+            self._forget(recipient_id, state)
+
+    async def _flush_later(self, recipient_id, state, wait):
+        await asyncio.sleep(wait)
+        state.flush_task = None
+        await self._emit(recipient_id, state)
+
+    async def _expire(self, recipient_id, state):
+        await asyncio.sleep(self.idle_timeout)
+        state.idle_task = None
+        state.wanted = False
+        await self._emit(recipient_id, state)
+
+    def _forget(self, recipient_id, state):
+        if state.flush_task is None and state.idle_task is None and self._states.get(recipient_id) is state:
+            del self._states[recipient_id]
+
+    @staticmethod
+    def _cancel(state, attr):
+        task = getattr(state, attr)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        setattr(state, attr, None)
@@ -3,10 +3,20 @@ from .views import (
   ContactListView,
   UsersListView,
   MessageListView,
+  MarkMessagesReadView,
+  MessageSearchView,
+  ConversationListView,
+  ConversationMessageListView,
+  MarkConversationReadView,
 )
 
 urlpatterns = [
   path("contact/get/", view=ContactListView.as_view(), name="get_contact_users"),
+  path("messages/search/", MessageSearchView.as_view(), name="message-search"),
   path("messages/<int:otherPersonId>/", MessageListView.as_view(), name="message-list"),
+  path("messages/<int:otherPersonId>/read/", MarkMessagesReadView.as_view(), name="message-mark-read"),
+  path("conversations/", ConversationListView.as_view(), name="conversation-list"),
+  path("conversations/<int:conversationId>/messages/", ConversationMessageListView.as_view(), name="conversation-message-list"),
+  path("conversations/<int:conversationId>/read/", MarkConversationReadView.as_view(), name="conversation-mark-read"),
   path("users/search/", view=UsersListView.as_view(), name="search_users"),
 ]
@@ -1,21 +1,38 @@
-import traceback
-from django.db import models
-from django.db.models import Q
+import logging
 from rest_framework import status
-from backend.chat.models import Contact, Message
+from backend.chat.models import Contact, ConversationMember, GroupMessage, Message
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from backend.pagination import paginate
+from backend.search import contains
+from backend.tracing import tracer
 from backend.users.models import User
 from .serializers import (
-  ContactUserSerializer,
+  ContactFeedSerializer,
+  ConversationFeedSerializer,
+  GroupMessageSerializer,
+  MessageSearchResultSerializer,
   MessageSerializer,
   GetUserSerializer,
 )
-from .dto import GetUsersListDTO
+from .conversations import mark_conversation_read
+from .dto import (
+  GetUsersListDTO,
+  GetMessagesRequestDTO,
+  MarkMessagesReadRequestDTO,
+  SearchMessagesRequestDTO,
+  GetConversationMessagesRequestDTO,
+  MarkConversationReadRequestDTO,
+)
+from .pagination import keyset_page, offset_page, search_page, total_count
+from .presence import presence
+from .receipts import mark_read
+
+logger = logging.getLogger(__name__)
 
 class ContactListView(APIView):
   permission_classes = [IsAuthenticated]
@@ -24,12 +41,14 @@ class ContactListView(APIView):
   def get(self, request):
     user = request.user
 
-    contacts = Contact.objects.filter(
-      Q(user_one=user) | Q(user_two=user)
-    ).select_related("user_one", "user_two", "last_message")
-
     try:
-      serializer = ContactUserSerializer(contacts, many=True, context={"request_user": user})
+      contacts = list(Contact.objects.feed_for(user.id))
+      online_user_ids = presence.online_users(contact.other_id for contact in contacts)
+      serializer = ContactFeedSerializer(
+        contacts,
+        many=True,
+        context={"request_user": user, "online_user_ids": online_user_ids},
+      )
       return Response(
         {
           "message": "Contact List Fetched",
@@ -66,14 +85,11 @@ class UsersListView(APIView):
     try:
       userlists_query = User.objects.all()
 
-      if query:
-        userlists_query = userlists_query.filter(full_name__icontains=query)
-      
-      total_users = userlists_query.count()
+      userlists_query = contains(userlists_query, "full_name", query)
 
-      userlists_query = userlists_query[offset:offset + limit]
+      users, total_users = paginate(userlists_query.order_by("id"), offset, limit)
 
-      users_list = GetUserSerializer(userlists_query, many=True).data
+      users_list = GetUserSerializer(users, many=True).data
 
       return Response(
         {
@@ -85,8 +101,7 @@ class UsersListView(APIView):
       )
     
     except AttributeError as e:
-      print("AttributeError:", str(e))
-      traceback.print_exc()
+      tracer.event("chat.users_list.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Attribute error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -105,20 +120,27 @@ class MessageListView(ListAPIView):
     user = self.request.user
     other_person_id = self.kwargs["otherPersonId"]
 
-    queryset = Message.objects.filter(
-      (models.Q(sender=user.id) & models.Q(recipient=other_person_id)) |
-      (models.Q(sender=other_person_id) & models.Q(recipient=user.id))
-    ).order_by("-timestamp")
-
-    return queryset
+    return Message.objects.history(user.id, other_person_id)
 
   def list(self, request, *args, **kwargs):
     other_person_id = self.kwargs["otherPersonId"]
-    
-    queryset = self.get_queryset()
 
-    offset = int(request.query_params.get("offset", 0))
-    limit = int(request.query_params.get("limit", 20))
+    dto = GetMessagesRequestDTO(data=request.query_params)
+
+    if not dto.is_valid():
+      return Response(
+        {"message": "Invalid request data", "details": dto.errors},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    validated_data = dto.validated_data
+
+    limit = validated_data["limit"]
+    offset = validated_data["offset"]
+    before_id = validated_data.get("before_id")
+    after_id = validated_data.get("after_id")
+
+    queryset = self.get_queryset()
 
     try:
       other_person = User.objects.get(id=other_person_id)
@@ -130,14 +152,23 @@ class MessageListView(ListAPIView):
 
     other_person_data = GetUserSerializer(other_person).data
 
-    paginated_queryset = queryset[offset : offset + limit]
+    if before_id is None and after_id is None:
+      # Offset paging, kept for existing clients; its cost grows with the offset.
+      messages, has_more = offset_page(queryset, offset, limit)
+      with_count = validated_data.get("count", True)
+    else:
+      messages, has_more = keyset_page(queryset, limit, before_id=before_id, after_id=after_id)
+      with_count = validated_data.get("count", False)
+
+    total_message_count = total_count(queryset) if with_count else None
 
     serializer = self.get_serializer(
-      paginated_queryset, many=True, context={"request_user": request.user}
+      messages, many=True, context={"request_user": request.user}
     )
 
     response_data = {
-      "totalMessageCount": queryset.count(),
+      "totalMessageCount": total_message_count,
+      "hasMore": has_more,
       "messages": serializer.data,
       "otherPersonFullname": other_person_data.get("fullName"),
       "otherPersonAvatarUrl": other_person_data.get("avatarUrl"),
@@ -147,3 +178,156 @@ class MessageListView(ListAPIView):
       {"message": "Message fetched successfully", "data": response_data},
       status=status.HTTP_200_OK
     )
+
+class MessageSearchView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def get(self, request):
+    dto = SearchMessagesRequestDTO(data=request.query_params)
+    if not dto.is_valid():
+      return Response(
+        {"error": "Invalid request data", "details": dto.errors},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    validated_data = dto.validated_data
+    try:
+      queryset = Message.objects.search(
+        request.user.id, validated_data["q"], validated_data.get("other_person_id")
+      )
+      messages, next_cursor = search_page(queryset, validated_data["limit"], validated_data.get("cursor"))
+      serializer = MessageSearchResultSerializer(messages, many=True, context={"request_user": request.user})
+      return Response(
+        {
+          "message": "Messages searched successfully",
+          "data": {"nextCursor": next_cursor, "messages": serializer.data},
+        },
+        status=status.HTTP_200_OK
+      )
+    except Exception:
+      tracer.event("chat.search_messages.error", level=logging.ERROR, exc_info=True)
+      return Response(
+        {"error": "Failed to search messages"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
+
+class MarkMessagesReadView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def post(self, request, otherPersonId):
+    serializer = MarkMessagesReadRequestDTO(data=request.data)
+    if not serializer.is_valid():
+      return Response(
+        {"error": "Invalid request data", "details": serializer.errors},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    try:
+      read_count, last_read_id = mark_read(
+        request.user.id, otherPersonId, serializer.validated_data.get("lastMessageId")
+      )
+      return Response(
+        {
+          "message": "Messages marked as read",
+          "readCount": read_count,
+          "lastReadId": last_read_id,
+        },
+        status=status.HTTP_200_OK
+      )
+    except Exception:
+      tracer.event("chat.mark_read.error", level=logging.ERROR, exc_info=True)
+      return Response(
+        {"error": "Failed to mark messages as read"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
+
+class ConversationListView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def get(self, request):
+    try:
+      members = ConversationMember.objects.feed_for(request.user.id)
+      serializer = ConversationFeedSerializer(members, many=True, context={"request_user": request.user})
+      return Response(
+        {
+          "message": "Conversation List Fetched",
+          "conversations": serializer.data,
+        },
+        status=status.HTTP_200_OK
+      )
+    except Exception:
+      tracer.event("chat.conversations.error", level=logging.ERROR, exc_info=True)
+      return Response(
+        {"error": "Failed to fetch conversations"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
+
+class ConversationMessageListView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def get(self, request, conversationId):
+    dto = GetConversationMessagesRequestDTO(data=request.query_params)
+    if not dto.is_valid():
+      return Response(
+        {"error": "Invalid request data", "details": dto.errors},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    if not ConversationMember.objects.filter(conversation_id=conversationId, user_id=request.user.id).exists():
+      return Response(
+        {"error": "Conversation not found."},
+        status=status.HTTP_404_NOT_FOUND,
+      )
+
+    limit = dto.validated_data["limit"]
+    before_id = dto.validated_data.get("before_id")
+
+    # Ids grow with time within a conversation, so the id alone is the cursor.
+    queryset = GroupMessage.objects.filter(conversation_id=conversationId).order_by("-id")
+    if before_id is not None:
+      queryset = queryset.filter(id__lt=before_id)
+    messages = list(queryset[:limit + 1])
+    has_more = len(messages) > limit
+
+    serializer = GroupMessageSerializer(messages[:limit], many=True, context={"request_user": request.user})
+    return Response(
+      {
+        "message": "Message fetched successfully",
+        "data": {"hasMore": has_more, "messages": serializer.data},
+      },
+      status=status.HTTP_200_OK
+    )
+
+class MarkConversationReadView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def post(self, request, conversationId):
+    serializer = MarkConversationReadRequestDTO(data=request.data)
+    if not serializer.is_valid():
+      return Response(
+        {"error": "Invalid request data", "details": serializer.errors},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    try:
+      updated = mark_conversation_read(conversationId, request.user.id, serializer.validated_data["lastMessageId"])
+      if not updated:
+        return Response(
+          {"error": "Conversation not found."},
+          status=status.HTTP_404_NOT_FOUND,
+        )
+      return Response(
+        {"message": "Conversation marked as read"},
+        status=status.HTTP_200_OK
+      )
+    except Exception:
+      tracer.event("chat.mark_conversation_read.error", level=logging.ERROR, exc_info=True)
+      return Response(
+        {"error": "Failed to mark conversation as read"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
@@ -0,0 +1,222 @@
+import asyncio
+import atexit
+import logging
+import time
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from backend.chat.managers import ordered_pair
+from backend.chat.models import Contact, Message
+
+logger = logging.getLogger(__name__)
+
+class MessageIdAllocator:
+    """
+    Hands out ``chat.Message`` primary keys before the row is inserted.
+
+    Write-behind messages are fanned out before they are persisted, so their
+    id has to be known up front. On Postgres ids are reserved in blocks
+    straight from the table's sequence, which is safe across processes. Other
+    backends fall back to counting up from ``MAX(id)``, which is only safe
+    with a single writer process (local development and tests).
+
+    Each process draws from its own block, so ids are unique but do not
+    follow send order across processes. Anything that needs "sent before"
+    must compare ``(timestamp, id)``, as history paging, read receipts and
+    archiving do, never the bare id.
+    """
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._ids = []
+        self._high_water = 0
+
+    async def allocate(self):
+        if not self._ids:
+            self._ids.extend(await database_sync_to_async(self.reserve)(self.block_size))
+        return self._ids.pop(0)
+
+    def reserve(self, count):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                    [Message._meta.db_table, count],
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        current_max = Message.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+        start = max(current_max, self._high_water) + 1
+        self._high_water = start + count - 1
+        return list(range(start, start + count))
+
+class WriterBacklogged(Exception):
+    """Raised by ``MessageWriter.submit`` when the buffer is full and cannot be flushed."""
+
+class MessageWriter:
+    """
+    Write-behind buffer for chat messages.
+
+    ``submit`` returns an unsaved ``Message`` with its id and timestamp already
+    set so it can be fanned out immediately. Pending messages are written with
+    one ``bulk_create`` per batch, and the contact bookkeeping of the batch is
+    coalesced to a single upsert per conversation pair.
+
+    Flush semantics:
+
+    * a batch is written when it reaches ``batch_size`` or after
+      ``flush_interval`` seconds, whichever comes first;
+    * each batch is written in one transaction, so a failed flush leaves no
+      partial state and the batch is put back at the head of the queue;
+      after a failed flush nothing tries again for ``retry_interval``
+      seconds, so a database outage costs one error per interval rather
+      than one per message;
+    * a batch that violates a constraint is retried row by row, and only the
+      rows that still fail are dropped (and logged);
+    * the buffer never holds more than ``max_pending`` messages: a ``submit``
+      that finds it full waits for a flush, and if that flush fails (or is
+      backing off) it raises ``WriterBacklogged`` instead of queueing, so
+      senders are pushed back;
+    * whatever is still pending at a clean interpreter exit is flushed
+      synchronously;
+    * flushes never overlap: the background loop and a ``submit`` that hit
+      ``max_pending`` take turns on one lock.
+
+    Hard limitation: a message is acknowledged (fanned out, echoed to its
+    sender) before it is stored. If the process dies without a clean exit
+    (SIGKILL, OOM kill, power loss), everything still pending is lost: up to
+    ``flush_interval`` worth of messages, and never more than ``max_pending``
+    even when the database is down and batches are being requeued. Deployments that cannot
+    accept that window must leave ``CHAT_WRITE_BEHIND`` off; the inline path
+    stores every message before delivering it.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=0.05, max_pending=10_000, retry_interval=1.0, allocator=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_interval = retry_interval
+        self.allocator = allocator or MessageIdAllocator()
+        self._pending = []
+        self._retry_at = float("-inf")
+        self._wakeup = None
+        self._task = None
+        self._loop = None
+        self._lock = None
+        self._lock_loop = None
+
+    async def submit(self, sender_id, recipient_id, content):
+        message = Message(
+            id=await self.allocator.allocate(),
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            content=content,
+            timestamp=timezone.now(),
+        )
+        if len(self._pending) >= self.max_pending:
+            await self._make_room()
+        # No await from the check above to here, so the cap holds for concurrent senders.
+        self._pending.append(message)
+        self._ensure_running()
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+        return message
+
+    async def _make_room(self):
+        if time.monotonic() >= self._retry_at:
+            await self.flush()
+        if len(self._pending) >= self.max_pending:
+            raise WriterBacklogged(f"{len(self._pending)} chat messages are waiting to be stored")
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                await self.flush()
+
+    def _flush_lock(self):
+        # asyncio locks belong to one event loop; benchmarks and tests run
+        # the writer on several in turn.
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def flush(self):
+        async with self._flush_lock():
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                try:
+                    await database_sync_to_async(self.write_batch)(batch)
+                except DatabaseError:
+                    logger.exception("Failed to persist %d chat messages, requeueing", len(batch))
+                    self._pending[:0] = batch
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    return
+
+    def flush_sync(self):
+        """Flush everything that is pending from synchronous code (e.g. at exit)."""
+        batch, self._pending = self._pending, []
+        for start in range(0, len(batch), self.batch_size):
+            self.write_batch(batch[start:start + self.batch_size])
+
+    def write_batch(self, batch):
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(batch)
+                self.update_contacts(batch)
+        except IntegrityError:
+            if len(batch) == 1:
+                logger.exception("Dropping chat message %s that cannot be persisted", batch[0].id)
+                return
+            # Retry row by row so one bad message (e.g. a recipient deleted in
+            # the meantime) does not hold back the whole batch.
+            for message in batch:
+                self.write_batch([message])
+
+    @staticmethod
+    def update_contacts(batch):
+        pairs = defaultdict(lambda: {"last_message": None, "user_one_unread_count": 0, "user_two_unread_count": 0})
+        for message in batch:
+            user_one_id, user_two_id = ordered_pair(message.sender_id, message.recipient_id)
+            pair = pairs[(user_one_id, user_two_id)]
+            # Newest in send order; ids do not follow it across processes.
+            newest = pair["last_message"]
+            if newest is None or (message.timestamp, message.id) > (newest.timestamp, newest.id):
+                pair["last_message"] = message
+            pair[Contact.objects.unread_field(user_one_id, message.recipient_id)] += 1
+
+        for (user_one_id, user_two_id), pair in pairs.items():
+            Contact.objects.record_messages(user_one_id, user_two_id, **pair)
+
+message_writer = MessageWriter(
+    batch_size=getattr(settings, "CHAT_WRITE_BEHIND_BATCH_SIZE", 500),
+    flush_interval=getattr(settings, "CHAT_WRITE_BEHIND_FLUSH_INTERVAL", 0.05),
+    max_pending=getattr(settings, "CHAT_WRITE_BEHIND_MAX_PENDING", 10_000),
+    retry_interval=getattr(settings, "CHAT_WRITE_BEHIND_RETRY_INTERVAL", 1.0),
+)
+
+atexit.register(message_writer.flush_sync)
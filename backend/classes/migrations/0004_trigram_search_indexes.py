@@ -0,0 +1,30 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:20
+
+import backend.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently, which cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('classes', '0003_alter_class_calorie_per_session_and_more'),
+        ('users', '0005_trigram_search_indexes'),
+    ]
+
+    operations = [
+        backend.search.AddTrigramIndex(
+            model_name='class',
+            index=backend.search.trigram_index('title', 'class_title_trgm_idx'),
+        ),
+        backend.search.AddTrigramIndex(
+            model_name='class',
+            index=backend.search.trigram_index('category', 'class_category_trgm_idx'),
+        ),
+        backend.search.AddTrigramIndex(
+            model_name='class',
+            index=backend.search.trigram_index('level', 'class_level_trgm_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from backend.search import trigram_index
 from backend.users.models import User
 
 class Class(models.Model):
@@ -45,3 +46,9 @@ class Class(models.Model):
     app_label = "classes"
     verbose_name = _("Class")
     verbose_name_plural = _("Classes")
+    indexes = [
+      # Serve the class listing's __icontains filters (backend.search).
+      trigram_index("title", "class_title_trgm_idx"),
+      trigram_index("category", "class_category_trgm_idx"),
+      trigram_index("level", "class_level_trgm_idx"),
+    ]
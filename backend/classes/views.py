@@ -1,6 +1,6 @@
 import os
-import traceback
 import base64
+import logging
 from django.db import transaction
 from django.db.models import Max
 from rest_framework import status
@@ -14,7 +14,10 @@ from django.shortcuts import get_object_or_404
 from backend.classes.models import Class
 from backend.exercises.models import ClassExercise, Exercise
 from backend.session.models import ClassSession, Meeting
+from backend.pagination import paginate
+from backend.search import contains
 from backend.permissions import IsCoachUserOnly, IsClientUserOnly
+from backend.tracing import tracer
 from backend.util.zoom_meeting import create_zoom_meeting
 
 from .serializers import (
@@ -89,7 +92,7 @@ class CreateClassView(APIView):
 
           filtered_exercise_data = {k: v for k, v in exercise.items() if k in allowed_exercise_fields}
 
-          print(f"filtered exercise -----------------------------> {filtered_exercise_data}")
+          tracer.event("classes.create.exercise", exercise_id=exercise_id)
 
           try:
             ClassExercise.objects.create(
@@ -115,7 +118,7 @@ class CreateClassView(APIView):
         }
         
         for session in sessions:
-          print(f"session ----------------------------> {session}")
+          tracer.event("classes.create.session", title=session.get("title"))
           createMeetingPayload = {
             'topic': session["title"],
             'agenda': session["description"],
@@ -154,7 +157,7 @@ class CreateClassView(APIView):
               status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-          print(f"class session created ----------------------------> {class_session}")
+          tracer.event("classes.create.class_session", class_session_id=class_session.id)
 
       return Response(
         {"message": "class created successfully"},
@@ -190,15 +193,11 @@ class GetClassesView(APIView):
 
     try:
       classes_query = Class.objects.all()
-      if query and query != '':
-        classes_query = classes_query.filter(title__icontains=query)
-      if category and category != '':
-        classes_query = classes_query.filter(cateogry__icontains=category)
-      if level and level != '':
-        classes_query = classes_query.filter(level__icontains=level)
+      classes_query = contains(classes_query, "title", query)
+      classes_query = contains(classes_query, "category", category)
+      classes_query = contains(classes_query, "level", level)
 
-      total_count = classes_query.count()
-      classes = classes_query[offset:offset + limit]
+      classes, total_count = paginate(classes_query.order_by("id"), offset, limit)
 
       serialized_classes = ClassSerializer(classes, many=True, context={"request": request})
 
@@ -213,8 +212,7 @@ class GetClassesView(APIView):
       )
     
     except AttributeError as e:
-      print("AttributeError:", str(e))
-      traceback.print_exc()
+      tracer.event("classes.get_classes.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"message": "Attribute error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -245,8 +243,7 @@ class GetClassByIdView(APIView):
       )
 
     except AttributeError as e:
-      print("AttributeError:", str(e))
-      traceback.print_exc()
+      tracer.event("classes.get_class.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"message": "Attribute error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
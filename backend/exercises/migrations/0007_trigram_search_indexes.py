@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:20
+
+import backend.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently, which cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('exercises', '0006_alter_classexercise_class_ref_and_more'),
+        ('users', '0005_trigram_search_indexes'),
+    ]
+
+    operations = [
+        backend.search.AddTrigramIndex(
+            model_name='exercise',
+            index=backend.search.trigram_index('title', 'exercise_title_trgm_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.utils.translation import gettext_lazy as _
 
 from backend.workouts.models import ClientWorkoutDailyPlan
 from backend.classes.models import Class
+from backend.search import trigram_index
 class Exercise(models.Model):
   title = models.CharField(_("Title"), max_length=255, unique=True)
   description = models.TextField(_("Description"), blank=True, null=True)
@@ -21,6 +22,10 @@ class Exercise(models.Model):
     verbose_name = _("Exercise")
     verbose_name_plural = _("Exercises")
     ordering = ["title"]
+    indexes = [
+      # Serve title__icontains in the exercise listing (backend.search).
+      trigram_index("title", "exercise_title_trgm_idx"),
+    ]
 
 class WorkoutExercise(models.Model):
   """Exercises included in a Client Workout Daily Plan, linked to the main Exercise model."""
@@ -14,6 +14,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 import logging
 
 from backend.exercises.models import Exercise
+from backend.pagination import paginate
+from backend.search import contains
 from backend.permissions import IsAdminUserOnly
 from .serializers import (
   ExerciseSerializer,
@@ -44,12 +46,9 @@ class GetExercisesView(APIView):
     try:
       exercises = Exercise.objects.all()
 
-      if query:
-        exercises = exercises.filter(title__icontains=query)
+      exercises = contains(exercises, "title", query)
       
-      total_exercises_count = exercises.count()
-
-      exercises = exercises[offset:offset + limit]
+      exercises, total_exercises_count = paginate(exercises, offset, limit)
 
       serialized_exercises = ExerciseSerializer(exercises, many=True).data
 
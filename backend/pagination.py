@@ -0,0 +1,70 @@
+"""
+Offset pagination that returns a page and the size of the whole result.
+
+Listings used to run the filtered query twice, once for ``.count()`` and once
+for the page, and the frontend ran it a third time through the matching
+``.../count/`` endpoint. ``paginate`` answers both from one query by adding
+``COUNT(*) OVER ()`` to the page: the window is computed over every filtered
+row before ``LIMIT``/``OFFSET`` apply, so each returned row carries the total.
+
+For large tables ``approximate=True`` swaps the exact total for the
+planner's row estimate (Postgres ``EXPLAIN``) once that estimate exceeds
+``PAGINATION_APPROXIMATE_COUNT_ABOVE``; the page is then a plain ``LIMIT``
+that stops after ``offset + limit`` rows instead of visiting every match.
+Smaller results, where estimates are least reliable, stay exact. A listing
+and its ``.../count/`` twin must use the same mode, or the two totals the
+frontend shows can disagree; the listings that have one pass
+``approximate=True``.
+
+    sessions, total = paginate(queryset.order_by("id"), offset, limit)
+"""
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Window
+
+TOTAL_COUNT_ALIAS = "_total_count"
+
+def estimate_count(queryset):
+  """The planner's row estimate for ``queryset``, or ``None`` off Postgres."""
+  connection = connections[queryset.db]
+  if connection.vendor != "postgresql":
+    return None
+  sql, params = queryset.order_by().query.sql_with_params()
+  with connection.cursor() as cursor:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    plan = cursor.fetchone()[0]
+  if isinstance(plan, str):
+    plan = json.loads(plan)
+  return int(plan[0]["Plan"]["Plan Rows"])
+
+def _approximate_total(queryset, approximate):
+  if not approximate:
+    return None
+  estimate = estimate_count(queryset)
+  if estimate is None or estimate <= settings.PAGINATION_APPROXIMATE_COUNT_ABOVE:
+    return None
+  return estimate
+
+def count_rows(queryset, approximate=False):
+  """``queryset.count()``, or the planner's estimate for large results when ``approximate``."""
+  total = _approximate_total(queryset, approximate)
+  return total if total is not None else queryset.count()
+
+def paginate(queryset, offset, limit, approximate=False):
+  """
+  Return ``(rows, total)`` for ``queryset[offset:offset + limit]``.
+
+  ``queryset`` should be ordered, or pages are not stable. The total costs no
+  extra query unless the page is empty past the first one (an offset beyond
+  the end), where there is no row to carry it.
+  """
+  total = _approximate_total(queryset, approximate)
+  if total is not None:
+    return list(queryset[offset:offset + limit]), total
+
+  rows = list(queryset.annotate(**{TOTAL_COUNT_ALIAS: Window(Count("*"))})[offset:offset + limit])
+  if rows:
+    return rows, getattr(rows[0], TOTAL_COUNT_ALIAS)
+  return rows, (queryset.count() if offset else 0)
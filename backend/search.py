@@ -0,0 +1,55 @@
+"""
+Substring search for the listing filters, backed by trigram indexes.
+
+Django compiles ``field__icontains`` on Postgres to
+``UPPER("field"::text) LIKE UPPER('%term%')``, which no B-tree can serve.
+``trigram_index`` builds the matching ``pg_trgm`` GIN index on
+``UPPER(field)``, so the same lookup becomes a bitmap index scan instead of a
+sequential scan. ``contains`` is the one place listings build that lookup;
+filtering through it keeps queries and indexes in step.
+
+Other databases (SQLite in tests and local runs) have no trigram indexes:
+``AddTrigramIndex`` only records the index in the migration state there, and
+``contains`` runs the same ``icontains`` as a plain scan.
+
+Terms shorter than three characters yield no trigrams, so Postgres falls
+back to scanning for them too; the results are the same either way.
+"""
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.models.functions import Upper
+
+def trigram_index(field, name):
+  """GIN ``gin_trgm_ops`` index on ``UPPER(field)``, for ``field__icontains``."""
+  return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
+
+class AddTrigramIndex(AddIndexConcurrently):
+  """
+  ``AddIndexConcurrently`` that only touches Postgres databases.
+
+  The model state gains the index everywhere, so ``makemigrations`` stays
+  quiet; the migration using it must set ``atomic = False`` and come after
+  a ``TrigramExtension``.
+  """
+
+  def database_forwards(self, app_label, schema_editor, from_state, to_state):
+    if schema_editor.connection.vendor == "postgresql":
+      super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+  def database_backwards(self, app_label, schema_editor, from_state, to_state):
+    if schema_editor.connection.vendor == "postgresql":
+      super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+def contains(queryset, field, term):
+  """
+  Filter ``queryset`` to rows whose ``field`` contains ``term``, ignoring case.
+
+  Blank terms leave the queryset unfiltered. ``field`` may span relations
+  (``coach_profile__specialization``).
+  """
+  if term is None:
+    return queryset
+  term = term.strip()
+  if not term:
+    return queryset
+  return queryset.filter(**{f"{field}__icontains": term})
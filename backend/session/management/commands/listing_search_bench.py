@@ -0,0 +1,144 @@
+"""
+Benchmark the listing search filters on seeded sessions and users.
+
+Seeds ``--rows`` sessions and as many users, then times the session
+listing (``title`` search, page and total in one query) and the coach
+search (``full_name``) for a common, a rare and a missing term. On Postgres
+every query is also timed with index scans disabled, which is the sequential
+scan the trigram indexes replace, and the plan of the rare-term session
+search is printed to confirm ``session_title_trgm_idx`` is used. Elsewhere
+only the scan exists, so both columns match.
+
+    python manage.py listing_search_bench --rows 100000
+"""
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.pagination import paginate
+from backend.search import contains
+from backend.session.models import Meeting, Session
+from backend.users.models import User
+
+BENCH_EMAIL_DOMAIN = "listing-search-bench.local"
+
+WORDS = (
+  "morning evening strength cardio yoga pilates mobility stretch core power "
+  "beginner advanced hiit boxing cycling running recovery balance endurance flow"
+).split()
+RARE_WORD = "kettlebell"
+
+
+class Command(BaseCommand):
+  help = "Time trigram-indexed listing searches against a sequential scan."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--rows", type=int, default=100_000, help="Sessions and users to seed.")
+    parser.add_argument("--limit", type=int, default=20, help="Page size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows for the next run.")
+
+  def handle(self, *args, **options):
+    self.seed(options["rows"])
+    if connection.vendor == "postgresql":
+      with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Session._meta.db_table}")
+        cursor.execute(f"ANALYZE {User._meta.db_table}")
+
+    limit = options["limit"]
+    repeat = options["repeat"]
+    searches = {
+      "sessions": lambda term: paginate(contains(Session.objects.all(), "title", term).order_by("id"), 0, limit),
+      "coaches": lambda term: paginate(
+        contains(User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}"), "full_name", term).order_by("id"), 0, limit
+      ),
+    }
+
+    self.stdout.write(f"{'listing':<10} {'term':<14} {'total':>8} {'scan ms':>10} {'index ms':>10}")
+    for name, search in searches.items():
+      for term in (WORDS[0], RARE_WORD, "zzzznotthere"):
+        _, total = search(term)
+        scan_ms = self.time(lambda: self.without_indexes(lambda: search(term)), repeat)
+        index_ms = self.time(lambda: search(term), repeat)
+        self.stdout.write(f"{name:<10} {term:<14} {total:>8} {scan_ms:>10.2f} {index_ms:>10.2f}")
+
+    if connection.vendor == "postgresql":
+      queryset = contains(Session.objects.all(), "title", RARE_WORD).order_by("id")[:limit]
+      self.stdout.write(queryset.explain(analyze=True))
+
+    if not options["keep"]:
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def without_indexes(self, fn):
+    if connection.vendor != "postgresql":
+      return fn()
+    with transaction.atomic():
+      with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_bitmapscan = off")
+        cursor.execute("SET LOCAL enable_indexscan = off")
+      return fn()
+
+  def seed(self, count, batch_size=5_000):
+    coach = User.objects.filter(email=f"coach@{BENCH_EMAIL_DOMAIN}").first()
+    if coach is not None and Session.objects.filter(coach=coach).count() == count:
+      return
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    coach = User.objects.create(email=f"coach@{BENCH_EMAIL_DOMAIN}", user_type="Coach")
+
+    rng = random.Random(0)
+    start = timezone.now() + datetime.timedelta(days=1)
+
+    def title(i):
+      words = rng.choices(WORDS, k=3)
+      if i % 1000 == 0:
+        words[rng.randrange(3)] = RARE_WORD
+      return " ".join(words).title()
+
+    for offset in range(0, count, batch_size):
+      size = min(batch_size, count - offset)
+      User.objects.bulk_create(
+        User(email=f"user{offset + i}@{BENCH_EMAIL_DOMAIN}", full_name=title(offset + i), user_type="Coach")
+        for i in range(size)
+      )
+      meetings = Meeting.objects.bulk_create(
+        Meeting(
+          start_time=start,
+          duration=60,
+          meeting_number=str(offset + i),
+          encrypted_password="",
+          join_url="",
+          start_url="",
+          creator=coach,
+        )
+        for i in range(size)
+      )
+      Session.objects.bulk_create(
+        Session(
+          title=title(offset + i),
+          start_date=start,
+          duration=60,
+          coach=coach,
+          goal=rng.choice(WORDS),
+          level="Beginner",
+          description="",
+          total_participant_number=20,
+          price=10,
+          meeting=meeting,
+        )
+        for i, meeting in enumerate(meetings)
+      )
+      self.stdout.write(f"seeded {offset + size}/{count}", ending="\r")
+    self.stdout.write("")
+
+  def time(self, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+      started = time.perf_counter()
+      fn()
+      timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,47 @@
+"""
+Fill free seats of sessions from their waitlists.
+
+Cancellations promote the next waiting user on the spot; this catches the
+seats freed without a cancellation: a coach raising ``total_participant_number``,
+or a race between a failed booking and joining the waitlist. Run it
+periodically, or with ``--interval`` as a long-lived worker.
+
+    python manage.py promote_session_waitlists --interval 30
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from backend.session.models import Session
+from backend.session.notifications import notify_waitlist_promoted
+
+
+class Command(BaseCommand):
+  help = "Move waitlisted users into free session seats and notify them."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--interval", type=float, default=0, help="Seconds between sweeps; 0 sweeps once.")
+
+  def handle(self, *args, **options):
+    while True:
+      promoted = self.sweep()
+      if options["verbosity"] > 1 or not options["interval"]:
+        self.stdout.write(f"promoted {promoted} waitlisted users")
+      if not options["interval"]:
+        break
+      time.sleep(options["interval"])
+
+  def sweep(self):
+    session_ids = (
+      Session.objects
+      .filter(current_participant_number__lt=F("total_participant_number"), waitlist_entries__isnull=False)
+      .values_list("id", flat=True)
+      .distinct()
+    )
+    promoted = 0
+    for session_id in session_ids:
+      user_ids = Session.objects.promote(session_id)
+      notify_waitlist_promoted(session_id, user_ids)
+      promoted += len(user_ids)
+    return promoted
@@ -0,0 +1,138 @@
+"""
+Stress test and benchmark booking of a single hot session.
+
+Seeds one session with ``--seats`` seats and ``--users`` users, then has
+``--threads`` threads book it at once, every user trying ``--attempts`` times
+so double bookings race too. Checks afterwards that the session was not
+overbooked, that nobody holds two seats and that ``current_participant_number``
+matches the bookings, and reports bookings/sec and per-attempt latency.
+
+``--legacy`` runs the old read-then-add booking instead, to show the
+overbooking it allows. Needs a database that takes concurrent writers
+(Postgres); SQLite serialises them.
+
+    python manage.py session_booking_bench --users 500 --seats 100 --threads 32
+"""
+import datetime
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from backend.chat.management.commands.chat_bench import percentile
+from backend.session.managers import BOOKED
+from backend.session.models import Meeting, Session
+from backend.users.models import User
+
+BENCH_EMAIL_DOMAIN = "session-booking-bench.local"
+
+
+class Command(BaseCommand):
+  help = "Book one hot session from many threads and check it is never overbooked."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--users", type=int, default=500, help="Users competing for the session.")
+    parser.add_argument("--seats", type=int, default=100, help="Seats in the session.")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent booking threads.")
+    parser.add_argument("--attempts", type=int, default=2, help="Booking attempts per user.")
+    parser.add_argument("--legacy", action="store_true", help="Book with the old count-then-add sequence.")
+
+  def handle(self, *args, **options):
+    session, users = self.seed(options["users"], options["seats"])
+    book = self.legacy_book if options["legacy"] else Session.objects.book
+    attempts = [user.id for user in users] * options["attempts"]
+    latencies = []
+    lock = threading.Lock()
+
+    def attempt(user_id):
+      started = time.perf_counter()
+      try:
+        result = book(session.id, user_id)
+      except OperationalError:
+        # SQLite's "database is locked" under concurrent writers.
+        result = "locked"
+      finally:
+        connection.close()
+      with lock:
+        latencies.append((time.perf_counter() - started) * 1000)
+      return result
+
+    try:
+      started = time.perf_counter()
+      with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+        results = Counter(executor.map(attempt, attempts))
+      elapsed = time.perf_counter() - started
+
+      session.refresh_from_db()
+      booked = session.booked_users.count()
+      distinct = session.booked_users.values("id").distinct().count()
+
+      self.stdout.write(f"attempts:              {len(attempts)}")
+      for result, count in sorted(results.items()):
+        self.stdout.write(f"  {result:<20} {count}")
+      self.stdout.write(f"seats:                 {session.total_participant_number}")
+      self.stdout.write(f"booked users:          {booked}")
+      self.stdout.write(f"participant counter:   {session.current_participant_number}")
+      self.stdout.write(f"attempts/sec:          {len(attempts) / elapsed:.1f}")
+      self.stdout.write(f"bookings/sec:          {results[BOOKED] / elapsed:.1f}")
+      self.stdout.write(
+        f"latency                p50={statistics.median(latencies):.2f}ms "
+        f"p95={percentile(latencies, 95):.2f}ms p99={percentile(latencies, 99):.2f}ms"
+      )
+
+      problems = []
+      if booked > session.total_participant_number:
+        problems.append(f"overbooked: {booked} bookings for {session.total_participant_number} seats")
+      if distinct != booked:
+        problems.append(f"{booked - distinct} duplicate bookings")
+      if not options["legacy"] and session.current_participant_number != booked:
+        problems.append(f"counter says {session.current_participant_number}, {booked} booked")
+      if problems:
+        raise CommandError("; ".join(problems))
+    finally:
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def legacy_book(self, session_id, user_id):
+    """The booking sequence BookSessionView used before Session.objects.book()."""
+    with transaction.atomic():
+      session = Session.objects.get(id=session_id)
+      if session.booked_users.count() >= session.total_participant_number:
+        return "full"
+      if session.booked_users.filter(id=user_id).exists():
+        return "already_booked"
+      session.booked_users.add(user_id)
+      return BOOKED
+
+  def seed(self, user_count, seats):
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    coach = User.objects.create(email=f"coach@{BENCH_EMAIL_DOMAIN}", user_type="Coach", first_name="Bench", last_name="Coach")
+    User.objects.bulk_create(User(email=f"client{i}@{BENCH_EMAIL_DOMAIN}") for i in range(user_count))
+    users = list(User.objects.filter(email__startswith="client", email__endswith=f"@{BENCH_EMAIL_DOMAIN}"))
+    start = timezone.now() + datetime.timedelta(days=1)
+    meeting = Meeting.objects.create(
+      start_time=start,
+      duration=60,
+      meeting_number="0",
+      encrypted_password="",
+      join_url="",
+      start_url="",
+      creator=coach,
+    )
+    session = Session.objects.create(
+      title="Launch session",
+      start_date=start,
+      duration=60,
+      coach=coach,
+      goal="Strength",
+      level="Beginner",
+      description="",
+      total_participant_number=seats,
+      price=10,
+      meeting=meeting,
+    )
+    return session, users
@@ -0,0 +1,108 @@
+"""
+Benchmark the session listing (``GetSessionsView``) at large pages.
+
+Seeds ``--sessions`` sessions (with meetings and a few bookings by the
+requesting user), then times ``GET sessions`` pages of ``--limit`` items and
+counts the queries each request runs. Fails when a request needs more than
+``--max-queries`` queries, so it doubles as the listing's query budget check.
+
+    python manage.py session_list_bench --sessions 2000 --limit 100
+"""
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.session.models import Meeting, Session
+from backend.session.views import GetSessionsView
+from backend.users.models import User
+
+BENCH_EMAIL_DOMAIN = "session-list-bench.local"
+
+
+class Command(BaseCommand):
+  help = "Time session listing pages and check their query budget."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--sessions", type=int, default=1_000, help="Sessions to seed.")
+    parser.add_argument("--limit", type=int, default=100, help="Page size.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed requests per page.")
+    parser.add_argument("--max-queries", type=int, default=1, help="Query budget per request (page with its total).")
+
+  def handle(self, *args, **options):
+    coach, user = self.seed(options["sessions"])
+    try:
+      view = GetSessionsView.as_view()
+      factory = APIRequestFactory()
+      limit = options["limit"]
+
+      def fetch(offset):
+        request = factory.get("/api/session/get/", {"limit": limit, "offset": offset})
+        force_authenticate(request, user=user)
+        response = view(request)
+        if response.status_code != 200:
+          raise CommandError(f"Listing failed: {response.data}")
+        return response
+
+      self.stdout.write(f"{'offset':>8} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+      for offset in (0, options["sessions"] // 2):
+        with CaptureQueriesContext(connection) as queries:
+          fetch(offset)
+        timings = []
+        for _ in range(options["repeat"]):
+          started = time.perf_counter()
+          fetch(offset)
+          timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+          f"{offset:>8} {len(queries):>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f}"
+        )
+        if len(queries) > options["max_queries"]:
+          raise CommandError(
+            f"{len(queries)} queries for one page, budget is {options['max_queries']}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries)
+          )
+    finally:
+      User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+  def seed(self, count):
+    User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+    coach = User.objects.create(email=f"coach@{BENCH_EMAIL_DOMAIN}", user_type="Coach", first_name="Bench", last_name="Coach")
+    user = User.objects.create(email=f"client@{BENCH_EMAIL_DOMAIN}")
+    start = timezone.now() + datetime.timedelta(days=1)
+
+    meetings = Meeting.objects.bulk_create(
+      Meeting(
+        start_time=start,
+        duration=60,
+        meeting_number=str(i),
+        encrypted_password="",
+        join_url="",
+        start_url="",
+        creator=coach,
+      )
+      for i in range(count)
+    )
+    sessions = Session.objects.bulk_create(
+      Session(
+        title=f"Session {i}",
+        start_date=start,
+        duration=60,
+        coach=coach,
+        goal="Strength",
+        level="Beginner",
+        description="",
+        total_participant_number=20,
+        price=10,
+        meeting=meeting,
+      )
+      for i, meeting in enumerate(meetings)
+    )
+    Session.booked_users.through.objects.bulk_create(
+      Session.booked_users.through(session_id=session.id, user_id=user.id) for session in sessions[::3]
+    )
+    return coach, user
@@ -0,0 +1,172 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import m2m_changed
+
+# Outcomes of SessionQuerySet.book().
+BOOKED = "booked"
+ALREADY_BOOKED = "already_booked"
+FULL = "full"
+NOT_FOUND = "not_found"
+
+# Outcomes of SessionQuerySet.cancel().
+CANCELLED = "cancelled"
+LEFT_WAITLIST = "left_waitlist"
+NOT_BOOKED = "not_booked"
+
+class SessionFull(Exception):
+    pass
+
+class SessionQuerySet(models.QuerySet):
+    def for_listing(self, user_id):
+        """
+        Sessions ready for ``SessionListSerializer``: the coach joined in and
+        ``booked`` (whether ``user_id`` booked each one) computed by the
+        database, so a page of any size is a single query.
+        """
+        booked = self.model.booked_users.through.objects.filter(
+            session_id=models.OuterRef("pk"), user_id=user_id
+        )
+        return self.select_related("coach").annotate(booked=models.Exists(booked))
+
+    def book(self, session_id, user_id):
+        """
+        Book ``user_id`` into a session without overbooking it.
+
+        The booking row goes in first; its unique (session, user) pair turns a
+        double booking into an IntegrityError. The seat is then claimed with a
+        conditional ``UPDATE ... SET current_participant_number + 1 WHERE
+        current < total``, which holds the session row lock only until the
+        short transaction commits. Two statements on the happy path and no
+        reads, so concurrent bookings of a hot session cannot both take the
+        last seat.
+
+        Returns one of ``BOOKED``, ``ALREADY_BOOKED``, ``FULL``, ``NOT_FOUND``.
+        """
+        through = self.model.booked_users.through
+        try:
+            with transaction.atomic():
+                through.objects.create(session_id=session_id, user_id=user_id)
+                seated = self.filter(
+                    id=session_id,
+                    current_participant_number__lt=models.F("total_participant_number"),
+                ).update(current_participant_number=models.F("current_participant_number") + 1)
+                if not seated:
+                    raise SessionFull
+        except SessionFull:
+            return FULL if self.filter(id=session_id).exists() else NOT_FOUND
+        except IntegrityError:
+            # Either the user already holds a seat or the session does not exist.
+            return ALREADY_BOOKED if self.filter(id=session_id).exists() else NOT_FOUND
+
+        self._booked_users_changed("post_add", session_id, [user_id])
+        return BOOKED
+
+    def cancel(self, session_id, user_id):
+        """
+        Give up ``user_id``'s seat in a session, or their place on its waitlist.
+
+        A freed seat goes straight to the head of the waitlist in the same
+        transaction, so a direct booking cannot take it first.
+
+        Returns ``(outcome, promoted_user_ids)`` where the outcome is one of
+        ``CANCELLED``, ``LEFT_WAITLIST``, ``NOT_BOOKED``.
+        """
+        through = self.model.booked_users.through
+        waitlist = self.model.waitlist_entries.field.model.objects
+        with transaction.atomic():
+            cancelled, _ = through.objects.filter(session_id=session_id, user_id=user_id).delete()
+            if not cancelled:
+                left, _ = waitlist.filter(session_id=session_id, user_id=user_id).delete()
+                return (LEFT_WAITLIST if left else NOT_BOOKED), []
+            self.filter(id=session_id, current_participant_number__gt=0).update(
+                current_participant_number=models.F("current_participant_number") - 1
+            )
+            promoted = self._promote_next(session_id)
+
+        self._booked_users_changed("post_remove", session_id, [user_id])
+        promoted_user_ids = [promoted] if promoted is not None else []
+        self._booked_users_changed("post_add", session_id, promoted_user_ids)
+        return CANCELLED, promoted_user_ids
+
+    def promote(self, session_id):
+        """
+        Move users from the head of a session's waitlist into its free seats.
+
+        Returns the ids of the users who got a seat, in waitlist order.
+        """
+        promoted_user_ids = []
+        while True:
+            user_id = self._promote_next(session_id)
+            if user_id is None:
+                break
+            promoted_user_ids.append(user_id)
+        self._booked_users_changed("post_add", session_id, promoted_user_ids)
+        return promoted_user_ids
+
+    def _promote_next(self, session_id):
+        # Same two statements as book(), preceded by the dequeue; any failure
+        # rolls the dequeue back with them.
+        through = self.model.booked_users.through
+        waitlist = self.model.waitlist_entries.field.model.objects
+        while True:
+            user_id = None
+            try:
+                with transaction.atomic():
+                    user_id = waitlist.pop_head(session_id)
+                    if user_id is None:
+                        return None
+                    through.objects.create(session_id=session_id, user_id=user_id)
+                    seated = self.filter(
+                        id=session_id,
+                        current_participant_number__lt=models.F("total_participant_number"),
+                    ).update(current_participant_number=models.F("current_participant_number") + 1)
+                    if not seated:
+                        raise SessionFull
+                    return user_id
+            except SessionFull:
+                return None
+            except IntegrityError:
+                # Booked directly while waiting; drop the stale entry and go on.
+                waitlist.filter(session_id=session_id, user_id=user_id).delete()
+
+    def _booked_users_changed(self, action, session_id, user_ids):
+        # Bookings are written without the related manager, so tell the
+        # m2m_changed receivers (chat membership) ourselves.
+        if not user_ids:
+            return
+        m2m_changed.send(
+            sender=self.model.booked_users.through,
+            instance=self.model(id=session_id),
+            action=action,
+            reverse=False,
+            model=self.model.booked_users.field.related_model,
+            pk_set=set(user_ids),
+            using=self.db,
+        )
+
+SessionManager = models.Manager.from_queryset(SessionQuerySet)
+
+class SessionWaitlistEntryManager(models.Manager):
+    def join(self, session_id, user_id):
+        """Queue ``user_id`` for a session (once) and return their 1-based position."""
+        entry, _ = self.get_or_create(session_id=session_id, user_id=user_id)
+        return self.filter(session_id=session_id, id__lte=entry.id).count()
+
+    def pop_head(self, session_id):
+        """
+        Dequeue the longest-waiting user of a session and return their id.
+
+        The head is one seek on the (session, id) index. Concurrent promoters
+        skip a head another transaction has locked rather than queueing on it.
+        Must run inside a transaction.
+        """
+        head = (
+            self.select_for_update(skip_locked=True)
+            .filter(session_id=session_id)
+            .order_by("id")
+            .values_list("id", "user_id")
+            .first()
+        )
+        if head is None:
+            return None
+        self.filter(id=head[0]).delete()
+        return head[1]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.10 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+def backfill_participant_numbers(apps, schema_editor):
+    # Bookings used to go through booked_users.add() only, leaving the counter
+    # at 0. Session.objects.book() now trusts it, so bring it in line.
+    Session = apps.get_model("session", "Session")
+    booked = Session.booked_users.through
+    Session.objects.update(
+        current_participant_number=models.functions.Coalesce(
+            models.Subquery(
+                booked.objects.filter(session_id=models.OuterRef("pk"))
+                .values("session_id")
+                .annotate(count=models.Count("*"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_participant_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('session', '0002_backfill_current_participant_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionWaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='session.session')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Session Waitlist Entry',
+                'verbose_name_plural': 'Session Waitlist Entries',
+                'indexes': [models.Index(fields=['session', 'id'], name='session_waitlist_order_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sessionwaitlistentry',
+            constraint=models.UniqueConstraint(fields=('session', 'user'), name='unique_session_waitlist_entry'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:20
+
+import backend.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently, which cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('session', '0003_session_waitlist_entry'),
+        ('users', '0005_trigram_search_indexes'),
+    ]
+
+    operations = [
+        backend.search.AddTrigramIndex(
+            model_name='session',
+            index=backend.search.trigram_index('title', 'session_title_trgm_idx'),
+        ),
+        backend.search.AddTrigramIndex(
+            model_name='session',
+            index=backend.search.trigram_index('goal', 'session_goal_trgm_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from backend.users.models import User
 from backend.classes.models import Class
+from backend.search import trigram_index
+from backend.session.managers import SessionManager, SessionWaitlistEntryManager
 
 class Meeting(models.Model):
     start_time = models.DateTimeField(blank=False, null=False)
@@ -42,6 +44,8 @@ class Session(models.Model):
     booked_users = models.ManyToManyField(User, verbose_name=_("Booked Users"), related_name="booked_sessions")
     meeting = models.OneToOneField(Meeting, verbose_name=_("session_meeting"), on_delete=models.CASCADE)
 
+    objects = SessionManager()
+
     def __str__(self):
         return f"{self.title}"
 
@@ -49,6 +53,33 @@ class Session(models.Model):
         app_label = "session"
         verbose_name = _("Session")
         verbose_name_plural = _("Sessions")
+        indexes = [
+            # Serve title/goal __icontains in the session listing (backend.search).
+            trigram_index("title", "session_title_trgm_idx"),
+            trigram_index("goal", "session_goal_trgm_idx"),
+        ]
+
+class SessionWaitlistEntry(models.Model):
+    """A user waiting for a seat in a full session; lower ids are served first."""
+    session = models.ForeignKey(Session, related_name="waitlist_entries", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="session_waitlist_entries", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SessionWaitlistEntryManager()
+
+    def __str__(self):
+        return f"{self.user_id} waiting for {self.session_id}"
+
+    class Meta:
+        app_label = "session"
+        verbose_name = _("Session Waitlist Entry")
+        verbose_name_plural = _("Session Waitlist Entries")
+        constraints = [
+            models.UniqueConstraint(fields=["session", "user"], name="unique_session_waitlist_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["session", "id"], name="session_waitlist_order_idx"),
+        ]
 
 class ClassSession(models.Model):
     title = models.CharField(max_length=50, blank=False, null=False)
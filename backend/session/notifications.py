@@ -0,0 +1,27 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from backend.chat.fanout import group_send_many
+from backend.chat.groups import get_user_group_name
+
+def notify_waitlist_promoted(session_id, user_ids):
+    """
+    Tell promoted users' open sockets that they now hold a seat.
+
+    Sent over each user's ``group_{uuid}`` chat group once the surrounding
+    transaction commits, so clients stop polling the session list.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def send():
+        group_names = [name for name in map(get_user_group_name, user_ids) if name is not None]
+        if group_names:
+            event = {"type": "waitlist_promoted", "sessionId": session_id, "sentAt": time.time()}
+            async_to_sync(group_send_many)(get_channel_layer(), group_names, event)
+
+    transaction.on_commit(send)
@@ -41,7 +41,7 @@ class SessionSerializer(serializers.ModelSerializer):
     return None
 
   def get_coachId(self, obj):
-    return obj.coach.id if obj.coach else None
+    return obj.coach_id
 
   def get_coachFullname(self, obj):
     if obj.coach:
@@ -49,4 +49,11 @@ class SessionSerializer(serializers.ModelSerializer):
     return None
 
   def get_meetingId(self, obj):
-    return obj.meeting.id if obj.meeting else None
\ No newline at end of file
+    return obj.meeting_id
+
+class SessionListSerializer(SessionSerializer):
+  """Serializes ``Session.objects.for_listing(user)`` rows."""
+  booked = serializers.BooleanField(read_only=True)
+
+  class Meta(SessionSerializer.Meta):
+    fields = SessionSerializer.Meta.fields + ['booked']
\ No newline at end of file
@@ -1,3 +1,177 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.session.managers import BOOKED, CANCELLED, FULL, LEFT_WAITLIST
+from backend.session.models import Meeting, Session, SessionWaitlistEntry
+from backend.session.views import BookSessionView, GetSessionsView
+from backend.testing import create_users, run_concurrently
+
+def create_sessions(coach, count, seats=10):
+  start = timezone.now() + datetime.timedelta(days=1)
+  sessions = []
+  for i in range(count):
+    meeting = Meeting.objects.create(
+      start_time=start,
+      duration=60,
+      meeting_number=str(i),
+      encrypted_password="",
+      join_url="",
+      start_url="",
+      creator=coach,
+    )
+    sessions.append(Session.objects.create(
+      title=f"Session {i}",
+      start_date=start,
+      duration=60,
+      coach=coach,
+      goal="Strength",
+      level="Beginner",
+      description="",
+      total_participant_number=seats,
+      price=10,
+      meeting=meeting,
+    ))
+  return sessions
+
+class SessionListTests(TestCase):
+  def test_page_flags_the_callers_bookings(self):
+    coach, client, other = create_users(3)
+    coach.user_type = "Coach"
+    coach.save()
+    sessions = create_sessions(coach, 12)
+    booked_ids = {session.id for session in sessions[::3]}
+    for session_id in booked_ids:
+      self.assertEqual(Session.objects.book(session_id, client.id), BOOKED)
+    # Someone else's booking does not count as the caller's.
+    Session.objects.book(sessions[1].id, other.id)
+
+    request = APIRequestFactory().get("/api/session/get/", {"limit": 100, "offset": 0})
+    force_authenticate(request, user=client)
+    # The page, the coaches, the booked flags and the total, whatever the page
+    # size; on Postgres the planner's estimate of the total is asked first.
+    with self.assertNumQueries(2 if connection.vendor == "postgresql" else 1):
+      response = GetSessionsView.as_view()(request)
+
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.data["totalSessionCount"], len(sessions))
+    self.assertEqual(
+      {session["id"]: session["booked"] for session in response.data["sessions"]},
+      {session.id: session.id in booked_ids for session in sessions},
+    )
+
+class BookSessionTests(TransactionTestCase):
+  def test_concurrent_bookings_never_overbook(self):
+    coach, *clients = create_users(25)
+    session, = create_sessions(coach, 1, seats=10)
+
+    results = run_concurrently(
+      lambda user: Session.objects.book(session.id, user.id), clients, threads=len(clients)
+    )
+
+    session.refresh_from_db()
+    # A booking retried after a locked-table error can report ALREADY_BOOKED;
+    # the rows are the ground truth.
+    self.assertIn(FULL, results)
+    self.assertEqual(session.current_participant_number, session.total_participant_number)
+    self.assertEqual(
+      Session.booked_users.through.objects.filter(session=session).count(), session.total_participant_number
+    )
+
+class WaitlistTests(TestCase):
+  def waiting(self, session):
+    return list(SessionWaitlistEntry.objects.filter(session=session).order_by("id").values_list("user_id", flat=True))
+
+  def booked(self, session):
+    session.refresh_from_db()
+    self.assertEqual(
+      session.current_participant_number, Session.booked_users.through.objects.filter(session=session).count()
+    )
+    return set(Session.booked_users.through.objects.filter(session=session).values_list("user_id", flat=True))
+
+  def test_full_session_queues_callers_who_ask(self):
+    coach, seated, first, second = create_users(4)
+    session, = create_sessions(coach, 1, seats=1)
+    Session.objects.book(session.id, seated.id)
+
+    def book(user, **data):
+      request = APIRequestFactory().post("/api/session/book/", {"sessionId": session.id, **data})
+      force_authenticate(request, user=user)
+      return BookSessionView.as_view()(request)
+
+    self.assertEqual(book(first).status_code, 400)
+    self.assertEqual(self.waiting(session), [])
+    responses = [book(user, joinWaitlist="true") for user in (first, second, first)]
+
+    self.assertEqual([response.status_code for response in responses], [202, 202, 202])
+    # Joining again keeps the place in the queue.
+    self.assertEqual([response.data["position"] for response in responses], [1, 2, 1])
+    self.assertEqual(self.waiting(session), [first.id, second.id])
+
+  def test_cancel_hands_the_seat_to_the_head_of_the_waitlist(self):
+    coach, seated, first, second = create_users(4)
+    session, = create_sessions(coach, 1, seats=1)
+    Session.objects.book(session.id, seated.id)
+    for user in (first, second):
+      SessionWaitlistEntry.objects.join(session.id, user.id)
+
+    self.assertEqual(Session.objects.cancel(session.id, seated.id), (CANCELLED, [first.id]))
+    self.assertEqual(self.booked(session), {first.id})
+    self.assertEqual(self.waiting(session), [second.id])
+    # Leaving the waitlist frees no seat, so nobody moves.
+    self.assertEqual(Session.objects.cancel(session.id, second.id), (LEFT_WAITLIST, []))
+    self.assertEqual(self.booked(session), {first.id})
+    self.assertEqual(self.waiting(session), [])
+
+  def test_promotion_skips_users_who_booked_directly(self):
+    coach, seated, *waiting = create_users(5)
+    session, = create_sessions(coach, 1, seats=3)
+    Session.objects.book(session.id, seated.id)
+    for user in waiting:
+      SessionWaitlistEntry.objects.join(session.id, user.id)
+    # The first two in the queue took the free seats themselves; their
+    # promotions fail on the unique booking and are dropped one after the other.
+    for user in waiting[:2]:
+      self.assertEqual(Session.objects.book(session.id, user.id), BOOKED)
+
+    self.assertEqual(Session.objects.cancel(session.id, seated.id), (CANCELLED, [waiting[2].id]))
+    self.assertEqual(self.booked(session), {user.id for user in waiting})
+    self.assertEqual(self.waiting(session), [])
+
+  def test_promote_stops_when_the_seats_run_out(self):
+    coach, *waiting = create_users(5)
+    session, = create_sessions(coach, 1, seats=2)
+    for user in waiting:
+      SessionWaitlistEntry.objects.join(session.id, user.id)
+
+    self.assertEqual(Session.objects.promote(session.id), [user.id for user in waiting[:2]])
+    # The dequeue of the user who found no seat was rolled back.
+    self.assertEqual(self.waiting(session), [user.id for user in waiting[2:]])
+    self.assertEqual(Session.objects.promote(session.id), [])
+
+class WaitlistRaceTests(TransactionTestCase):
+  def test_racing_promotions_never_overbook(self):
+    coach, *users = create_users(14)
+    seated, waiting = users[:3], users[3:]
+    session, = create_sessions(coach, 1, seats=len(seated))
+    for user in seated:
+      Session.objects.book(session.id, user.id)
+    for user in waiting:
+      SessionWaitlistEntry.objects.join(session.id, user.id)
+
+    # Every seated user cancels while sweeps promote into the same seats.
+    calls = [lambda user=user: Session.objects.cancel(session.id, user.id) for user in seated]
+    calls += [lambda: Session.objects.promote(session.id)] * 5
+    run_concurrently(lambda call: call(), calls, threads=len(calls))
+
+    session.refresh_from_db()
+    booked = set(Session.booked_users.through.objects.filter(session=session).values_list("user_id", flat=True))
+    still_waiting = set(SessionWaitlistEntry.objects.filter(session=session).values_list("user_id", flat=True))
+    self.assertEqual(session.current_participant_number, session.total_participant_number)
+    self.assertEqual(len(booked), session.total_participant_number)
+    # Each waiting user either got a seat or is still queued, never both.
+    self.assertEqual(booked | still_waiting, {user.id for user in waiting})
+    self.assertFalse(booked & still_waiting)
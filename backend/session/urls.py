@@ -7,6 +7,7 @@ from .views import (
   GetMySessionTotalCountView,
   CreateMeetingView,
   BookSessionView,
+  CancelSessionBookingView,
   JoinSessionView,
 )
 
@@ -18,5 +19,6 @@ urlpatterns = [
   path("get/mine/", view=GetMySessionsView.as_view(), name="get sessions"),
   path("get/mine/count/", view=GetMySessionTotalCountView.as_view(), name="get session count"),
   path("book/", view=BookSessionView.as_view(), name="book session"),
+  path("cancel/", view=CancelSessionBookingView.as_view(), name="cancel session booking"),
   path("create/instant/", view=CreateMeetingView.as_view(), name="create sessions"),
 ]
@@ -7,6 +7,8 @@ import requests
 import os
 import jwt
 
+from backend.tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 CLIENT_ID = os.environ.get("ZOOM_CLIENT_ID", "")
@@ -60,7 +62,7 @@ def create_zoom_meeting(payload):
         else:
             raise Exception(f"Failed to create meeting: {response.json()}")
     except Exception as e:
-        print(f"Error response: {e}")
+        tracer.event("session.zoom.create_meeting.error", level=logging.ERROR, error=str(e))
         raise
 
 def create_auth_signature(meeting_number, role):
@@ -88,5 +90,5 @@ def create_auth_signature(meeting_number, role):
         )
         return {'signature': jwtEncode, 'sdkKey': ZOOM_SDK_CLIENT_ID}
     except Exception as e:
-        print(f"An error occurred: {e}")
+        tracer.event("session.zoom.auth_signature.error", level=logging.ERROR, error=str(e))
         raise
@@ -1,10 +1,10 @@
 import os
-import traceback
-from django.db import ProgrammingError
+from django.db import ProgrammingError, transaction
 import requests
 import base64
 from django.shortcuts import render
 from django.db.models import Max
+from django.utils.decorators import method_decorator
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -12,7 +12,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 import logging
 
-from backend.session.models import Session, Meeting
+from backend.session.managers import ALREADY_BOOKED, BOOKED, FULL, LEFT_WAITLIST, NOT_BOOKED, NOT_FOUND
+from backend.session.models import Session, SessionWaitlistEntry, Meeting
+from backend.session.notifications import notify_waitlist_promoted
+from backend.pagination import count_rows, paginate
+from backend.search import contains
+from backend.tracing import tracer
 from django.conf import settings
 from .dto import (
   GetSessionsRequestDTO,
@@ -22,7 +27,7 @@ from .dto import (
 )
 from .util import create_zoom_meeting
 
-from .serializers import SessionSerializer
+from .serializers import SessionListSerializer, SessionSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -51,29 +56,20 @@ class GetSessionsView(APIView):
     try:
       sessions_query = Session.objects.all()
 
-      if goal:
-        sessions_query = sessions_query.filter(goal__icontains=goal)
-
-      if query:
-        sessions_query = sessions_query.filter(title__icontains=query)
+      sessions_query = contains(sessions_query, "goal", goal)
+      sessions_query = contains(sessions_query, "title", query)
 
       if booked is True:
         user = request.user
         sessions_query = sessions_query.filter(booked_users=user)
 
-      total_sessions = sessions_query.count()
-      
-      # Apply pagination (limit and offset)
-      sessions_query = sessions_query[offset:offset + limit]
-
-      session_data = SessionSerializer(sessions_query, many=True).data
-
-      for session in session_data:
-        session_obj = Session.objects.get(id=session["id"])
-        booked_users = session_obj.booked_users.all()
-        is_booked = booked_users.filter(id=request.user.id).exists()
+      # One query: the page with coach and booked, and the total via COUNT(*) OVER ()
+      # (estimated like GetSessionTotalCountView's once it is large).
+      sessions, total_sessions = paginate(
+        sessions_query.for_listing(request.user.id).order_by("id"), offset, limit, approximate=True
+      )
 
-        session["booked"] = is_booked
+      session_data = SessionListSerializer(sessions, many=True).data
 
       return Response(
         {
@@ -85,8 +81,7 @@ class GetSessionsView(APIView):
       )
     
     except AttributeError as e:
-      print("AttributeError:", str(e))
-      traceback.print_exc()
+      tracer.event("session.get_sessions.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Attribute error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -120,17 +115,15 @@ class GetSessionTotalCountView(APIView):
     try:
       sessions_query = Session.objects.all()
 
-      if goal:
-        sessions_query = sessions_query.filter(goal__icontains=goal)
-      
-      if query:
-        sessions_query = sessions_query.filter(title__icontains=query)
+      sessions_query = contains(sessions_query, "goal", goal)
+      sessions_query = contains(sessions_query, "title", query)
 
       if booked:
         user = request.user
         sessions_query = sessions_query.filter(booked_users = user)
 
-      total_sessions = sessions_query.count()
+      # GetSessionsView returns the same total with each page.
+      total_sessions = count_rows(sessions_query, approximate=True)
 
       return Response(
         {"message": "Fetched session count successfully", "totalSessionCount": total_sessions},
@@ -143,6 +136,9 @@ class GetSessionTotalCountView(APIView):
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
       )
     
+# Session.objects.book() runs its own short transaction; under the request-wide
+# one the session row lock would be held until the response is rendered.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class BookSessionView(APIView):
   permission_classes = [IsAuthenticated]
   authentication_classes = [JWTAuthentication]
@@ -159,31 +155,50 @@ class BookSessionView(APIView):
       )
     
     try:
-      session = Session.objects.get(id=sessionId)
-
-      if session.booked_users.count() >= session.total_participant_number:
+      result = Session.objects.book(int(sessionId), user.id)
+
+      if result == FULL and str(data.get("joinWaitlist", "")).lower() in ("true", "1"):
+        position = SessionWaitlistEntry.objects.join(int(sessionId), user.id)
+        # A seat may have been freed between the failed booking and joining.
+        promoted = Session.objects.promote(int(sessionId))
+        notify_waitlist_promoted(int(sessionId), [user_id for user_id in promoted if user_id != user.id])
+        if user.id not in promoted:
+          return Response(
+            {
+              "message": "Session is fully booked. You have been added to the waitlist.",
+              "position": position,
+            },
+            status=status.HTTP_202_ACCEPTED,
+          )
+        result = BOOKED
+
+      if result == FULL:
         return Response(
           {"error": "Session is fully booked."},
           status=status.HTTP_400_BAD_REQUEST,
         )
 
-      if session.booked_users.filter(id=user.id).exists():
+      if result == ALREADY_BOOKED:
         return Response(
           {"error": "You are already booked for this session."},
           status=status.HTTP_400_BAD_REQUEST,
         )
 
-      session.booked_users.add(user)
+      if result == NOT_FOUND:
+        return Response(
+          {"error": "Session not found."},
+          status=status.HTTP_404_NOT_FOUND,
+        )
 
       return Response(
         {"message": "Successfully booked the session."},
         status=status.HTTP_200_OK,
       )
     
-    except Session.DoesNotExist:
+    except (TypeError, ValueError):
       return Response(
-          {"error": "Session not found."},
-          status=status.HTTP_404_NOT_FOUND,
+        {"error": "Invalid request data"},
+        status=status.HTTP_400_BAD_REQUEST
       )
     except Exception as e:
       logger.error(f"Error booking session: {e}")
@@ -192,6 +207,56 @@ class BookSessionView(APIView):
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
       )
   
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class CancelSessionBookingView(APIView):
+  permission_classes = [IsAuthenticated]
+  authentication_classes = [JWTAuthentication]
+
+  def post(self, request):
+    data = request.data
+    user = request.user
+
+    sessionId = data.get("sessionId")
+    if sessionId == "":
+      return Response(
+        {"error": "Invalid request data"},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+
+    try:
+      result, promoted = Session.objects.cancel(int(sessionId), user.id)
+
+      if result == NOT_BOOKED:
+        return Response(
+          {"error": "You are not booked for this session."},
+          status=status.HTTP_400_BAD_REQUEST,
+        )
+
+      notify_waitlist_promoted(int(sessionId), promoted)
+
+      if result == LEFT_WAITLIST:
+        return Response(
+          {"message": "Successfully left the waitlist."},
+          status=status.HTTP_200_OK,
+        )
+
+      return Response(
+        {"message": "Successfully cancelled the booking."},
+        status=status.HTTP_200_OK,
+      )
+
+    except (TypeError, ValueError):
+      return Response(
+        {"error": "Invalid request data"},
+        status=status.HTTP_400_BAD_REQUEST
+      )
+    except Exception as e:
+      logger.error(f"Error cancelling session booking: {e}")
+      return Response(
+        {"error": "Failed to cancel booking"},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+      )
+
 class JoinSessionView(APIView):
   permission_classes = [IsAuthenticated]
   authentication_classes = [JWTAuthentication]
@@ -357,25 +422,14 @@ class GetMySessionsView(APIView):
     try:
       sessions_query = Session.objects.all()
 
-      if query:
-        sessions_query = sessions_query.filter(title__icontains=query)
+      sessions_query = contains(sessions_query, "title", query)
       
-      session_query = sessions_query.filter(coach=request.user)
-
-      total_sessions = session_query.count()
-
-      sessions_query = sessions_query[offset:offset + limit]
+      sessions_query = sessions_query.filter(coach=request.user).select_related("coach").order_by("id")
 
-      session_data = []
+      sessions, total_sessions = paginate(sessions_query, offset, limit, approximate=True)
 
-      for session in sessions_query:
-        # Serialize each session object using the SessionSerializer
-        serializer = SessionSerializer(session)
-        
-        # Append the serialized data to the session_data list
-        session_data.append(serializer.data)
+      session_data = SessionSerializer(sessions, many=True).data
 
-      # Now you can use `session_data` to return a response
       return Response(
         {
           "message": "Sessions fetched successfully.",
@@ -386,26 +440,21 @@ class GetMySessionsView(APIView):
       )
     
     except ProgrammingError as e:
-      # Log the error for debugging purposes
-      print(f"Database error: {str(e)}")
+      tracer.event("session.get_my_sessions.db_error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Database error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
       )
     
     except AssertionError as e:
-      # Log the full traceback for debugging
-      print("AssertionError:", str(e))
-      traceback.print_exc()
+      tracer.event("session.get_my_sessions.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Assertion error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
       )
     
     except AttributeError as e:
-      # Log the full traceback for debugging
-      print("AttributeError:", str(e))
-      traceback.print_exc()
+      tracer.event("session.get_my_sessions.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Attribute error occurred", "detail": str(e)},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -436,10 +485,10 @@ class GetMySessionTotalCountView(APIView):
     try:
       sessions_query = Session.objects.all()
 
-      if query:
-        sessions_query = sessions_query.filter(title__icontains=query)
+      sessions_query = contains(sessions_query, "title", query)
 
-      total_sessions = sessions_query.count()
+      # GetMySessionsView returns the same total with each page.
+      total_sessions = count_rows(sessions_query.filter(coach=request.user), approximate=True)
 
       return Response(
         {"message": "Fetched my session count successfully", "totalSessionCount": total_sessions},
@@ -475,7 +524,7 @@ class CreateMeetingView(APIView):
         status=status.HTTP_201_CREATED,
       )
     except Exception as e:
-      print(e)
+      tracer.event("session.create_meeting.error", level=logging.ERROR, exc_info=True)
       return Response(
         {"error": "Something went wrong"},
         status=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,41 @@
+"""Helpers shared by the apps' test modules."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connection
+
+from backend.users.models import User
+
+def create_users(count, domain="tests.local"):
+  return [User.objects.create_user(email=f"user{i}@{domain}", full_name=f"User {i}") for i in range(count)]
+
+def run_concurrently(fn, args, threads=8):
+  """
+  Call ``fn`` once per item of ``args`` from ``threads`` threads released
+  together, and return the results in the order of ``args``.
+
+  SQLite's in-memory test database rejects a writer that meets another one
+  instead of waiting, so a call failing with OperationalError is retried;
+  ``fn`` must leave nothing behind when it fails that way.
+  """
+  barrier = threading.Barrier(threads)
+  results = [None] * len(args)
+
+  def call(arg):
+    while True:
+      try:
+        return fn(arg)
+      except OperationalError:
+        continue
+
+  def worker(first):
+    barrier.wait()
+    try:
+      for i in range(first, len(args), threads):
+        results[i] = call(args[i])
+    finally:
+      connection.close()
+
+  with ThreadPoolExecutor(max_workers=threads) as executor:
+    list(executor.map(worker, range(threads)))
+  return results
@@ -0,0 +1,152 @@
+"""
+Lightweight tracing and metrics for hot paths.
+
+Every span feeds an in-process timing aggregate (count / total / max), which
+is cheap enough to keep on for every event. Only a sampled fraction of
+traces is also written to the ``backend.tracing`` logger as one structured
+record per span; the decision is made once at the root span and inherited by
+the spans nested under it, so a sampled trace is always complete.
+
+    with tracer.span("chat.receive", type=message_type):
+        with tracer.span("chat.db"):
+            ...
+
+``tracer.event`` replaces ad-hoc ``print`` calls: it counts the event and
+logs it (with its attributes) only when sampled. ``metrics.snapshot()`` is
+the export, served to admins by ``backend.views.MetricsView``. Metrics are
+per process.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Metrics:
+  """Thread-safe counters and timing aggregates, keyed by name."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._counters = {}
+    self._timings = {}
+
+  def incr(self, name, value=1):
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + value
+
+  def observe(self, name, seconds):
+    with self._lock:
+      timing = self._timings.get(name)
+      if timing is None:
+        self._timings[name] = [1, seconds, seconds]
+      else:
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds > timing[2]:
+          timing[2] = seconds
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        "counters": dict(self._counters),
+        "timings": {
+          name: {
+            "count": count,
+            "totalMs": total * 1000,
+            "avgMs": total * 1000 / count,
+            "maxMs": peak * 1000,
+          }
+          for name, (count, total, peak) in self._timings.items()
+        },
+      }
+
+  def reset(self):
+    with self._lock:
+      self._counters.clear()
+      self._timings.clear()
+
+class _Trace:
+  __slots__ = ("trace_id", "sampled")
+
+  def __init__(self, sampled):
+    self.trace_id = uuid.uuid4().hex[:16] if sampled else None
+    self.sampled = sampled
+
+class Span:
+  """Times a block; usable with both ``with`` and ``async with``."""
+
+  __slots__ = ("tracer", "name", "attrs", "started", "token")
+
+  def __init__(self, tracer, name, attrs):
+    self.tracer = tracer
+    self.name = name
+    self.attrs = attrs
+    self.started = None
+    self.token = None
+
+  def __enter__(self):
+    if _current_trace.get() is None:
+      self.token = _current_trace.set(_Trace(self.tracer.should_sample()))
+    self.started = time.perf_counter()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    elapsed = time.perf_counter() - self.started
+    self.tracer.metrics.observe(self.name, elapsed)
+    if exc_type is not None:
+      self.tracer.metrics.incr(f"{self.name}.errors")
+
+    trace = _current_trace.get()
+    if trace is not None and trace.sampled:
+      record = {
+        "trace_id": trace.trace_id,
+        "span": self.name,
+        "duration_ms": round(elapsed * 1000, 3),
+        "error": exc_type.__name__ if exc_type else None,
+        **self.attrs,
+      }
+      logger.info("span %s", record, extra={"trace": record})
+
+    if self.token is not None:
+      _current_trace.reset(self.token)
+    return False
+
+  async def __aenter__(self):
+    return self.__enter__()
+
+  async def __aexit__(self, exc_type, exc, tb):
+    return self.__exit__(exc_type, exc, tb)
+
+class Tracer:
+  def __init__(self, sample_rate=0.0, metrics=None):
+    self.sample_rate = sample_rate
+    self.metrics = metrics or Metrics()
+
+  def should_sample(self):
+    return self.sample_rate > 0 and random.random() < self.sample_rate
+
+  def span(self, name, **attrs):
+    return Span(self, name, attrs)
+
+  def event(self, name, level=logging.INFO, exc_info=False, **attrs):
+    """Count an event and log it when sampled (always, for warnings and up)."""
+    self.metrics.incr(name)
+    trace = _current_trace.get()
+    sampled = trace.sampled if trace is not None else self.should_sample()
+    if sampled or level >= logging.WARNING:
+      record = {"trace_id": trace.trace_id if trace else None, "event": name, **attrs}
+      logger.log(level, "event %s", record, exc_info=exc_info, extra={"trace": record})
+
+metrics = Metrics()
+
+tracer = Tracer(
+  sample_rate=getattr(settings, "TRACING_SAMPLE_RATE", 0.0),
+  metrics=metrics,
+)
@@ -10,10 +10,10 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from django_ratelimit.decorators import ratelimit
 
 from backend.users.models import CoachProfile, User
+from backend.users.tokens import UserRefreshToken
 
 from ..serializers import ClientSerializer, LoginSerializer
 
@@ -159,7 +159,7 @@ class LoginView(APIView):
             if user is not None:
                 if user.email_verified:
                     login(request, user)
-                    refresh = RefreshToken.for_user(user)
+                    refresh = UserRefreshToken.for_user(user)
                     return Response(
                         {
                             "message": "Successfully Logged in",
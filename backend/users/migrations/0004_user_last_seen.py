@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_remove_coachreview_reviewer_coachreview_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Seen'),
+        ),
+    ]
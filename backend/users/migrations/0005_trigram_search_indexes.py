@@ -0,0 +1,27 @@
+# Generated by Django 4.2.10 on 2026-10-18 19:20
+
+import backend.search
+import django.contrib.postgres.operations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently, which cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_user_last_seen'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        backend.search.AddTrigramIndex(
+            model_name='user',
+            index=backend.search.trigram_index('full_name', 'user_full_name_trgm_idx'),
+        ),
+        backend.search.AddTrigramIndex(
+            model_name='coachprofile',
+            index=backend.search.trigram_index('specialization', 'coach_specialization_trgm_idx'),
+        ),
+    ]
@@ -7,6 +7,8 @@ from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from backend.search import trigram_index
+
 from .managers import UserManager
 
 class User(AbstractUser):
@@ -26,6 +28,8 @@ class User(AbstractUser):
         blank=True,
     )
     email_verified = models.BooleanField(_("Email Verified"), default=False)
+    # Written in batches by backend.chat.presence when the user's sockets close.
+    last_seen = models.DateTimeField(_("Last Seen"), null=True, blank=True)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -50,6 +54,10 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _("User")
         verbose_name_plural = _("Users")
+        indexes = [
+            # Serve full_name__icontains in the coach search (backend.search).
+            trigram_index("full_name", "user_full_name_trgm_idx"),
+        ]
 
 class CoachReview(models.Model):
     coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="review_coach", limit_choices_to={"user_type": "Coach"})
@@ -82,6 +90,12 @@ class CoachProfile(models.Model):
     # TODO!: update default value to false after admin feature is ready
     listed = models.BooleanField(_("Listed"), default=True, help_text=_("Indicates whether the coach is approved by the admin"))
 
+    class Meta:
+        indexes = [
+            # Serve specialization__icontains in the coach search (backend.search).
+            trigram_index("specialization", "coach_specialization_trgm_idx"),
+        ]
+
 class Certification(models.Model):
     coach = models.ForeignKey(
         CoachProfile,
@@ -0,0 +1,18 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens also carry the user's ``uuid`` and
+    ``user_type``, so services that only verify the signature (the chat
+    socket) can identify the user without a database lookup.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token["uuid"] = str(user.uuid)
+        token["user_type"] = user.user_type
+        return token
+
+def access_token_for(user):
+    return str(UserRefreshToken.for_user(user).access_token)
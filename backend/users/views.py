@@ -9,6 +9,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.response import Response
 from django.utils.translation import gettext_lazy as _
 from backend.users.models import User, CoachProfile, Certification
+from backend.pagination import count_rows, paginate
+from backend.search import contains
 from django.conf import settings
 
 from .serializers import (
@@ -233,16 +235,14 @@ class GetCoachesView(APIView):
     try:
       coaches_query = User.objects.filter(user_type="Coach")
 
-      if query:
-        coaches_query = coaches_query.filter(full_name__icontains=query)
+      coaches_query = contains(coaches_query, "full_name", query)
       if specialization != "All":
-        coaches_query = coaches_query.filter(coach_profile__specialization__icontains=specialization)
+        coaches_query = contains(coaches_query, "coach_profile__specialization", specialization)
       if listed_filter != "all":
         listed_bool = listed_filter == "listed"
         coaches_query = coaches_query.filter(coach_profile__listed=listed_bool)
 
-      total_count = coaches_query.count()
-      coaches = coaches_query[offset:offset + limit]
+      coaches, total_count = paginate(coaches_query.order_by("id"), offset, limit, approximate=True)
 
       serialized_coaches = GetCoachesResponseDTO(coaches, many=True).data
 
@@ -291,15 +291,15 @@ class GetCoachesTotalCountView(APIView):
     try:
       coaches_query = User.objects.filter(user_type="Coach")
 
-      if query:
-        coaches_query = coaches_query.filter(full_name__icontains=query)
+      coaches_query = contains(coaches_query, "full_name", query)
       if specialization != "All":
-        coaches_query = coaches_query.filter(coach_profile__specialization__icontains=specialization)
+        coaches_query = contains(coaches_query, "coach_profile__specialization", specialization)
       if listed_filter != "all":
         listed_bool = listed_filter == "listed"
         coaches_query = coaches_query.filter(coach_profile__listed=listed_bool)
       
-      total_count = coaches_query.count()
+      # GetCoachesView returns the same total with each page.
+      total_count = count_rows(coaches_query, approximate=True)
 
       return Response(
         {
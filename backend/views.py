@@ -1,3 +1,19 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-# Create your views here.
+from backend.permissions import IsAdminUserOnly
+from backend.tracing import metrics
+
+class MetricsView(APIView):
+  """Timings and counters collected by ``backend.tracing`` in this process."""
+  permission_classes = [IsAuthenticated, IsAdminUserOnly]
+  authentication_classes = [JWTAuthentication]
+
+  def get(self, request):
+    return Response(
+      {"message": "Metrics fetched successfully", "metrics": metrics.snapshot()},
+      status=status.HTTP_200_OK
+    )
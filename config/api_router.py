@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework.routers import SimpleRouter
 
 from backend.users.api.views import UserViewSet
+from backend.views import MetricsView
 from django.urls import path, include
 
 if settings.DEBUG:
@@ -19,6 +20,7 @@ sub_urls = [
     path("session/", include('session.urls')),
     path("classes/", include('classes.urls')),
     path("exercises/", include('exercises.urls')),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
 
 app_name = "api"
@@ -14,7 +14,7 @@ from pathlib import Path
 
 from django.conf import settings
 import backend.chat.routing
-from channels.auth import AuthMiddlewareStack
+from backend.chat.middleware import JWTAuthMiddleware
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
@@ -34,7 +34,7 @@ django_application = get_asgi_application()
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             backend.chat.routing.websocket_urlpatterns
         )
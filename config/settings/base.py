@@ -70,6 +70,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -362,3 +363,53 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Process-wide cache of user id -> channel layer group name used by ChatConsumer
+CHAT_GROUP_CACHE_SIZE = env.int("CHAT_GROUP_CACHE_SIZE", default=10_000)
+CHAT_GROUP_CACHE_TTL = env.int("CHAT_GROUP_CACHE_TTL", default=300)
+# Fan chat messages out before they are stored and persist them in batches
+# (see backend.chat.writer.MessageWriter for the flush semantics). Messages
+# still buffered when a process is killed are lost
+CHAT_WRITE_BEHIND = env.bool("CHAT_WRITE_BEHIND", default=False)
+CHAT_WRITE_BEHIND_BATCH_SIZE = env.int("CHAT_WRITE_BEHIND_BATCH_SIZE", default=500)
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL = env.float("CHAT_WRITE_BEHIND_FLUSH_INTERVAL", default=0.05)
+CHAT_WRITE_BEHIND_MAX_PENDING = env.int("CHAT_WRITE_BEHIND_MAX_PENDING", default=10_000)
+CHAT_WRITE_BEHIND_RETRY_INTERVAL = env.float("CHAT_WRITE_BEHIND_RETRY_INTERVAL", default=1.0)
+# Online status of chat users: "local" (single process) or "redis"
+CHAT_PRESENCE_BACKEND = env("CHAT_PRESENCE_BACKEND", default="local")
+CHAT_PRESENCE_REDIS_URL = env("CHAT_PRESENCE_REDIS_URL", default="redis://127.0.0.1:6379/1")
+CHAT_PRESENCE_TTL = env.int("CHAT_PRESENCE_TTL", default=60)
+CHAT_LAST_SEEN_FLUSH_INTERVAL = env.float("CHAT_LAST_SEEN_FLUSH_INTERVAL", default=5.0)
+# Typing indicators: at most one start/stop event per recipient per window,
+# and a stop on the sender's behalf after this many idle seconds
+CHAT_TYPING_WINDOW = env.float("CHAT_TYPING_WINDOW", default=2.0)
+CHAT_TYPING_IDLE_TIMEOUT = env.float("CHAT_TYPING_IDLE_TIMEOUT", default=6.0)
+# Fraction of traces (backend.tracing) logged span by span; timings and
+# counters are aggregated for every event regardless
+TRACING_SAMPLE_RATE = env.float("TRACING_SAMPLE_RATE", default=0.01)
+# Per-user log of delivered chat messages, replayed to sockets that reconnect
+# with ?lastSeq=: "local" (single process) or "redis"
+CHAT_DELIVERY_LOG_BACKEND = env("CHAT_DELIVERY_LOG_BACKEND", default="local")
+CHAT_DELIVERY_LOG_REDIS_URL = env("CHAT_DELIVERY_LOG_REDIS_URL", default="redis://127.0.0.1:6379/1")
+CHAT_DELIVERY_LOG_SIZE = env.int("CHAT_DELIVERY_LOG_SIZE", default=200)
+CHAT_DELIVERY_LOG_TTL = env.int("CHAT_DELIVERY_LOG_TTL", default=86400)
+# Chat socket admission control and backpressure (see backend.chat.admission)
+CHAT_MAX_CONNECTIONS_PER_USER = env.int("CHAT_MAX_CONNECTIONS_PER_USER", default=10)
+CHAT_MAX_CONNECTIONS_PER_PROCESS = env.int("CHAT_MAX_CONNECTIONS_PER_PROCESS", default=10_000)
+# Inbound frames per socket: type -> (tokens per second, burst)
+CHAT_RATE_LIMITS = {
+    "send_message": (5, 20),
+    "is_typing": (10, 20),
+    "mark_read": (5, 10),
+    "default": (5, 10),
+}
+# Seconds an event may wait for its socket before transient events are shed
+# and, further behind, before the socket is closed
+CHAT_OUTBOUND_SHED_LAG = env.float("CHAT_OUTBOUND_SHED_LAG", default=2.0)
+CHAT_OUTBOUND_CLOSE_LAG = env.float("CHAT_OUTBOUND_CLOSE_LAG", default=10.0)
+# Read chat messages older than this move to the archive table when the
+# archive_chat_messages command runs (schedule it daily)
+CHAT_ARCHIVE_AFTER_DAYS = env.int("CHAT_ARCHIVE_AFTER_DAYS", default=180)
+# Listings paginated with approximate=True (backend.pagination) report the
+# planner's row estimate instead of an exact total above this many rows
+PAGINATION_APPROXIMATE_COUNT_ABOVE = env.int("PAGINATION_APPROXIMATE_COUNT_ABOVE", default=100_000)
@@ -31,6 +31,14 @@ CACHES = {
     },
 }
 
+# CHAT
+# ------------------------------------------------------------------------------
+# Presence and the delivery log have to be shared by every worker process.
+CHAT_PRESENCE_BACKEND = env("CHAT_PRESENCE_BACKEND", default="redis")
+CHAT_PRESENCE_REDIS_URL = env("CHAT_PRESENCE_REDIS_URL", default=env("REDIS_URL"))
+CHAT_DELIVERY_LOG_BACKEND = env("CHAT_DELIVERY_LOG_BACKEND", default="redis")
+CHAT_DELIVERY_LOG_REDIS_URL = env("CHAT_DELIVERY_LOG_REDIS_URL", default=env("REDIS_URL"))
+
 # SECURITY
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-proxy-ssl-header